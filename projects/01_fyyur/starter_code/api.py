@@ -0,0 +1,180 @@
+import json
+from datetime import date
+
+from flask import Blueprint, Response, abort, jsonify, request, \
+    stream_with_context
+
+from extensions import detail_cache
+from models import Venue, Artist
+from queries import VENUE_FIELDS, ARTIST_FIELDS, keyset_listing, \
+    venue_detail, artist_detail, show_listing
+from scheduling import parse_time
+# ----------------------------------------------------------------------------#
+# JSON API.
+# ----------------------------------------------------------------------------#
+
+# Read-only JSON over the same queries as the HTML controllers.
+#
+# * ``?fields=id,name`` limits each object to the named fields; listings
+#   select only those columns.
+# * Listings are paged by cursor: pass the returned ``next_cursor`` back
+#   as ``?after=``, with ``?limit=`` up to MAX_PAGE_SIZE.
+# * ``?format=jsonl`` (or ``Accept: application/x-ndjson``) streams the
+#   whole collection from ``after`` on as JSON Lines, one object per line,
+#   reading it in STREAM_BATCH-row pages.
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+STREAM_BATCH = 1000
+JSONL = 'application/x-ndjson'
+
+SHOW_FIELDS = (
+    'id', 'venue_id', 'venue_name', 'artist_id', 'artist_name',
+    'artist_image_link', 'start_time', 'end_time',
+)
+
+
+def encode(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError('{!r} is not JSON serializable'.format(value))
+
+
+def dumps(data):
+    return json.dumps(data, default=encode)
+
+
+def json_response(data, status=200):
+    return Response(dumps(data), status=status, mimetype='application/json')
+
+
+def requested_fields(available):
+    """Names from ``?fields=``, in request order; all of them by default."""
+    value = request.args.get('fields')
+    if not value:
+        return list(available)
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        abort(400, 'unknown fields: {}'.format(', '.join(unknown)))
+    return names
+
+
+def pick(data, names):
+    return {name: data[name] for name in names}
+
+
+def query_time(name):
+    """``?<name>=`` as a time, None when absent; 400 if it isn't one."""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return parse_time(value)
+    except (ValueError, OverflowError):
+        abort(400, 'invalid {}: {!r}'.format(name, value))
+
+
+def page_size():
+    return max(1, min(request.args.get('limit', PAGE_SIZE, type=int),
+                      MAX_PAGE_SIZE))
+
+
+def wants_jsonl():
+    if request.args.get('format') == 'jsonl':
+        return True
+    return request.accept_mimetypes.best_match(
+        ['application/json', JSONL]) == JSONL
+
+
+def paged(fetch):
+    """Serve ``fetch(after, limit) -> (items, next_cursor)`` as a page or
+    as a JSON Lines stream."""
+    after = request.args.get('after')
+    if not wants_jsonl():
+        try:
+            items, next_cursor = fetch(after, page_size())
+        except ValueError:
+            abort(400, 'invalid cursor')
+        return json_response({'data': items, 'next_cursor': next_cursor})
+
+    try:
+        # The first batch is read up front so a bad cursor is still a 400.
+        items, after = fetch(after, STREAM_BATCH)
+    except ValueError:
+        abort(400, 'invalid cursor')
+
+    def generate(items, after):
+        while True:
+            for item in items:
+                yield dumps(item) + '\n'
+            if after is None:
+                break
+            items, after = fetch(after, STREAM_BATCH)
+
+    return Response(
+        stream_with_context(generate(items, after)), mimetype=JSONL
+    )
+
+
+def listing(model, fields):
+    columns = {
+        name: fields[name] for name in requested_fields(fields)
+    }
+    genre = request.args.get('genre')
+    return paged(lambda after, limit: keyset_listing(
+        model, columns, after=after, limit=limit, genre=genre
+    ))
+
+
+def detail(kind, id, loader):
+    data = detail_cache.get_or_load((kind, id), lambda: loader(id))
+    if data is None:
+        abort(404)
+    return json_response(pick(data, requested_fields(data)))
+
+
+@api.route('/venues')
+def venues():
+    return listing(Venue, VENUE_FIELDS)
+
+
+@api.route('/venues/<int:venue_id>')
+def venue(venue_id):
+    return detail('venue', venue_id, venue_detail)
+
+
+@api.route('/artists')
+def artists():
+    return listing(Artist, ARTIST_FIELDS)
+
+
+@api.route('/artists/<int:artist_id>')
+def artist(artist_id):
+    return detail('artist', artist_id, artist_detail)
+
+
+@api.route('/shows')
+def shows():
+    names = requested_fields(SHOW_FIELDS)
+    start = query_time('from')
+    end = query_time('to')
+
+    def fetch(after, limit):
+        items, next_cursor = show_listing(
+            after=after, start=start, end=end, limit=limit
+        )
+        return [pick(item, names) for item in items], next_cursor
+
+    return paged(fetch)
+
+
+@api.errorhandler(400)
+@api.errorhandler(404)
+def api_error(error):
+    return jsonify({
+        'error': error.code,
+        'message': error.description,
+    }), error.code
@@ -2,528 +2,153 @@
 # Imports
 # ----------------------------------------------------------------------------#
 
-from datetime import datetime
-import dateutil.parser
-import babel
-from flask import Flask, render_template, request,\
-                  Response, flash, redirect, url_for
-from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
-import logging
-from logging import Formatter, FileHandler
-from flask_migrate import Migrate
-
-from forms import ShowForm, VenueForm, ArtistForm
+import threading
 
-# ----------------------------------------------------------------------------#
-# App Config.
-# ----------------------------------------------------------------------------#
+from flask import Flask
+from flask.cli import AppGroup
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
-
-from models import *
 # ----------------------------------------------------------------------------#
-# Filters.
+# App Config.
 # ----------------------------------------------------------------------------#
 
-
-def format_datetime(value, format="medium"):
-    date = dateutil.parser.parse(value)
-    if format == "full":
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == "medium":
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format)
+# Importing this module only imports Flask: create_app imports the
+# extensions, models, controllers and jobs when it builds an app, and CLI
+# commands with heavy dependencies (alembic for `flask db`, the CSV
+# importer) are only imported when they run. Run with `flask run` (which
+# finds create_app), `python app.py` or e.g. `gunicorn 'app:create_app()'`.
 
 
-app.jinja_env.filters["datetime"] = format_datetime
+class LazyGroup(AppGroup):
+    """App CLI group whose commands can be loaded when first looked up."""
 
-# ----------------------------------------------------------------------------#
-# Controllers.
-# ----------------------------------------------------------------------------#
+    def __init__(self, *args, **kwargs):
+        super(LazyGroup, self).__init__(*args, **kwargs)
+        self.loaders = {}
 
+    def add_lazy_command(self, name, load):
+        """Register ``load()``, which returns the command, under ``name``."""
+        self.loaders[name] = load
 
-@app.route('/')
-def index():
-    return render_template('pages/home.html')
-
-
-#  Venues
-#  ----------------------------------------------------------------
-
-@app.route('/venues')
-def venues():
-    venues = Venue.query.all()
-    data = []
-    upcoming_shows = []
-
-    current_time = datetime.now()
-
-    for venue in venues:
-        upcoming_shows = db.session.query(Show).join(
-            Venue
-        ).filter(
-           Show.venue_id == venue.id
-        ).filter(Show.start_time > current_time).all()
-
-        data.append({
-            'city': venue.city,
-            'state': venue.state,
-            'venues': [{
-                'id': venue.id,
-                'name': venue.name,
-                'num_upcoming_shows': len(upcoming_shows)
-            }]
-        })
-
-    return render_template('pages/venues.html', areas=data)
-
-
-@app.route('/venues/search', methods=['POST'])
-def search_venues():
-    data = []
-    search = request.form.get('search_term')
-    venues = Venue.query.all()
-
-    for venue in venues:
-        if search.lower() in venue.name.lower():
-            data.append(venue)
-
-    response = {
-        'count': len(data),
-        'data': data,
-    }
-    return render_template(
-        'pages/search_venues.html',
-        results=response,
-        search_term=request.form.get('search_term', ''),
-    )
-
-
-@app.route('/venues/<int:venue_id>')
-def show_venue(venue_id):
-    past_shows = []
-    upcoming_shows = []
-    venue = Venue.query.get(venue_id)
-
-    current_time = datetime.now()
-
-    past_shows = db.session.query(Show).join(
-        Venue
-       ).filter(
-           Show.venue_id == venue_id
-       ).filter(Show.start_time < current_time).all()
-
-    upcoming_shows = db.session.query(Show).join(
-        Venue
-       ).filter(
-           Show.venue_id == venue_id
-       ).filter(Show.start_time > current_time).all()
-
-    data = {
-        'id': venue_id,
-        'name': venue.name,
-        'genres': venue.genres,
-        'address': venue.address,
-        'city': venue.city,
-        'state': venue.state,
-        'phone': venue.phone,
-        'website': venue.website,
-        'facebook_link': venue.facebook_link,
-        'seeking_talent': venue.seeking_talent,
-        'seeking_description': venue.seeking_description,
-        'image_link': venue.image_link,
-        'past_shows': past_shows,
-        'upcoming_shows': upcoming_shows,
-        'past_shows_count': len(past_shows),
-        'upcoming_shows_count': len(upcoming_shows),
-    }
-
-    return render_template('pages/show_venue.html', venue=data)
-
-
-#  Create Venue
-#  ----------------------------------------------------------------
-
-
-@app.route('/venues/create', methods=['GET'])
-def create_venue_form():
-    form = VenueForm()
-    return render_template('forms/new_venue.html', form=form)
-
-
-@app.route('/venues/create', methods=['POST'])
-def create_venue_submission():
-    venue_data = {}
-    venue_data['name'] = request.form.get('name')
-    venue_data['city'] = request.form.get('city')
-    venue_data['state'] = request.form.get('state')
-    venue_data['address'] = request.form.get('address')
-    venue_data['genres'] = request.form.getlist('genres')
-    venue_data['phone'] = request.form.get('phone')
-    venue_data['facebook_link'] = request.form.get('facebook_link')
-    try:
-        venue = Venue(
-            name=venue_data['name'],
-            city=venue_data['city'],
-            state=venue_data['state'],
-            address=venue_data['address'],
-            genres=venue_data['genres'],
-            phone=venue_data['phone'],
-            facebook_link=venue_data['facebook_link']
-        )
-        db.session.add(venue)
-        db.session.commit()
-        flash('Venue ' + request.form['name'] + ' was successfully listed!')
-    except Exception as ex:
-        db.session.rollback()
-        flash('Venue ' + request.form['name'] + ' was unsuccessfully listed!')
-        print(ex)
-    finally:
-        db.session.close()
-
-    return render_template('pages/home.html')
-
-
-@app.route('/venues/<venue_id>', methods=['DELETE'])
-def delete_venue(venue_id):
-    try:
-        Venue.query.filter_by(id=venue_id).delete()
-        db.session.commit()
-    except Exception as ex:
-        db.session.rollback()
-        print(ex)
-    finally:
-        db.session.close()
-    # BONUS CHALLENGE: Implement a button to
-    #                  delete a Venue on a Venue Page, have it so that
-    #                  clicking that button delete it from the db then
-    #                  redirect the user to the homepage
-    return Response(response=None, status=200)
-
-
-#  Artists
-#  ----------------------------------------------------------------
-@app.route('/artists')
-def artists():
-    data = []
-    artists = Artist.query.all()
-    for artist in artists:
-        data.append(
-            {
-                'id': artist.id,
-                'name': artist.name
-            }
+    def list_commands(self, ctx):
+        return sorted(
+            set(super(LazyGroup, self).list_commands(ctx)) | set(self.loaders)
         )
-    return render_template('pages/artists.html', artists=data)
-
-
-@app.route('/artists/search', methods=['POST'])
-def search_artists():
-    data = []
-    search = request.form.get('search_term')
-    artists = Artist.query.all()
-
-    for artist in artists:
-        if search.lower() in artist.name:
-            data.append(artist)
-
-    response = {
-        'count': len(data),
-        'data': data,
-    }
-    return render_template(
-        'pages/search_artists.html',
-        results=response,
-        search_term=request.form.get('search_term', ''),
-    )
-
-
-@app.route('/artists/<int:artist_id>')
-def show_artist(artist_id):
-    past_shows = []
-    upcoming_shows = []
-    artist = Artist.query.get(artist_id)
-
-    current_time = datetime.now()
-
-    past_shows = db.session.query(Show).join(
-        Venue
-       ).filter(
-           Show.artist_id == artist_id
-       ).filter(Show.start_time < current_time).all()
-
-    upcoming_shows = db.session.query(Show).join(
-        Venue
-       ).filter(
-           Show.artist_id == artist_id
-       ).filter(Show.start_time > current_time).all()
-
-    data = {
-        'id': artist_id,
-        'name': artist.name,
-        'genres': artist.genres,
-        'city': artist.city,
-        'state': artist.state,
-        'phone': artist.phone,
-        'website': artist.website,
-        'facebook_link': artist.facebook_link,
-        'seeking_talent': artist.seeking_venu,
-        'seeking_description': artist.seeking_description,
-        'image_link': artist.image_link,
-        'past_shows': past_shows,
-        'upcoming_shows': upcoming_shows,
-        'past_shows_count': len(past_shows),
-        'upcoming_shows_count': len(upcoming_shows),
-    }
-
-    return render_template('pages/show_artist.html', artist=data)
-
-
-#  Update
-#  ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
-def edit_artist(artist_id):
-    form = ArtistForm()
-
-    artist = Artist.query.get(artist_id)
-
-    artist_data = {
-        'id': artist.id,
-        'name': artist.name,
-        'genres': artist.genres,
-        'city': artist.city,
-        'state': artist.state,
-        'phone': artist.phone,
-        'website': artist.website,
-        'facebook_link': artist.facebook_link,
-        'seeking_venue': artist.seeking_venu,
-        'seeking_description': artist.seeking_description,
-        'image_link': artist.image_link
-    }
-
-    return render_template(
-        'forms/edit_artist.html',
-        form=form,
-        artist=artist_data
-    )
-
-
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
-def edit_artist_submission(artist_id):
-    data = {}
-    data['name'] = request.form.get('name')
-    data['city'] = request.form.get('city')
-    data['state'] = request.form.get('state')
-    data['phone'] = request.form.get('phone')
-    data['genres'] = request.form.getlist('genres')
-    data['facebook_link'] = request.form.get('facebook_link')
-
-    artist = Artist.query.get(artist_id)
-
-    try:
-        artist.name = data['name']
-        artist.city = data['city']
-        artist.state = data['state']
-        artist.phone = data['phone']
-        artist.genres = data['genres']
-        artist.facebook_link = data['facebook_link']
-        db.session.commit()
-        flash('Artist ' + request.form['name'] + ' was successfully updated!')
-    except Exception as ex:
-        db.session.rollback()
-        flash('Artist ' +
-              request.form['name']
-              + ' was unsuccessfully updated!')
-        print(ex)
-    finally:
-        db.session.close()
-
-    return redirect(url_for('show_artist', artist_id=artist_id))
-
-
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
-def edit_venue(venue_id):
-    form = VenueForm()
-    venue = Venue.query.get(venue_id)
-
-    venue_data = {
-        'id': venue.id,
-        'name': venue.name,
-        'genres': venue.genres,
-        'city': venue.city,
-        'state': venue.state,
-        'address': venue.address,
-        'phone': venue.phone,
-        'website': venue.website,
-        'facebook_link': venue.facebook_link,
-        'seeking_talent': venue.seeking_talent,
-        'seeking_description': venue.seeking_description,
-        'image_link': venue.image_link
-    }
-
-    return render_template(
-        'forms/edit_venue.html',
-        form=form,
-        venue=venue_data
-    )
-
-
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
-def edit_venue_submission(venue_id):
-    data = {}
-    data['name'] = request.form.get('name')
-    data['city'] = request.form.get('city')
-    data['state'] = request.form.get('state')
-    data['address'] = request.form.get('address')
-    data['phone'] = request.form.get('phone')
-    data['genres'] = request.form.getlist('genres')
-    data['facebook_link'] = request.form.get('facebook_link')
-
-    venue = Venue.query.get(venue_id)
-
-    try:
-        venue.name = data['name']
-        venue.city = data['city']
-        venue.state = data['state']
-        venue.adderss = data['adderss']
-        venue.phone = data['phone']
-        venue.genres = data['genres']
-        venue.facebook_link = data['facebook_link']
-        db.session.commit()
-        flash('Venue ' + request.form['name'] + ' was successfully updated!')
-    except Exception as ex:
-        db.session.rollback()
-        flash('Venue ' + request.form['name'] + ' was unsuccessfully updated!')
-        print(ex)
-    finally:
-        db.session.close()
-
-    return redirect(url_for('show_venue', venue_id=venue_id))
-
-
-#  Create Artist
-#  ----------------------------------------------------------------
-
-
-@app.route('/artists/create', methods=['GET'])
-def create_artist_form():
-    form = ArtistForm()
-    return render_template('forms/new_artist.html', form=form)
-
-
-@app.route('/artists/create', methods=['POST'])
-def create_artist_submission():
-    artist_data = {}
-    artist_data['name'] = request.form.get('name')
-    artist_data['city'] = request.form.get('city')
-    artist_data['state'] = request.form.get('state')
-    artist_data['genres'] = request.form.getlist('genres')
-    artist_data['phone'] = request.form.get('phone')
-    artist_data['facebook_link'] = request.form.get('facebook_link')
-    try:
-        artist = Artist(
-            name=artist_data['name'],
-            city=artist_data['city'],
-            state=artist_data['state'],
-            genres=artist_data['genres'],
-            phone=artist_data['phone'],
-            facebook_link=artist_data['facebook_link']
-        )
-        db.session.add(artist)
-        db.session.commit()
-        flash('Artist ' + request.form['name'] + ' was successfully listed!')
-    except Exception as ex:
-        db.session.rollback()
-        flash('Artist ' + request.form['name'] + ' was unsuccessfully listed!')
-        print(ex)
-    finally:
-        db.session.close()
-
-    return render_template('pages/home.html')
-
-
-#  Shows
-#  ----------------------------------------------------------------
-
-
-@app.route('/shows')
-def shows():
-    data = []
-    shows = Show().query.all()
-    for show in shows:
-        venue = Venue.query.get(show.venue_id)
-        artist = Artist.query.get(show.artist_id)
-        show_data = {
-            'venue_id': show.venue_id,
-            'venue_name': venue.name,
-            'artist_id': show.artist_id,
-            'artist_name': artist.name,
-            'artist_image_link': artist.image_link,
-            'start_time': show.start_time
-        }
-        data.append(show_data)
-
-    return render_template('pages/shows.html', shows=data)
 
-
-@app.route('/shows/create')
-def create_shows():
-    # renders form. do not touch.
-    form = ShowForm()
-    return render_template('forms/new_show.html', form=form)
-
-
-@app.route('/shows/create', methods=['POST'])
-def create_show_submission():
-    show_data = {}
-    show_data['artist_id'] = request.form.get('artist_id')
-    show_data['venue_id'] = request.form.get('venue_id')
-    show_data['start_time'] = request.form.get('start_time')
-
-    try:
-        show = Show(
-            artist_id=show_data['artist_id'],
-            venue_id=show_data['venue_id'],
-            start_time=show_data['start_time']
+    def get_command(self, ctx, name):
+        load = self.loaders.pop(name, None)
+        if load is not None:
+            self.add_command(load(), name)
+        return super(LazyGroup, self).get_command(ctx, name)
+
+
+def migrate_command(app):
+    from flask_migrate import Migrate
+    from extensions import db
+    Migrate(app, db)
+    return app.cli.commands['db']
+
+
+def import_command():
+    from importer import import_command
+    return import_command
+
+
+def engine_options(config):
+    """Build SQLALCHEMY_ENGINE_OPTIONS for the configured database URI.
+
+    Done once settings are applied, as they may change the URI: the pool
+    options only suit pooled drivers (SQLite's pools take none of them)
+    and the statement timeout is PostgreSQL's. Options already set in
+    ``SQLALCHEMY_ENGINE_OPTIONS`` take precedence.
+    """
+    from sqlalchemy.engine import make_url
+    backend = make_url(config['SQLALCHEMY_DATABASE_URI']).get_backend_name()
+    options = {}
+    if backend != 'sqlite':
+        options.update(
+            pool_size=config.get('DB_POOL_SIZE', 10),
+            max_overflow=config.get('DB_MAX_OVERFLOW', 20),
+            pool_timeout=config.get('DB_POOL_TIMEOUT', 30),
+            pool_recycle=config.get('DB_POOL_RECYCLE', 1800),
+            pool_pre_ping=config.get('DB_POOL_PRE_PING', True),
         )
-        db.session.add(show)
-        db.session.commit()
-        flash('Show successfully listed!')
-    except Exception as ex:
-        db.session.rollback()
-        flash('Show unsuccessfully listed!')
-        print(ex)
-    finally:
-        db.session.close()
-
-    return render_template('pages/home.html')
-
-
-@app.errorhandler(404)
-def not_found_error(error):
-    return render_template('errors/404.html'), 404
-
-
-@app.errorhandler(500)
-def server_error(error):
-    return render_template('errors/500.html'), 500
-
-
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s\
-            [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
+    if backend in ('postgresql', 'postgres') \
+            and config.get('DB_STATEMENT_TIMEOUT'):
+        options['connect_args'] = {
+            'options': '-c statement_timeout={}'.format(
+                config['DB_STATEMENT_TIMEOUT']),
+        }
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    return options
+
+
+def start_on_first_request(app, *starters):
+    """Call each ``starter(app)`` before the first request is served.
+
+    Keeps background threads out of CLI commands, and lets servers that
+    load the app before forking start them in each worker.
+    """
+    lock = threading.Lock()
+    started = []
+
+    @app.before_request
+    def start_background_jobs():
+        if started:
+            return
+        with lock:
+            if not started:
+                for starter in starters:
+                    starter(app)
+                started.append(True)
+
+
+def create_app(config='config', **settings):
+    """Build a Fyyur app.
+
+    ``config`` is an import name or object as for
+    ``Config.from_object``; ``settings`` override it, e.g.
+    ``create_app(SQLALCHEMY_DATABASE_URI='sqlite://')``.
+    """
+    from extensions import db, moment
+    from cache import make_cache
+    from instrumentation import init_instrumentation
+    from logs import init_logging
+    from tasks import make_queue, worker_command
+
+    app = Flask(__name__)
+    app.config.from_object(config)
+    app.config.update(settings)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    app.cli = LazyGroup(app.name)
+
+    db.init_app(app)
+    moment.init_app(app)
+    app.extensions['detail_cache'] = make_cache(app.config)
+    make_queue(app)
+    init_instrumentation(app)
+
+    from filters import format_datetime
+    from views import pages
+    from api import api
+    from counters import init_counters, counts_command
+    from purge import init_purge, purge_command
+
+    app.jinja_env.filters["datetime"] = format_datetime
+    app.register_blueprint(pages)
+    app.register_blueprint(api)
+
+    app.cli.add_command(counts_command)
+    app.cli.add_command(purge_command)
+    app.cli.add_command(worker_command)
+    app.cli.add_lazy_command('import', import_command)
+    app.cli.add_lazy_command('db', lambda: migrate_command(app))
+
+    start_on_first_request(app, init_counters, init_purge)
+
+    if not app.debug:
+        init_logging(app)
+
+    return app
 
 # ----------------------------------------------------------------------------#
 # Launch.
@@ -531,11 +156,11 @@ if not app.debug:
 
 # Default port:
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 '''
@@ -0,0 +1,59 @@
+"""Per-call cost of the Jinja ``datetime`` filter on a large show page.
+
+Formats the start times of a synthetic 10k-show page with the previous
+implementation (dateutil parse plus babel.dates.format_datetime on every
+call) and with filters.format_datetime. Run from the starter_code
+directory:
+
+    python -m benchmarks.datetime_filter --shows 10000 --distinct 500
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+from filters import DATETIME_FORMATS, format_datetime
+
+
+def previous_format_datetime(value, format='medium'):
+    date = dateutil.parser.parse(value)
+    return babel.dates.format_datetime(date, DATETIME_FORMATS[format])
+
+
+def run(label, formatter, values, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for value in values:
+            formatter(value, 'full')
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print('{:<28} {:8.2f} ms/page {:8.2f} us/call'.format(
+        label, best * 1000, best / len(values) * 1e6))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--shows', type=int, default=10000)
+    parser.add_argument('--distinct', type=int, default=500,
+                        help='Number of distinct start times on the page.')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    first = datetime(2020, 1, 1, 20, 0)
+    times = [first + timedelta(hours=random.randint(0, 24 * 365))
+             for _ in range(args.distinct)]
+    values = [random.choice(times) for _ in range(args.shows)]
+    strings = [value.isoformat() for value in values]
+
+    run('previous (str, parse)', previous_format_datetime, strings,
+        args.repeat)
+    run('format_datetime (str)', format_datetime, strings, args.repeat)
+    run('format_datetime (datetime)', format_datetime, values, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""Latency, throughput and query-count benchmark for Fyyur routes.
+
+Two modes, both run from the starter_code directory:
+
+* in-process, through the Flask test client against ``--database-url``
+  (optionally seeding it first)::
+
+    python -m benchmarks.routes --database-url sqlite:///bench.db \
+        --seed --shows 100000 --requests 200 --output before.json
+
+* over HTTP against a running server, with ``--threads`` workers::
+
+    QUERY_STATS_HEADERS=1 python app.py
+    python -m benchmarks.routes --url http://localhost:5000 --threads 8
+
+Queries per request come from the X-Query-Count header, so the server
+needs QUERY_STATS_HEADERS (the test client mode sets it). ``--output``
+writes the results as JSON for comparison across commits.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+SEARCH_TERMS = ['blue', 'hall', 'moon', 'band 1', 'velvet echo', 'zzz']
+
+
+def route_specs(venues, artists):
+    """(name, method, path factory, form data factory) per route."""
+    def term():
+        return {'search_term': random.choice(SEARCH_TERMS)}
+
+    return [
+        ('venues', 'GET', lambda: '/venues', None),
+        ('search_venues', 'POST', lambda: '/venues/search', term),
+        ('show_venue', 'GET',
+         lambda: '/venues/{}'.format(random.randint(1, venues)), None),
+        ('artists', 'GET', lambda: '/artists', None),
+        ('search_artists', 'POST', lambda: '/artists/search', term),
+        ('show_artist', 'GET',
+         lambda: '/artists/{}'.format(random.randint(1, artists)), None),
+        ('shows', 'GET', lambda: '/shows', None),
+    ]
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies, queries, errors, elapsed):
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'queries_per_request':
+            round(sum(queries) / len(queries), 2) if queries else None,
+    }
+
+
+def run_client(args, specs):
+    os.environ['DATABASE_URL'] = args.database_url
+    os.environ['QUERY_STATS_HEADERS'] = '1'
+    from app import create_app
+    from extensions import db
+
+    app = create_app()
+    if args.seed:
+        from benchmarks.seed import seed
+        with app.app_context():
+            seed(db.engine, args.venues, args.artists, args.shows)
+
+    client = app.test_client()
+    results = {}
+    for name, method, path, data in specs:
+        latencies, queries, errors = [], [], 0
+        started = time.perf_counter()
+        for _ in range(args.requests):
+            if args.cold:
+                app.extensions['detail_cache'].clear()
+            request_started = time.perf_counter()
+            response = client.open(
+                path(), method=method, data=data() if data else None
+            )
+            latencies.append(time.perf_counter() - request_started)
+            if response.status_code >= 400:
+                errors += 1
+            if 'X-Query-Count' in response.headers:
+                queries.append(int(response.headers['X-Query-Count']))
+        results[name] = summarize(
+            latencies, queries, errors, time.perf_counter() - started
+        )
+    return results
+
+
+def fetch(base_url, method, path, data):
+    body = urlencode(data).encode() if data else None
+    request = Request(base_url + path, data=body, method=method)
+    started = time.perf_counter()
+    try:
+        with urlopen(request) as response:
+            response.read()
+            status, headers = response.status, response.headers
+    except HTTPError as ex:
+        status, headers = ex.code, ex.headers
+    return time.perf_counter() - started, status, \
+        headers.get('X-Query-Count')
+
+
+def run_http(args, specs):
+    results = {}
+    for name, method, path, data in specs:
+        latencies, queries = [], []
+        errors = [0]
+        lock = threading.Lock()
+
+        def one(_):
+            elapsed, status, count = fetch(
+                args.url.rstrip('/'), method, path(), data() if data else None
+            )
+            with lock:
+                latencies.append(elapsed)
+                if status >= 400:
+                    errors[0] += 1
+                if count is not None:
+                    queries.append(int(count))
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            list(pool.map(one, range(args.requests)))
+        results[name] = summarize(
+            latencies, queries, errors[0], time.perf_counter() - started
+        )
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='Benchmark a running server over HTTP.')
+    parser.add_argument('--database-url', default='sqlite:///bench.db')
+    parser.add_argument('--seed', action='store_true',
+                        help='Reseed the database first (test client mode).')
+    parser.add_argument('--venues', type=int, default=1000)
+    parser.add_argument('--artists', type=int, default=5000)
+    parser.add_argument('--shows', type=int, default=100000)
+    parser.add_argument('--requests', type=int, default=200,
+                        help='Requests per route.')
+    parser.add_argument('--threads', type=int, default=4,
+                        help='Concurrent workers in HTTP mode.')
+    parser.add_argument('--cold', action='store_true',
+                        help='Clear the app cache before every request.')
+    parser.add_argument('--output', help='Write results to this JSON file.')
+    args = parser.parse_args()
+
+    specs = route_specs(args.venues, args.artists)
+    if args.url:
+        results = run_http(args, specs)
+    else:
+        results = run_client(args, specs)
+
+    print('{:<16} {:>9} {:>9} {:>9} {:>9} {:>8} {:>6}'.format(
+        'route', 'p50 ms', 'p95 ms', 'p99 ms', 'req/s', 'queries', 'errors'))
+    for name, stats in results.items():
+        print('{:<16} {:>9} {:>9} {:>9} {:>9} {:>8} {:>6}'.format(
+            name, stats['p50_ms'], stats['p95_ms'], stats['p99_ms'],
+            stats['throughput_rps'], stats['queries_per_request'],
+            stats['errors']))
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({
+                'commit': git_commit(),
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'mode': 'http' if args.url else 'client',
+                'target': args.url or args.database_url,
+                'volumes': {'venues': args.venues, 'artists': args.artists,
+                            'shows': args.shows},
+                'routes': results,
+            }, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""Seed a database with synthetic venues, artists and shows.
+
+Run from the starter_code directory:
+
+    python -m benchmarks.seed --database-url sqlite:///bench.db \
+        --venues 1000 --artists 5000 --shows 1000000
+
+The target database's Fyyur tables are dropped and recreated.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, time as day_time, timedelta
+
+from sqlalchemy import create_engine
+
+from counters import rebuild_counts
+from forms import VenueForm
+from models import db, Venue, Artist, Show
+
+CHUNK = 10000
+DAYS = 730
+# Shows start at 12:00, 15:00, 18:00 or 21:00 and last two hours, so no
+# venue or artist is ever double-booked.
+SLOT_HOURS = (12, 15, 18, 21)
+SHOW_LENGTH = timedelta(hours=2)
+
+GENRES = [value for value, _ in VenueForm.genres.kwargs['choices']]
+STATES = [value for value, _ in VenueForm.state.kwargs['choices']]
+WORDS = [
+    'Blue', 'Velvet', 'Electric', 'Golden', 'Midnight', 'Silver', 'Red',
+    'Wild', 'Lonely', 'Dusty', 'Neon', 'Crystal', 'Iron', 'Paper', 'Stone',
+    'Moon', 'River', 'Garden', 'Echo', 'Harbor', 'Lantern', 'Fox', 'Owl',
+]
+
+
+def name(rng, suffix):
+    return '{} {} {}'.format(rng.choice(WORDS), rng.choice(WORDS), suffix)
+
+
+def insert(engine, table, rows, total):
+    for offset in range(0, total, CHUNK):
+        with engine.begin() as conn:
+            conn.execute(table.insert(), [
+                next(rows) for _ in range(min(CHUNK, total - offset))
+            ])
+
+
+def seed(engine, venues, artists, shows, seed=0):
+    """Recreate the schema on ``engine`` and fill it with synthetic rows.
+
+    Shows spread one year either side of today so detail pages have both
+    past and upcoming shows, in slots that never double-book a venue or an
+    artist. ``seed`` makes runs reproducible.
+    """
+    capacity = min(venues, artists) * DAYS * len(SLOT_HOURS)
+    if shows > capacity // 2:
+        raise ValueError('at most {} shows fit {} venues and {} artists'
+                         .format(capacity // 2, venues, artists))
+    rng = random.Random(seed)
+    db.metadata.drop_all(engine)
+    db.metadata.create_all(engine)
+    cities = ['City {}'.format(i) for i in range(max(1, venues // 20))]
+
+    def venue_rows():
+        for i in range(venues):
+            yield {
+                'name': name(rng, 'Hall {}'.format(i)),
+                'city': rng.choice(cities),
+                'state': rng.choice(STATES),
+                'address': '{} Main St'.format(i),
+                'phone': '555-{:04d}'.format(i % 10000),
+                'genres': rng.sample(GENRES, rng.randint(1, 3)),
+                'seeking_talent': rng.random() < 0.3,
+            }
+
+    def artist_rows():
+        for i in range(artists):
+            yield {
+                'name': name(rng, 'Band {}'.format(i)),
+                'city': rng.choice(cities),
+                'state': rng.choice(STATES),
+                'genres': rng.sample(GENRES, rng.randint(1, 2)),
+                'seeking_venu': rng.random() < 0.3,
+            }
+
+    first_day = datetime.combine(
+        datetime.today() - timedelta(days=DAYS // 2), day_time()
+    )
+    slots = DAYS * len(SLOT_HOURS)
+    booked_venues = set()
+    booked_artists = set()
+
+    def show_rows():
+        for _ in range(shows):
+            while True:
+                venue_id = rng.randint(1, venues)
+                artist_id = rng.randint(1, artists)
+                slot = rng.randrange(slots)
+                venue_slot = venue_id * slots + slot
+                artist_slot = artist_id * slots + slot
+                if venue_slot not in booked_venues and \
+                        artist_slot not in booked_artists:
+                    break
+            booked_venues.add(venue_slot)
+            booked_artists.add(artist_slot)
+            day, hour = divmod(slot, len(SLOT_HOURS))
+            start_time = first_day + timedelta(
+                days=day, hours=SLOT_HOURS[hour]
+            )
+            yield {
+                'venue_id': venue_id,
+                'artist_id': artist_id,
+                'start_time': start_time,
+                'end_time': start_time + SHOW_LENGTH,
+            }
+
+    insert(engine, Venue.__table__, venue_rows(), venues)
+    insert(engine, Artist.__table__, artist_rows(), artists)
+    insert(engine, Show.__table__, show_rows(), shows)
+    with engine.begin() as conn:
+        rebuild_counts(conn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', default='sqlite:///bench.db')
+    parser.add_argument('--venues', type=int, default=1000)
+    parser.add_argument('--artists', type=int, default=5000)
+    parser.add_argument('--shows', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    seed(create_engine(args.database_url),
+         args.venues, args.artists, args.shows, args.seed)
+    print('seeded {} venues, {} artists, {} shows in {:.1f}s'.format(
+        args.venues, args.artists, args.shows,
+        time.perf_counter() - started))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""Startup time of Fyyur processes, measured with ``python -X importtime``.
+
+Starts each scenario (importing the app module, building an app with
+create_app, listing the CLI commands) ``--repeat`` times in a fresh
+interpreter and reports the median wall time, the median total import
+time and the slowest top-level imports. Run from the starter_code
+directory:
+
+    python -m benchmarks.startup --output startup.json
+    python -m benchmarks.startup --baseline startup.json --tolerance 20
+
+With ``--baseline`` it exits non-zero when a scenario's median wall time
+is more than ``--tolerance`` percent slower than in the baseline file.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.routes import git_commit
+
+SCENARIOS = [
+    ('import models', ['-c', 'import models']),
+    ('import app', ['-c', 'import app']),
+    ('create_app', ['-c', 'from app import create_app; create_app()']),
+    ('flask --help', ['-m', 'flask', '--help']),
+]
+
+
+def parse_importtime(output):
+    """``{module: cumulative seconds}`` for the top-level imports."""
+    imports = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not name.startswith('  '):
+            name = name.strip()
+            imports[name] = imports.get(name, 0) + int(cumulative) / 1e6
+    return imports
+
+
+def run(arguments, env):
+    started = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime'] + arguments,
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    elapsed = time.perf_counter() - started
+    if process.returncode:
+        raise SystemExit('{} failed:\n{}'.format(
+            ' '.join(arguments), process.stderr[-2000:]))
+    return elapsed, parse_importtime(process.stderr)
+
+
+def measure(arguments, env, repeat, top):
+    walls, totals, imports = [], [], {}
+    for _ in range(repeat):
+        wall, modules = run(arguments, env)
+        walls.append(wall)
+        totals.append(sum(modules.values()))
+        for name, seconds in modules.items():
+            imports.setdefault(name, []).append(seconds)
+    slowest = sorted(
+        ((statistics.median(times), name) for name, times in imports.items()),
+        reverse=True,
+    )[:top]
+    return {
+        'wall_ms': round(statistics.median(walls) * 1000, 1),
+        'imports_ms': round(statistics.median(totals) * 1000, 1),
+        'slowest': [
+            {'module': name, 'ms': round(seconds * 1000, 1)}
+            for seconds, name in slowest
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', default='sqlite://',
+                        help='Database the app is configured with.')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=5,
+                        help='Slowest top-level imports to list.')
+    parser.add_argument('--output', help='Write results to this JSON file.')
+    parser.add_argument('--baseline',
+                        help='Compare with a previous --output file.')
+    parser.add_argument('--tolerance', type=float, default=20,
+                        help='Allowed wall time regression, in percent.')
+    args = parser.parse_args()
+
+    env = dict(os.environ, DATABASE_URL=args.database_url, FLASK_APP='app')
+    results = {}
+    for name, arguments in SCENARIOS:
+        results[name] = stats = measure(arguments, env, args.repeat, args.top)
+        print('{:<14} {:>9} ms wall {:>9} ms imports'.format(
+            name, stats['wall_ms'], stats['imports_ms']))
+        for entry in stats['slowest']:
+            print('    {:<36} {:>8} ms'.format(entry['module'], entry['ms']))
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({
+                'commit': git_commit(),
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': sys.version.split()[0],
+                'scenarios': results,
+            }, output, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            previous = json.load(baseline)['scenarios']
+        regressed = False
+        for name, stats in results.items():
+            if name not in previous:
+                continue
+            before = previous[name]['wall_ms']
+            change = (stats['wall_ms'] - before) / before * 100
+            flag = change > args.tolerance
+            regressed = regressed or flag
+            print('{:<14} {:>9} -> {:>9} ms ({:+.0f}%){}'.format(
+                name, before, stats['wall_ms'], change,
+                '  REGRESSION' if flag else ''))
+        if regressed:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
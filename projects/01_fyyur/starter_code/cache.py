@@ -0,0 +1,157 @@
+import pickle
+import time
+from collections import OrderedDict
+from threading import Lock
+# ----------------------------------------------------------------------------#
+# Cache.
+# ----------------------------------------------------------------------------#
+
+
+class Cache(object):
+    """Base read-through cache keeping hit/miss counters.
+
+    Backends implement ``get`` (returning None on a miss), ``set``,
+    ``delete`` and ``clear``; callers use ``get_or_load``. Backends also
+    keep a data version, bumped on every write, that list pages and their
+    ETags are keyed by.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.counter_lock = Lock()
+
+    def get_or_load(self, key, loader):
+        value = self.get(key)
+        if value is not None:
+            with self.counter_lock:
+                self.hits += 1
+            return value
+
+        with self.counter_lock:
+            self.misses += 1
+        value = loader()
+        if value is not None:
+            self.set(key, value)
+        return value
+
+    def invalidate(self, *keys):
+        for key in keys:
+            self.delete(key)
+
+    def data_changed(self, *keys):
+        """Invalidate ``keys`` and bump the data version."""
+        self.invalidate(*keys)
+        self.bump_version()
+
+    def stats(self):
+        return {
+            'backend': type(self).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+class LRUCache(Cache):
+    """In-process LRU cache whose entries expire ``ttl`` seconds after set."""
+
+    def __init__(self, maxsize=1024, ttl=300):
+        super(LRUCache, self).__init__()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = Lock()
+        self.version = 0
+        self.modified = time.time()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def data_version(self):
+        """Return ``(version, modified)``, bumped on every data change."""
+        return self.version, self.modified
+
+    def bump_version(self):
+        with self.lock:
+            self.version += 1
+            self.modified = time.time()
+
+    def stats(self):
+        stats = super(LRUCache, self).stats()
+        stats.update(size=len(self.entries), maxsize=self.maxsize)
+        return stats
+
+
+class RedisCache(Cache):
+    """Cache stored in a Redis-compatible server, shared between workers."""
+
+    def __init__(self, url, ttl=300, prefix='fyyur:'):
+        super(RedisCache, self).__init__()
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, key):
+        return self.prefix + ':'.join(str(part) for part in key)
+
+    def get(self, key):
+        value = self.client.get(self._key(key))
+        if value is None:
+            return None
+        return pickle.loads(value)
+
+    def set(self, key, value):
+        self.client.set(self._key(key), pickle.dumps(value), ex=self.ttl)
+
+    def delete(self, key):
+        self.client.delete(self._key(key))
+
+    def clear(self):
+        keys = list(self.client.scan_iter(self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+    def data_version(self):
+        version, modified = self.client.mget(
+            self.prefix + 'version', self.prefix + 'modified'
+        )
+        return int(version or 0), float(modified or 0)
+
+    def bump_version(self):
+        pipeline = self.client.pipeline()
+        pipeline.incr(self.prefix + 'version')
+        pipeline.set(self.prefix + 'modified', time.time())
+        pipeline.execute()
+
+
+def make_cache(config):
+    """Build the cache selected by ``CACHE_BACKEND`` in the app config."""
+    ttl = config.get('CACHE_TTL', 300)
+    if config.get('CACHE_BACKEND', 'memory') == 'redis':
+        return RedisCache(config['CACHE_REDIS_URL'], ttl=ttl)
+    return LRUCache(maxsize=config.get('CACHE_MAXSIZE', 1024), ttl=ttl)
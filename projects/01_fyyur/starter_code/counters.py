@@ -0,0 +1,264 @@
+import atexit
+import threading
+from collections import defaultdict
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, case, event, func, select
+from sqlalchemy.orm.attributes import get_history
+
+from extensions import db, detail_cache
+from models import Venue, Artist, Show, CounterCheckpoint
+# ----------------------------------------------------------------------------#
+# Show counters.
+# ----------------------------------------------------------------------------#
+
+# Venue and Artist carry upcoming_shows_count/past_shows_count so listing
+# pages never scan Show. The counts are exact as of the show_counts
+# checkpoint: shows starting after it are upcoming. Writes through the ORM
+# adjust them incrementally (bulk paths call count_shows), and a periodic
+# rollover moves shows that have since started from upcoming to past and
+# advances the checkpoint.
+
+CHECKPOINT = 'show_counts'
+COUNTED = ((Venue, 'venue_id'), (Artist, 'artist_id'))
+
+checkpoint_table = CounterCheckpoint.__table__
+
+
+def read_checkpoint(connection, lock=None):
+    """Return the checkpoint time, optionally locking its row.
+
+    Writers counting shows take a shared lock ('share') and rollovers and
+    repairs an exclusive one ('update'), so on PostgreSQL a show inserted
+    while a rollover runs is counted against the checkpoint it commits
+    with. SQLite ignores the locks but only ever has one writer.
+    """
+    query = checkpoint_table.select().where(
+        checkpoint_table.c.name == CHECKPOINT
+    )
+    if lock is not None:
+        query = query.with_for_update(read=lock == 'share')
+    return connection.execute(query).first().as_of
+
+
+def shift_counts(connection, model, deltas):
+    """Add ``{id: (upcoming, past)}`` deltas to ``model`` rows."""
+    table = model.__table__
+    rows = [
+        {'row_id': id, 'upcoming': upcoming, 'past': past}
+        for id, (upcoming, past) in deltas.items()
+        if id is not None and (upcoming or past)
+    ]
+    if not rows:
+        return
+    connection.execute(
+        table.update().where(table.c.id == bindparam('row_id')).values(
+            upcoming_shows_count=table.c.upcoming_shows_count
+            + bindparam('upcoming'),
+            past_shows_count=table.c.past_shows_count + bindparam('past'),
+        ),
+        rows,
+    )
+
+
+def count_shows(connection, shows, sign=1):
+    """Count ``shows`` in (sign=1) or out of (sign=-1) the counters.
+
+    ``shows`` holds (venue_id, artist_id, start_time) tuples; shows
+    without a start time are never counted.
+    """
+    as_of = read_checkpoint(connection, lock='share')
+    deltas = {model: defaultdict(lambda: (0, 0)) for model, _ in COUNTED}
+    for venue_id, artist_id, start_time in shows:
+        if start_time is None:
+            continue
+        upcoming = start_time > as_of
+        for model, id in ((Venue, venue_id), (Artist, artist_id)):
+            up, past = deltas[model][id]
+            deltas[model][id] = (
+                up + sign if upcoming else up,
+                past if upcoming else past + sign,
+            )
+    for model, model_deltas in deltas.items():
+        shift_counts(connection, model, model_deltas)
+
+
+def old_value(target, name):
+    history = get_history(target, name)
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(target, name)
+
+
+@event.listens_for(Show, 'after_insert')
+def count_inserted_show(mapper, connection, target):
+    count_shows(connection, [
+        (target.venue_id, target.artist_id, target.start_time)
+    ])
+
+
+@event.listens_for(Show, 'after_delete')
+def count_deleted_show(mapper, connection, target):
+    count_shows(connection, [
+        (old_value(target, 'venue_id'), old_value(target, 'artist_id'),
+         old_value(target, 'start_time'))
+    ], sign=-1)
+
+
+@event.listens_for(Show, 'after_update')
+def count_updated_show(mapper, connection, target):
+    names = ('venue_id', 'artist_id', 'start_time')
+    old = tuple(old_value(target, name) for name in names)
+    new = tuple(getattr(target, name) for name in names)
+    if old != new:
+        count_shows(connection, [old], sign=-1)
+        count_shows(connection, [new])
+
+
+def rollover(connection, now=None):
+    """Move shows that started since the checkpoint into the past counts.
+
+    The checkpoint row is locked and advanced with a compare-and-set, so
+    concurrent runs (one per worker process) never count a show twice: the
+    loser changes nothing. Returns the number of shows moved.
+    """
+    if now is None:
+        now = datetime.now()
+    as_of = read_checkpoint(connection, lock='update')
+    if now <= as_of:
+        return 0
+    claimed = connection.execute(
+        checkpoint_table.update().where(
+            checkpoint_table.c.name == CHECKPOINT,
+            checkpoint_table.c.as_of == as_of,
+        ).values(as_of=now)
+    ).rowcount
+    if not claimed:
+        return 0
+
+    moved = 0
+    for model, column in COUNTED:
+        key = getattr(Show, column)
+        started = select(key, func.count(Show.id)).where(
+            Show.start_time > as_of, Show.start_time <= now
+        ).group_by(key)
+        deltas = {id: (-count, count)
+                  for id, count in connection.execute(started)}
+        shift_counts(connection, model, deltas)
+        if model is Venue:
+            moved = sum(count for _, count in deltas.values())
+    return moved
+
+
+def check_counts(connection, repair=False):
+    """Compare every stored counter with a recount as of the checkpoint.
+
+    Returns ``[(table, id, stored, expected)]`` for the rows that differ
+    and, with ``repair``, overwrites them with the recount.
+    """
+    as_of = read_checkpoint(connection, lock='update' if repair else None)
+    upcoming = Show.start_time > as_of
+    mismatches = []
+    for model, column in COUNTED:
+        key = getattr(Show, column)
+        recount = select(
+            key,
+            func.sum(case((upcoming, 1), else_=0)),
+            func.sum(case((upcoming, 0), else_=1)),
+        ).where(Show.start_time.isnot(None)).group_by(key)
+        expected = {id: (int(up), int(past))
+                    for id, up, past in connection.execute(recount)}
+
+        stored = select(
+            model.id, model.upcoming_shows_count, model.past_shows_count
+        )
+        wrong = {}
+        for id, up, past in connection.execute(stored):
+            want = expected.get(id, (0, 0))
+            if (up, past) != want:
+                mismatches.append((model.__tablename__, id, (up, past), want))
+                wrong[id] = (want[0] - up, want[1] - past)
+        if repair:
+            shift_counts(connection, model, wrong)
+    return mismatches
+
+
+def rebuild_counts(connection, now=None):
+    """Recount every counter from scratch as of ``now``.
+
+    For data loaded without going through the ORM or count_shows.
+    """
+    if now is None:
+        now = datetime.now()
+    read_checkpoint(connection, lock='update')
+    connection.execute(
+        checkpoint_table.update().where(
+            checkpoint_table.c.name == CHECKPOINT
+        ).values(as_of=now)
+    )
+    return check_counts(connection, repair=True)
+
+
+def init_counters(app):
+    """Roll the counters over every ``COUNTS_ROLLOVER_INTERVAL`` seconds.
+
+    Runs on a daemon thread; 0 disables it (use ``flask counts rollover``
+    from cron instead). Changed counts bump the cache data version so list
+    pages re-render.
+    """
+    interval = app.config.get('COUNTS_ROLLOVER_INTERVAL', 60)
+    if not interval:
+        return
+    stopping = threading.Event()
+
+    def run():
+        while not stopping.wait(interval):
+            with app.app_context():
+                try:
+                    with db.engine.begin() as connection:
+                        moved = rollover(connection)
+                    if moved:
+                        detail_cache.bump_version()
+                except Exception:
+                    app.logger.exception('show counter rollover failed')
+
+    threading.Thread(target=run, name='counters', daemon=True).start()
+    atexit.register(stopping.set)
+
+
+@click.group('counts')
+def counts_command():
+    """Maintain the materialized show counters."""
+
+
+@counts_command.command('rollover')
+@with_appcontext
+def rollover_command():
+    """Move shows that have started into the past counts."""
+    with db.engine.begin() as connection:
+        moved = rollover(connection)
+    if moved:
+        detail_cache.bump_version()
+    click.echo('Rolled over {} shows'.format(moved))
+
+
+@counts_command.command('check')
+@click.option('--repair', is_flag=True, help='Rewrite wrong counters.')
+@with_appcontext
+def check_command(repair):
+    """Recount shows and report (or repair) counters that disagree."""
+    with db.engine.begin() as connection:
+        mismatches = check_counts(connection, repair=repair)
+    for table, id, stored, expected in mismatches[:20]:
+        click.echo('{} {}: stored {} expected {}'.format(
+            table, id, stored, expected))
+    if len(mismatches) > 20:
+        click.echo('... {} more'.format(len(mismatches) - 20))
+    if mismatches and repair:
+        detail_cache.bump_version()
+    click.echo('{} counters {}'.format(
+        len(mismatches), 'repaired' if repair else 'wrong'))
+    if mismatches and not repair:
+        raise SystemExit(1)
@@ -0,0 +1,17 @@
+from flask import current_app
+from flask_moment import Moment
+from flask_sqlalchemy import SQLAlchemy
+from werkzeug.local import LocalProxy
+# ----------------------------------------------------------------------------#
+# Extensions.
+# ----------------------------------------------------------------------------#
+
+# Created unbound and attached to each app by create_app (see app.py), so
+# modules can import them without importing, or building, the app.
+
+db = SQLAlchemy()
+moment = Moment()
+
+# Built per app from its config; these resolve to the current app's.
+detail_cache = LocalProxy(lambda: current_app.extensions['detail_cache'])
+task_queue = LocalProxy(lambda: current_app.extensions['tasks'])
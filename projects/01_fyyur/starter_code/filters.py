@@ -0,0 +1,50 @@
+from datetime import date, datetime, time
+from functools import lru_cache
+
+import babel.dates
+import dateutil.parser
+from babel import Locale
+# ----------------------------------------------------------------------------#
+# Filters.
+# ----------------------------------------------------------------------------#
+
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+DEFAULT_LOCALE = babel.dates.LC_TIME or 'en_US'
+
+
+@lru_cache(maxsize=None)
+def compiled_pattern(format, locale):
+    """Parse a Babel pattern and locale once per (format, locale)."""
+    pattern = DATETIME_FORMATS.get(format, format)
+    return babel.dates.parse_pattern(pattern), Locale.parse(locale)
+
+
+@lru_cache(maxsize=4096)
+def parse_datetime(value):
+    return dateutil.parser.parse(value)
+
+
+@lru_cache(maxsize=4096)
+def _format(value, format, locale):
+    pattern, locale = compiled_pattern(format, locale)
+    return pattern.apply(value, locale)
+
+
+def format_datetime(value, format='medium', locale=DEFAULT_LOCALE):
+    """Jinja ``datetime`` filter.
+
+    Accepts datetime and date objects as they come from the models, and
+    only falls back to dateutil for strings. Patterns are compiled once
+    and results are memoized, as a page repeats the same timestamps.
+    """
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    elif not isinstance(value, datetime):
+        value = datetime.combine(value, time())
+    return _format(value, format, locale)
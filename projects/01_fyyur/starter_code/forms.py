@@ -2,7 +2,7 @@ from datetime import datetime
 from flask_wtf import Form
 from wtforms import StringField, SelectField,\
                     SelectMultipleField, DateTimeField
-from wtforms.validators import DataRequired, AnyOf, URL
+from wtforms.validators import DataRequired, AnyOf, URL, Optional
 
 
 class ShowForm(Form):
@@ -11,6 +11,7 @@ class ShowForm(Form):
     start_time = DateTimeField(
         "start_time", validators=[DataRequired()], default=datetime.today()
     )
+    end_time = DateTimeField("end_time", validators=[Optional()])
 
 
 class VenueForm(Form):
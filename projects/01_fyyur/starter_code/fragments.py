@@ -0,0 +1,79 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from flask import current_app, make_response, render_template, request, \
+    session
+from markupsafe import Markup
+# ----------------------------------------------------------------------------#
+# Fragment caching.
+# ----------------------------------------------------------------------------#
+
+
+def render_cached(cache, page_template, fragment_template, loader,
+                  params=(), **context):
+    """Render a list page around a cached fragment, with revalidation.
+
+    ``fragment_template`` is rendered from ``loader()`` and cached under
+    the current data version, the values of the query parameters named in
+    ``params`` (the ones the loader reads; others are ignored, so they
+    can't fill the cache) and a time bucket of CACHE_TTL seconds (so
+    time-relative data such as upcoming show counts still rolls over).
+    The same values form the ETag; a matching If-None-Match or a fresh
+    If-Modified-Since gets a 304 without touching the database.
+
+    The data version is only shared between processes with the redis
+    cache backend. With the memory backend, a write bumps it only in the
+    process that made it, and other workers serve their fragments until
+    the time bucket rolls over.
+    """
+    ttl = current_app.config.get('CACHE_TTL', 300)
+    bucket = int(time.time() // ttl)
+    version, modified = cache.data_version()
+    last_modified = datetime.fromtimestamp(
+        max(modified, bucket * ttl), timezone.utc
+    )
+    query = [
+        (name, tuple(request.args.getlist(name)))
+        for name in params if name in request.args
+    ]
+    etag = '{}.{}.{}.{}'.format(
+        version, int(modified), bucket,
+        hashlib.md5(repr((request.path, query)).encode()).hexdigest()[:12],
+    )
+
+    # Pending flash messages are part of the layout, so always render them.
+    if '_flashes' not in session:
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains(etag)
+        else:
+            since = request.if_modified_since
+            not_modified = since is not None and \
+                since >= last_modified.replace(microsecond=0)
+        if not_modified:
+            response = make_response('', 304)
+            response.set_etag(etag)
+            return response
+
+    fragment = cache.get_or_load(
+        ('fragment', fragment_template, version, int(modified), bucket,
+         tuple(query)),
+        lambda: Markup(render_template(fragment_template, **loader())),
+    )
+    response = make_response(
+        render_template(page_template, fragment=fragment, **context)
+    )
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response
+
+
+def render_uncached(page_template, fragment_template, loader, **context):
+    """Render a page as render_cached does, without caching or ETags.
+
+    For pages whose query parameters can take unbounded values (cursors,
+    date ranges), which would otherwise fill the cache.
+    """
+    fragment = Markup(render_template(fragment_template, **loader()))
+    return render_template(page_template, fragment=fragment, **context)
@@ -0,0 +1,334 @@
+import csv
+import io
+import json
+import time
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy.exc import IntegrityError
+from wtforms.fields import DateTimeField, SelectMultipleField
+from wtforms.validators import DataRequired, URL
+
+from extensions import db, detail_cache
+from forms import ShowForm, VenueForm, ArtistForm
+from models import Venue, Artist, Show
+from queries import as_start_time
+from scheduling import show_interval, find_batch_conflicts, SchedulingError
+from counters import count_shows
+# ----------------------------------------------------------------------------#
+# Bulk import.
+# ----------------------------------------------------------------------------#
+
+# ShowForm takes the ids as free text; the database needs integers.
+INTEGER_FIELDS = {'artist_id', 'venue_id'}
+
+
+class RowError(ValueError):
+    pass
+
+
+class ShowBookings(object):
+    """Per-row hook for shows: default the end time and reject overlaps.
+
+    Rows get their times validated as they are read; ``check_chunk`` then
+    rejects, per chunk, the rows double-booking a stored show (with one
+    query, see find_batch_conflicts) and then those overlapping an earlier
+    row still in the chunk. Earlier chunks are committed by then, so the
+    query covers them.
+    """
+
+    def __call__(self, values):
+        try:
+            values['start_time'], values['end_time'] = show_interval(
+                values['start_time'], values['end_time']
+            )
+        except SchedulingError as ex:
+            raise RowError(str(ex))
+        return values
+
+    def check_chunk(self, rows):
+        """Return ``{index: message}`` for the rows to drop."""
+        conflicts = find_batch_conflicts([
+            (index, row['venue_id'], row['artist_id'], row['start_time'],
+             row['end_time'])
+            for index, row in enumerate(rows)
+        ])
+        rejected = {
+            index: 'conflicts with show(s) {}'.format(
+                ', '.join(str(id) for id in sorted(ids)))
+            for index, ids in conflicts.items()
+        }
+
+        booked = {}
+        for index, row in enumerate(rows):
+            if index in rejected:
+                continue
+            start, end = row['start_time'], row['end_time']
+            keys = (('venue', row['venue_id']),
+                    ('artist', row['artist_id']))
+            clashes = [
+                key for key in keys
+                if any(other_start < end and start < other_end
+                       for other_start, other_end in booked.get(key, ()))
+            ]
+            if clashes:
+                rejected[index] = 'overlaps an earlier show of {} {} in ' \
+                    'this file'.format(*clashes[0])
+                continue
+            for key in keys:
+                booked.setdefault(key, []).append((start, end))
+        return rejected
+
+
+# kind -> (model, form declaring its fields, optional per-row hook class)
+IMPORTS = {
+    'venues': (Venue, VenueForm, None),
+    'artists': (Artist, ArtistForm, None),
+    'shows': (Show, ShowForm, ShowBookings),
+}
+
+
+def compile_rules(form_class):
+    """Turn a form's field declarations into plain per-column checks.
+
+    Binding a WTForms form per row costs more than the insert itself, so
+    the validators and choices declared in forms.py are read once and
+    applied directly: required fields, allowed choices, URL patterns and
+    the DateTimeField format.
+    """
+    rules = {}
+    for name in dir(form_class):
+        unbound = getattr(form_class, name)
+        if not hasattr(unbound, 'field_class'):
+            continue
+        validators = unbound.kwargs.get('validators') or []
+        choices = unbound.kwargs.get('choices')
+        rules[name] = {
+            'required': any(isinstance(v, DataRequired) for v in validators),
+            'urls': [v.regex for v in validators if isinstance(v, URL)],
+            'choices': {value for value, _ in choices} if choices else None,
+            'multiple': issubclass(unbound.field_class, SelectMultipleField),
+            'datetime_format': unbound.kwargs.get(
+                'format', '%Y-%m-%d %H:%M:%S'
+            ) if issubclass(unbound.field_class, DateTimeField) else None,
+        }
+    return rules
+
+
+def clean_row(row, rules, columns):
+    """Validate one raw row and return the values to insert.
+
+    Every row gets a value for each of ``columns`` (falling back to the
+    column default) so chunks can be sent as a single executemany.
+    """
+    values = {}
+    for name, rule in rules.items():
+        value = row.get(name)
+        if rule['multiple'] and isinstance(value, str):
+            value = [item.strip() for item in value.split(',') if item.strip()]
+        if not value:
+            if rule['required']:
+                raise RowError('{} is required'.format(name))
+            value = None
+        if value is not None:
+            if rule['choices'] is not None:
+                invalid = set(value if rule['multiple'] else [value]) \
+                    - rule['choices']
+                if invalid:
+                    raise RowError('invalid {}: {}'.format(
+                        name, ', '.join(sorted(invalid))))
+            for regex in rule['urls']:
+                if not regex.match(value):
+                    raise RowError('invalid URL for {}'.format(name))
+            if rule['datetime_format'] is not None:
+                try:
+                    value = as_start_time(datetime.strptime(
+                        value, rule['datetime_format']))
+                except (TypeError, ValueError):
+                    raise RowError('invalid {}'.format(name))
+        elif rule['urls']:
+            raise RowError('invalid URL for {}'.format(name))
+        if name in INTEGER_FIELDS and value is not None:
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                raise RowError('invalid {}'.format(name))
+        values[name] = value
+
+    # Model columns the forms don't cover are passed through.
+    for column in columns:
+        if column.name in values:
+            continue
+        value = row.get(column.name)
+        if value is None or value == '':
+            value = column.default.arg if column.default is not None \
+                else None
+        elif column.type.python_type is bool and not isinstance(value, bool):
+            value = str(value).lower() in ('1', 'true', 't', 'yes', 'y')
+        values[column.name] = value
+    return values
+
+
+def read_rows(stream, file_format):
+    if file_format == 'csv':
+        for row in csv.DictReader(stream):
+            yield row
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+def copy_rows(connection, table, columns, rows):
+    """Load ``rows`` with PostgreSQL COPY, the fastest bulk path."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([copy_value(row.get(column)) for column in columns])
+    buffer.seek(0)
+    statement = 'COPY "{}" ({}) FROM STDIN WITH (FORMAT csv)'.format(
+        table.name, ', '.join('"{}"'.format(c) for c in columns))
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(statement, buffer)
+    except connection.dialect.dbapi.IntegrityError as ex:
+        # The raw cursor bypasses SQLAlchemy's exception wrapping.
+        raise IntegrityError(statement, None, ex)
+
+
+def copy_value(value):
+    if value is None:
+        return None
+    if isinstance(value, list):
+        return '{' + ','.join(
+            '"{}"'.format(item.replace('\\', '\\\\').replace('"', '\\"'))
+            for item in value) + '}'
+    return value
+
+
+def insert_chunk(table, rows):
+    connection = db.session.connection()
+    if connection.dialect.name == 'postgresql':
+        columns = [c.name for c in table.columns if not c.primary_key]
+        copy_rows(connection, table, columns, rows)
+    else:
+        connection.execute(table.insert(), rows)
+    if table is Show.__table__:
+        count_shows(connection, [
+            (row['venue_id'], row['artist_id'], row['start_time'])
+            for row in rows
+        ])
+    db.session.commit()
+
+
+def import_file(kind, stream, file_format, chunk_size, progress=None):
+    """Stream rows from ``stream`` into the ``kind`` table in chunks.
+
+    Each chunk is validated and inserted in its own transaction, so memory
+    stays bounded by ``chunk_size``. Invalid rows are skipped and reported.
+    A chunk the database rejects is rolled back; if a double-booking
+    committed concurrently caused it, the conflicting rows are reported
+    and the rest inserted again, otherwise each of its rows is reported.
+    Returns ``(inserted, errors)`` where errors holds ``(line, message)``.
+    """
+    model, form_class, prepare_class = IMPORTS[kind]
+    table = model.__table__
+    rules = compile_rules(form_class)
+    columns = [c for c in table.columns if not c.primary_key]
+    prepare = prepare_class() if prepare_class else None
+
+    inserted = 0
+    errors = []
+    chunk = []
+    lines = []
+
+    def reject_conflicts():
+        # Drops the rows the hook finds double-booked, reporting them.
+        rejected = prepare.check_chunk(chunk)
+        errors.extend(
+            (lines[index], message)
+            for index, message in sorted(rejected.items())
+        )
+        chunk[:] = [row for index, row in enumerate(chunk)
+                    if index not in rejected]
+        lines[:] = [line for index, line in enumerate(lines)
+                    if index not in rejected]
+        return bool(rejected)
+
+    def flush():
+        checked = prepare is not None and hasattr(prepare, 'check_chunk')
+        if checked:
+            reject_conflicts()
+        inserted_now = 0
+        while chunk:
+            try:
+                insert_chunk(table, chunk)
+            except IntegrityError as ex:
+                db.session.rollback()
+                # A show committed since the check (which the PostgreSQL
+                # exclusion constraints refuse): check again so only the
+                # rows it conflicts with are reported, then retry.
+                if checked and reject_conflicts():
+                    checked = False
+                    continue
+                message = 'chunk rejected: {}'.format(
+                    str(ex.orig).strip().splitlines()[0])
+                errors.extend((line, message) for line in lines)
+            else:
+                inserted_now = len(chunk)
+            break
+        del chunk[:], lines[:]
+        return inserted_now
+
+    for line, row in enumerate(read_rows(stream, file_format), start=1):
+        try:
+            values = clean_row(row, rules, columns)
+            chunk.append(prepare(values) if prepare else values)
+            lines.append(line)
+        except RowError as ex:
+            errors.append((line, str(ex)))
+        if len(chunk) >= chunk_size:
+            inserted += flush()
+            if progress is not None:
+                progress(inserted, len(errors))
+    if chunk:
+        inserted += flush()
+        if progress is not None:
+            progress(inserted, len(errors))
+    if inserted:
+        detail_cache.clear()
+        detail_cache.bump_version()
+    errors.sort()
+    return inserted, errors
+
+
+@click.command('import')
+@click.argument('kind', type=click.Choice(sorted(IMPORTS)))
+@click.argument('path', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'jsonl']),
+              help='Input format; guessed from the file extension.')
+@click.option('--chunk-size', default=5000, show_default=True,
+              help='Rows per insert transaction.')
+@with_appcontext
+def import_command(kind, path, file_format, chunk_size):
+    """Bulk import venues, artists or shows from CSV or JSON Lines."""
+    if file_format is None:
+        file_format = 'csv' if path.name.endswith('.csv') else 'jsonl'
+    started = time.perf_counter()
+
+    def progress(inserted, failed):
+        elapsed = time.perf_counter() - started
+        click.echo('{} rows imported, {} rejected ({:.0f} rows/s)'.format(
+            inserted, failed, inserted / elapsed if elapsed else 0))
+
+    inserted, errors = import_file(
+        kind, path, file_format, chunk_size, progress
+    )
+    for line, message in errors[:20]:
+        click.echo('line {}: {}'.format(line, message), err=True)
+    if len(errors) > 20:
+        click.echo('... {} more rejected rows'.format(len(errors) - 20),
+                   err=True)
+    click.echo('Imported {} {} in {:.1f}s'.format(
+        inserted, kind, time.perf_counter() - started))
@@ -0,0 +1,115 @@
+import heapq
+import time
+
+from flask import current_app, g, has_app_context, has_request_context,\
+    request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+# ----------------------------------------------------------------------------#
+# SQL instrumentation.
+# ----------------------------------------------------------------------------#
+
+
+class QueryStats(object):
+    """SQL statements issued while serving one request."""
+
+    def __init__(self, keep_slowest):
+        self.count = 0
+        self.total = 0.0
+        self.keep_slowest = keep_slowest
+        self.slowest = []
+
+    def record(self, statement, elapsed):
+        self.count += 1
+        self.total += elapsed
+        entry = (elapsed, self.count, statement)
+        if len(self.slowest) < self.keep_slowest:
+            heapq.heappush(self.slowest, entry)
+        else:
+            heapq.heappushpop(self.slowest, entry)
+
+    def as_dict(self):
+        return {
+            'queries': self.count,
+            'db_ms': round(self.total * 1000, 2),
+            'slowest': [
+                {'ms': round(elapsed * 1000, 2), 'statement': statement}
+                for elapsed, _, statement in sorted(self.slowest, reverse=True)
+            ],
+        }
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def before_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    # Kept on the statement's execution context, which is discarded with
+    # it, so a statement that fails leaves nothing behind.
+    if context is not None:
+        context._query_started = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def after_cursor_execute(conn, cursor, statement, parameters, context,
+                         executemany):
+    started = getattr(context, '_query_started', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    if not has_app_context():
+        return
+    settings = current_app.extensions.get('instrumentation')
+    if settings is None:
+        return
+
+    if elapsed > settings['slow_query']:
+        current_app.logger.warning(
+            'slow query (%.1f ms): %s', elapsed * 1000, statement
+        )
+    if has_request_context() and 'query_stats' in g:
+        g.query_stats.record(statement, elapsed)
+
+
+def init_instrumentation(app):
+    """Count and time SQL statements per request.
+
+    Debug responses (or all, with QUERY_STATS_HEADERS) carry X-Query-Count
+    and X-Query-Time headers; outside debug each request logs its query
+    stats as ``extra`` fields. Requests
+    issuing more than QUERY_BUDGET statements and statements slower than
+    SLOW_QUERY_MS are logged as warnings.
+    """
+    budget = app.config.get('QUERY_BUDGET', 20)
+    keep_slowest = app.config.get('QUERY_STATS_SLOWEST', 3)
+    headers = app.config.get('QUERY_STATS_HEADERS', False)
+    app.extensions['instrumentation'] = {
+        'slow_query': app.config.get('SLOW_QUERY_MS', 100) / 1000.0,
+    }
+
+    @app.before_request
+    def start_query_stats():
+        g.query_stats = QueryStats(keep_slowest)
+
+    @app.after_request
+    def report_query_stats(response):
+        stats = g.get('query_stats')
+        if stats is None:
+            return response
+
+        if stats.count > budget:
+            app.logger.warning(
+                '%s %s issued %d queries (budget %d)',
+                request.method, request.path, stats.count, budget,
+            )
+        if app.debug or headers:
+            response.headers['X-Query-Count'] = str(stats.count)
+            response.headers['X-Query-Time'] = \
+                '{:.2f}ms'.format(stats.total * 1000)
+        if not app.debug:
+            app.logger.info('sql', extra={
+                'sql': stats.as_dict(),
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'over_budget': stats.count > budget,
+            })
+        return response
@@ -0,0 +1,152 @@
+import http.client
+import ipaddress
+import socket
+from urllib.parse import urljoin, urlsplit
+
+from flask import current_app
+
+from extensions import detail_cache
+from models import Venue, Artist
+from queries import venue_detail, artist_detail
+from tasks import task
+# ----------------------------------------------------------------------------#
+# Write side effects.
+# ----------------------------------------------------------------------------#
+
+# Tasks the create/edit controllers queue after committing. Cache
+# invalidation itself stays in the request, so the next page view never
+# sees stale data; these only do work the user need not wait for.
+
+DETAILS = {
+    'venue': (Venue, venue_detail),
+    'artist': (Artist, artist_detail),
+}
+LINK_FIELDS = ('website', 'facebook_link', 'image_link')
+MAX_LINK_REDIRECTS = 3
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+
+
+@task
+def warm_detail(kind, id):
+    """Load a detail page's data into the cache ahead of the next view.
+
+    Pays off with the shared redis cache; with the per-process LRU it
+    only helps the process that ran the task.
+    """
+    data = DETAILS[kind][1](id)
+    if data is not None:
+        detail_cache.set((kind, id), data)
+
+
+class LinkRefused(ValueError):
+    """The link points at a host the checker must not contact."""
+
+
+def public_address(host, port):
+    """Resolve ``host`` and return an address to connect to.
+
+    Raises LinkRefused unless every address it resolves to is global, so
+    links can't make the server probe loopback, private, link-local or
+    cloud metadata addresses.
+    """
+    try:
+        infos = socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError):
+        raise LinkRefused('cannot resolve {}'.format(host))
+    addresses = [info[4][0] for info in infos]
+    for address in addresses:
+        if not ipaddress.ip_address(address.split('%')[0]).is_global:
+            raise LinkRefused('{} is not a public address'.format(host))
+    return addresses[0]
+
+
+class PinnedHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection to an already vetted address, so the host name is
+    not resolved a second time (and possibly differently)."""
+
+    def __init__(self, host, address, port, timeout):
+        super(PinnedHTTPConnection, self).__init__(host, port, timeout)
+        self.address = address
+
+    def connect(self):
+        self.sock = socket.create_connection(
+            (self.address, self.port), self.timeout
+        )
+
+
+class PinnedHTTPSConnection(http.client.HTTPSConnection):
+    def __init__(self, host, address, port, timeout):
+        super(PinnedHTTPSConnection, self).__init__(
+            host, port, timeout=timeout
+        )
+        self.address = address
+
+    def connect(self):
+        sock = socket.create_connection(
+            (self.address, self.port), self.timeout
+        )
+        self.sock = self._context.wrap_socket(sock, server_hostname=self.host)
+
+
+def link_status(url, timeout):
+    """HTTP status of a HEAD request to ``url``, or None for a link that
+    is not http(s) or redirects too often.
+
+    Redirects are followed by hand, so each hop's host is vetted by
+    public_address. Raises LinkRefused, OSError or HTTPException when the
+    link can't be checked.
+    """
+    for _ in range(MAX_LINK_REDIRECTS + 1):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            return None
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        connection_class = PinnedHTTPSConnection \
+            if parts.scheme == 'https' else PinnedHTTPConnection
+        connection = connection_class(
+            parts.hostname, public_address(parts.hostname, port), port,
+            timeout,
+        )
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        try:
+            connection.request('HEAD', path, headers={'User-Agent': 'fyyur'})
+            response = connection.getresponse()
+            status, location = response.status, response.getheader('Location')
+        finally:
+            connection.close()
+        if status not in REDIRECT_STATUSES or not location:
+            return status
+        url = urljoin(url, location)
+    return None
+
+
+@task
+def check_links(kind, id):
+    """Log links on a venue or artist that are malformed, unreachable,
+    point at a non-public host or return an error status. Some servers
+    refuse HEAD, so 405 counts as reachable. Runs only with
+    LINK_CHECK_ENABLED, and never retries: a dead link stays dead.
+    """
+    if not current_app.config.get('LINK_CHECK_ENABLED'):
+        return
+    row = DETAILS[kind][0].query.get(id)
+    if row is None:
+        return
+    timeout = current_app.config.get('LINK_CHECK_TIMEOUT', 5)
+    broken = {}
+    for field in LINK_FIELDS:
+        url = getattr(row, field)
+        if not url:
+            continue
+        try:
+            status = link_status(url, timeout)
+        except (ValueError, OSError, http.client.HTTPException):
+            status = None
+        if status is None or (status >= 400 and status != 405):
+            broken[field] = status
+    if broken:
+        current_app.logger.warning('broken links', extra={
+            'kind': kind, 'id': id, 'links': broken,
+        })
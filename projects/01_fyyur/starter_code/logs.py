@@ -0,0 +1,154 @@
+import atexit
+import copy
+import json
+import logging
+import queue
+import time
+import uuid
+from logging.handlers import QueueHandler, QueueListener, \
+    RotatingFileHandler, TimedRotatingFileHandler
+
+from flask import g, has_request_context, request
+from flask.logging import default_handler
+# ----------------------------------------------------------------------------#
+# Logging.
+# ----------------------------------------------------------------------------#
+
+# Attributes every LogRecord has; anything else was passed via ``extra``.
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message'}
+EXCEPTION_FORMATTER = logging.Formatter()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any ``extra`` fields."""
+
+    def format(self, record):
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES:
+                data[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exception'] = record.exc_text
+        return json.dumps(data, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamp records with the request id and route.
+
+    Runs on the request thread, before the record is queued, since flask.g
+    is not available on the listener thread.
+    """
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.route = request.endpoint
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking when full."""
+
+    def __init__(self, queue):
+        super(DroppingQueueHandler, self).__init__(queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        """Make ``record`` safe to pickle and to format on another thread.
+
+        Unlike QueueHandler.prepare, keeps the traceback in ``exc_text``
+        rather than appending it to the message, so JsonFormatter still
+        writes it as a separate ``exception`` field.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = EXCEPTION_FORMATTER.formatException(
+                record.exc_info
+            )
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def file_handler(config):
+    path = config.get('LOG_FILE', 'error.log')
+    when = config.get('LOG_ROTATE_WHEN')
+    backups = config.get('LOG_BACKUP_COUNT', 5)
+    if when:
+        return TimedRotatingFileHandler(path, when=when, backupCount=backups)
+    return RotatingFileHandler(
+        path,
+        maxBytes=config.get('LOG_ROTATE_BYTES', 10 * 1024 * 1024),
+        backupCount=backups,
+    )
+
+
+def init_logging(app):
+    """Send app logs through a bounded queue to a rotating JSON file.
+
+    Request threads only enqueue records; a listener thread formats and
+    writes them. When the queue is full records are dropped and counted
+    rather than stalling the request. Every request also logs an access
+    line with its status and latency.
+    """
+    records = queue.Queue(maxsize=app.config.get('LOG_QUEUE_SIZE', 10000))
+    handler = DroppingQueueHandler(records)
+    handler.addFilter(RequestContextFilter())
+
+    output = file_handler(app.config)
+    output.setFormatter(JsonFormatter())
+    listener = QueueListener(records, output, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    level = app.config.get('LOG_LEVEL', 'INFO')
+    app.logger.setLevel(level)
+    handler.setLevel(level)
+    # Flask's default handler writes to stderr on the request thread.
+    app.logger.removeHandler(default_handler)
+    app.logger.addHandler(handler)
+    app.extensions['logging'] = handler
+
+    @app.before_request
+    def start_request_log():
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def log_request(response):
+        started = g.get('request_started')
+        if started is not None:
+            app.logger.info('request', extra={
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'latency_ms': round((time.perf_counter() - started) * 1000, 2),
+            })
+            response.headers['X-Request-ID'] = g.request_id
+        return response
+
+
+def logging_stats(app):
+    handler = app.extensions.get('logging')
+    if handler is None:
+        return {'enabled': False}
+    return {
+        'enabled': True,
+        'queued': handler.queue.qsize(),
+        'capacity': handler.queue.maxsize,
+        'dropped': handler.dropped,
+    }
@@ -0,0 +1,80 @@
+"""add show end times and booking constraints
+
+Revision ID: 3f9d6c2a8e51
+Revises: e7b2a90d4c18
+Create Date: 2020-07-18 14:02:41.508317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9d6c2a8e51'
+down_revision = 'e7b2a90d4c18'
+branch_labels = None
+depends_on = None
+
+BOOKED = ('venue_id', 'artist_id')
+
+
+def booking_constraint_ddl(column):
+    return (
+        'ALTER TABLE "Show" ADD CONSTRAINT "ex_Show_{0}_booking" '
+        'EXCLUDE USING gist ({0} WITH =, '
+        'tsrange(start_time, end_time) WITH &&) '
+        'WHERE (end_time > start_time)'.format(column)
+    )
+
+
+def recreate_indexes(columns):
+    for column in BOOKED:
+        name = 'ix_Show_{}_start_time'.format(column)
+        op.drop_index(name, table_name='Show')
+        op.create_index(name, 'Show', [column] + columns)
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.alter_column(
+            'Show', 'start_time',
+            type_=sa.DateTime(),
+            postgresql_using='start_time::timestamp',
+        )
+    else:
+        # SQLite keeps the column type; values become DateTime strings.
+        op.execute(
+            "UPDATE \"Show\" SET start_time = start_time || ' 00:00:00.000000' "
+            "WHERE length(start_time) = 10"
+        )
+    op.add_column('Show', sa.Column('end_time', sa.DateTime(), nullable=True))
+    # Existing shows only have a date: give them no length so they never
+    # count as double-bookings.
+    op.execute('UPDATE "Show" SET end_time = start_time')
+    recreate_indexes(['start_time', 'end_time'])
+
+    if bind.dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        for column in BOOKED:
+            op.execute(booking_constraint_ddl(column))
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        for column in BOOKED:
+            op.execute(
+                'ALTER TABLE "Show" DROP CONSTRAINT "ex_Show_{}_booking"'
+                .format(column)
+            )
+    recreate_indexes(['start_time'])
+    op.drop_column('Show', 'end_time')
+    if bind.dialect.name == 'postgresql':
+        op.alter_column(
+            'Show', 'start_time',
+            type_=sa.Date(),
+            postgresql_using='start_time::date',
+        )
+    else:
+        op.execute('UPDATE "Show" SET start_time = substr(start_time, 1, 10)')
@@ -0,0 +1,65 @@
+"""add name search indexes
+
+Revision ID: 8a3c1f2e9b47
+Revises: 5d5612f82273
+Create Date: 2020-07-12 10:14:32.518204
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8a3c1f2e9b47'
+down_revision = '5d5612f82273'
+branch_labels = None
+depends_on = None
+
+SEARCHABLE = ('Venue', 'Artist')
+
+
+def fts_statements(table):
+    fts = '{}_fts'.format(table.lower())
+    names = dict(table=table, fts=fts)
+    return [statement.format(**names) for statement in (
+        "CREATE VIRTUAL TABLE {fts} USING fts5("
+        "name, content='{table}', content_rowid='id')",
+        "CREATE TRIGGER {fts}_ai AFTER INSERT ON \"{table}\" BEGIN "
+        "INSERT INTO {fts}(rowid, name) VALUES (new.id, new.name); END",
+        "CREATE TRIGGER {fts}_ad AFTER DELETE ON \"{table}\" BEGIN "
+        "INSERT INTO {fts}({fts}, rowid, name) "
+        "VALUES ('delete', old.id, old.name); END",
+        "CREATE TRIGGER {fts}_au AFTER UPDATE OF name ON \"{table}\" BEGIN "
+        "INSERT INTO {fts}({fts}, rowid, name) "
+        "VALUES ('delete', old.id, old.name); "
+        "INSERT INTO {fts}(rowid, name) VALUES (new.id, new.name); END",
+        "INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    )]
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for table in SEARCHABLE:
+            op.create_index(
+                'ix_{}_name_trgm'.format(table), table, ['name'],
+                postgresql_using='gin',
+                postgresql_ops={'name': 'gin_trgm_ops'},
+            )
+    elif dialect == 'sqlite':
+        for table in SEARCHABLE:
+            for statement in fts_statements(table):
+                op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for table in SEARCHABLE:
+            op.drop_index('ix_{}_name_trgm'.format(table), table_name=table)
+    elif dialect == 'sqlite':
+        for table in SEARCHABLE:
+            fts = '{}_fts'.format(table.lower())
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute('DROP TRIGGER {}_{}'.format(fts, suffix))
+            op.execute('DROP TABLE {}'.format(fts))
@@ -0,0 +1,56 @@
+"""add materialized show counters
+
+Revision ID: 9b1e4d7c3a62
+Revises: 3f9d6c2a8e51
+Create Date: 2020-07-19 11:24:09.331870
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b1e4d7c3a62'
+down_revision = '3f9d6c2a8e51'
+branch_labels = None
+depends_on = None
+
+COUNTED = (('Venue', 'venue_id'), ('Artist', 'artist_id'))
+
+
+def upgrade():
+    for table, _ in COUNTED:
+        for column in ('upcoming_shows_count', 'past_shows_count'):
+            op.add_column(table, sa.Column(
+                column, sa.Integer(), nullable=False, server_default='0'
+            ))
+    checkpoint = op.create_table(
+        'CounterCheckpoint',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('as_of', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+
+    # Count every show as of now; the app's rollover job takes it from
+    # there.
+    now = datetime.now()
+    for table, column in COUNTED:
+        op.get_bind().execute(sa.text(
+            'UPDATE "{table}" SET '
+            'upcoming_shows_count = (SELECT count(*) FROM "Show" '
+            'WHERE "Show".{column} = "{table}".id '
+            'AND "Show".start_time > :now), '
+            'past_shows_count = (SELECT count(*) FROM "Show" '
+            'WHERE "Show".{column} = "{table}".id '
+            'AND "Show".start_time <= :now)'.format(table=table, column=column)
+        ).bindparams(sa.bindparam('now', now, type_=sa.DateTime())))
+    op.bulk_insert(checkpoint, [{'name': 'show_counts', 'as_of': now}])
+
+
+def downgrade():
+    op.drop_table('CounterCheckpoint')
+    for table, _ in COUNTED:
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
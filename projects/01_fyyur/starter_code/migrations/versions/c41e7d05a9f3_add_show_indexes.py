@@ -0,0 +1,31 @@
+"""add show indexes
+
+Revision ID: c41e7d05a9f3
+Revises: 8a3c1f2e9b47
+Create Date: 2020-07-14 18:02:51.730412
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41e7d05a9f3'
+down_revision = '8a3c1f2e9b47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_Show_venue_id_start_time', 'Show', ['venue_id', 'start_time']
+    )
+    op.create_index(
+        'ix_Show_artist_id_start_time', 'Show', ['artist_id', 'start_time']
+    )
+    op.create_index('ix_Show_start_time', 'Show', ['start_time'])
+
+
+def downgrade():
+    op.drop_index('ix_Show_start_time', table_name='Show')
+    op.drop_index('ix_Show_artist_id_start_time', table_name='Show')
+    op.drop_index('ix_Show_venue_id_start_time', table_name='Show')
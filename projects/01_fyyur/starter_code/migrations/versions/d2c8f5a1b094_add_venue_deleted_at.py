@@ -0,0 +1,30 @@
+"""add venue deleted_at for soft deletes
+
+Revision ID: d2c8f5a1b094
+Revises: 9b1e4d7c3a62
+Create Date: 2020-07-20 09:47:13.862045
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2c8f5a1b094'
+down_revision = '9b1e4d7c3a62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('Venue', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+    op.create_index(
+        'ix_Venue_deleted_at', 'Venue', ['deleted_at'],
+        postgresql_where=sa.text('deleted_at IS NOT NULL'),
+        sqlite_where=sa.text('deleted_at IS NOT NULL'),
+    )
+
+
+def downgrade():
+    op.drop_index('ix_Venue_deleted_at', table_name='Venue')
+    op.drop_column('Venue', 'deleted_at')
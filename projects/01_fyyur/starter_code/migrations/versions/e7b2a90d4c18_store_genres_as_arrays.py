@@ -0,0 +1,90 @@
+"""store genres as arrays
+
+Revision ID: e7b2a90d4c18
+Revises: c41e7d05a9f3
+Create Date: 2020-07-16 21:37:05.114926
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b2a90d4c18'
+down_revision = 'c41e7d05a9f3'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist')
+
+
+def parse_genres(value):
+    """Split the text stored by the old String column into a list.
+
+    The forms posted lists, which PostgreSQL stored as array literals such
+    as '{Jazz,"Rock n Roll"}'; anything else is taken as a single genre.
+    """
+    if value is None:
+        return None
+    if value.startswith('{') and value.endswith('}'):
+        return [
+            genre.strip().strip('"')
+            for genre in value[1:-1].split(',') if genre.strip()
+        ]
+    return [value]
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        for table in TABLES:
+            op.alter_column(
+                table, 'genres',
+                type_=postgresql.ARRAY(sa.String(length=120)),
+                postgresql_using=(
+                    "CASE WHEN genres LIKE '{%}' THEN genres::varchar[] "
+                    "ELSE ARRAY[genres]::varchar[] END"
+                ),
+            )
+            op.create_index(
+                'ix_{}_genres'.format(table), table, ['genres'],
+                postgresql_using='gin',
+            )
+    else:
+        # SQLite keeps the column type and stores the list as JSON text.
+        for table in TABLES:
+            rows = bind.execute(sa.text(
+                'SELECT id, genres FROM "{}"'.format(table)
+            )).fetchall()
+            for id, genres in rows:
+                bind.execute(sa.text(
+                    'UPDATE "{}" SET genres = :genres WHERE id = :id'
+                    .format(table)
+                ), {'id': id, 'genres': json.dumps(parse_genres(genres))})
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        for table in TABLES:
+            op.drop_index('ix_{}_genres'.format(table), table_name=table)
+            op.alter_column(
+                table, 'genres',
+                type_=sa.String(length=120),
+                postgresql_using='genres::varchar(120)',
+            )
+    else:
+        for table in TABLES:
+            rows = bind.execute(sa.text(
+                'SELECT id, genres FROM "{}"'.format(table)
+            )).fetchall()
+            for id, genres in rows:
+                if genres is not None:
+                    genres = '{' + ','.join(json.loads(genres)) + '}'
+                bind.execute(sa.text(
+                    'UPDATE "{}" SET genres = :genres WHERE id = :id'
+                    .format(table)
+                ), {'id': id, 'genres': genres})
@@ -1,15 +1,35 @@
-from app import db
+from sqlalchemy import DDL, event
+from sqlalchemy.orm import Session, column_property, with_loader_criteria
+
+from extensions import db
 # ----------------------------------------------------------------------------#
 # Models.
 # ----------------------------------------------------------------------------#
 
+# Genre lists: a GIN-indexed text array on PostgreSQL, JSON on SQLite.
+Genres = db.ARRAY(db.String(120)).with_variant(db.JSON(), 'sqlite')
+
 
 class Venue(db.Model):
     __tablename__ = 'Venue'
+    __table_args__ = (
+        db.Index(
+            'ix_Venue_name_trgm', 'name',
+            postgresql_using='gin',
+            postgresql_ops={'name': 'gin_trgm_ops'},
+        ),
+        db.Index('ix_Venue_genres', 'genres', postgresql_using='gin'),
+        # Only deleted venues, for the purge worker.
+        db.Index(
+            'ix_Venue_deleted_at', 'deleted_at',
+            postgresql_where=db.text('deleted_at IS NOT NULL'),
+            sqlite_where=db.text('deleted_at IS NOT NULL'),
+        ),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
-    genres = db.Column(db.String(120))
+    genres = db.Column(Genres)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     address = db.Column(db.String(120))
@@ -19,30 +39,204 @@ class Venue(db.Model):
     website = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean, nullable=False, default=False)
     seeking_description = db.Column(db.String, nullable=True)
+    # Maintained by counters.py; exact as of the show_counts checkpoint.
+    upcoming_shows_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default='0'
+    )
+    past_shows_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default='0'
+    )
+    # Set when the venue is deleted; purge.py removes it and its shows.
+    deleted_at = db.Column(db.DateTime)
     shows = db.relationship('Show', backref='venues', lazy=True)
 
 
 class Artist(db.Model):
     __tablename__ = 'Artist'
+    __table_args__ = (
+        db.Index(
+            'ix_Artist_name_trgm', 'name',
+            postgresql_using='gin',
+            postgresql_ops={'name': 'gin_trgm_ops'},
+        ),
+        db.Index('ix_Artist_genres', 'genres', postgresql_using='gin'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
+    genres = db.Column(Genres)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website = db.Column(db.String(120))
     seeking_venu = db.Column(db.Boolean, nullable=False, default=False)
     seeking_description = db.Column(db.String, nullable=True)
+    # Maintained by counters.py; exact as of the show_counts checkpoint.
+    upcoming_shows_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default='0'
+    )
+    past_shows_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default='0'
+    )
     shows = db.relationship('Show', backref='artists', lazy=True)
 
 
 class Show(db.Model):
     __tablename__ = 'Show'
+    __table_args__ = (
+        db.Index(
+            'ix_Show_venue_id_start_time', 'venue_id', 'start_time', 'end_time'
+        ),
+        db.Index(
+            'ix_Show_artist_id_start_time', 'artist_id', 'start_time',
+            'end_time'
+        ),
+        db.Index('ix_Show_start_time', 'start_time'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'))
-    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'))
-    start_time = db.Column(db.Date)
+    # active_history loads the stored value when these are set on an
+    # expired show, so counters.py can uncount it from the old rows.
+    artist_id = column_property(
+        db.Column(db.Integer, db.ForeignKey('Artist.id')),
+        active_history=True,
+    )
+    venue_id = column_property(
+        db.Column(db.Integer, db.ForeignKey('Venue.id')),
+        active_history=True,
+    )
+    start_time = column_property(db.Column(db.DateTime), active_history=True)
+    end_time = db.Column(db.DateTime)
+
+
+class CounterCheckpoint(db.Model):
+    """The time up to which shows have been rolled into past counts."""
+    __tablename__ = 'CounterCheckpoint'
+
+    name = db.Column(db.String(50), primary_key=True)
+    as_of = db.Column(db.DateTime, nullable=False)
+
+
+# ----------------------------------------------------------------------------#
+# Search indexes.
+# ----------------------------------------------------------------------------#
+
+# PostgreSQL serves name searches from the trigram GIN indexes declared
+# above; SQLite (local runs) mirrors names into FTS5 tables kept in sync by
+# triggers. Both are created here for `db.create_all()` and by the
+# matching migration for deployed databases.
+
+
+def fts_table(model):
+    return '{}_fts'.format(model.__tablename__.lower())
+
+
+def fts_ddl(model):
+    names = dict(table=model.__tablename__, fts=fts_table(model))
+    return [statement.format(**names) for statement in (
+        "CREATE VIRTUAL TABLE {fts} USING fts5("
+        "name, content='{table}', content_rowid='id')",
+        "CREATE TRIGGER {fts}_ai AFTER INSERT ON \"{table}\" BEGIN "
+        "INSERT INTO {fts}(rowid, name) VALUES (new.id, new.name); END",
+        "CREATE TRIGGER {fts}_ad AFTER DELETE ON \"{table}\" BEGIN "
+        "INSERT INTO {fts}({fts}, rowid, name) "
+        "VALUES ('delete', old.id, old.name); END",
+        "CREATE TRIGGER {fts}_au AFTER UPDATE OF name ON \"{table}\" BEGIN "
+        "INSERT INTO {fts}({fts}, rowid, name) "
+        "VALUES ('delete', old.id, old.name); "
+        "INSERT INTO {fts}(rowid, name) VALUES (new.id, new.name); END",
+    )]
+
+
+event.listen(
+    db.metadata,
+    'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    .execute_if(dialect='postgresql'),
+)
+
+for searchable in (Venue, Artist):
+    for statement in fts_ddl(searchable):
+        event.listen(
+            searchable.__table__,
+            'after_create',
+            DDL(statement).execute_if(dialect='sqlite'),
+        )
+    event.listen(
+        searchable.__table__,
+        'after_drop',
+        DDL('DROP TABLE IF EXISTS {}'.format(fts_table(searchable)))
+        .execute_if(dialect='sqlite'),
+    )
+
+
+# ----------------------------------------------------------------------------#
+# Booking constraints.
+# ----------------------------------------------------------------------------#
+
+# On PostgreSQL, GiST exclusion constraints reject overlapping shows at a
+# venue or by an artist, including bookings committed concurrently. Shows
+# without a length (start_time == end_time) are exempt. Other databases
+# rely on the checks in scheduling.py.
+
+
+def booking_constraint_ddl(column):
+    return (
+        'ALTER TABLE "Show" ADD CONSTRAINT "ex_Show_{0}_booking" '
+        'EXCLUDE USING gist ({0} WITH =, '
+        'tsrange(start_time, end_time) WITH &&) '
+        'WHERE (end_time > start_time)'.format(column)
+    )
+
+
+event.listen(
+    db.metadata,
+    'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    .execute_if(dialect='postgresql'),
+)
+
+for booked in ('venue_id', 'artist_id'):
+    event.listen(
+        Show.__table__,
+        'after_create',
+        DDL(booking_constraint_ddl(booked)).execute_if(dialect='postgresql'),
+    )
+
+
+# ----------------------------------------------------------------------------#
+# Show counters.
+# ----------------------------------------------------------------------------#
+
+# Fresh databases start with counts as of the epoch: every show counts as
+# upcoming until the first rollover moves the past ones.
+event.listen(
+    CounterCheckpoint.__table__,
+    'after_create',
+    DDL(
+        'INSERT INTO "CounterCheckpoint" (name, as_of) '
+        "VALUES ('show_counts', '1970-01-01 00:00:00.000000')"
+    ),
+)
+
+
+# ----------------------------------------------------------------------------#
+# Soft delete.
+# ----------------------------------------------------------------------------#
+
+# ORM selects never see deleted venues: listings, search, detail pages and
+# joins through Venue all get ``deleted_at IS NULL``. Pass the execution
+# option ``include_deleted=True`` to see them; Core statements (used by
+# purge.py and counters.py) are not filtered.
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def hide_deleted_venues(state):
+    if (state.is_select and not state.is_column_load
+            and not state.is_relationship_load
+            and not state.execution_options.get('include_deleted', False)):
+        state.statement = state.statement.options(with_loader_criteria(
+            Venue, Venue.deleted_at.is_(None), include_aliases=True,
+        ))
@@ -0,0 +1,140 @@
+import atexit
+import threading
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import select
+
+from extensions import db, detail_cache, task_queue
+from models import Venue, Show
+from counters import count_shows
+from tasks import task
+# ----------------------------------------------------------------------------#
+# Venue deletion.
+# ----------------------------------------------------------------------------#
+
+# Deleting a venue only stamps deleted_at, which hides it at once (see
+# models.py). A queued purge_venue task then deletes its shows
+# PURGE_BATCH_SIZE at a time, each batch in its own short transaction, and
+# finally the venue row, so no delete holds locks for long.
+
+venues = Venue.__table__
+shows = Show.__table__
+
+
+def soft_delete_venue(venue_id):
+    """Mark a venue deleted and schedule its purge.
+
+    Returns False when there is no such (undeleted) venue. Invalidates the
+    cached pages of the venue and of every artist with shows there.
+    """
+    with db.engine.begin() as connection:
+        deleted = connection.execute(
+            venues.update().where(
+                venues.c.id == venue_id, venues.c.deleted_at.is_(None),
+            ).values(deleted_at=datetime.now())
+        ).rowcount
+        artist_ids = [] if not deleted else connection.execute(
+            select(shows.c.artist_id).where(
+                shows.c.venue_id == venue_id
+            ).distinct()
+        ).scalars().all()
+    if not deleted:
+        return False
+    detail_cache.data_changed(
+        ('venue', venue_id),
+        *[('artist', artist_id) for artist_id in artist_ids]
+    )
+    task_queue.enqueue(
+        purge_venue, venue_id, current_app.config.get('PURGE_BATCH_SIZE', 500)
+    )
+    return True
+
+
+@task
+def purge_venue(venue_id, batch_size):
+    """Delete a deleted venue's shows in batches, then the venue.
+
+    Returns the number of shows removed. A batch another worker is already
+    deleting is rolled back and re-read, so shows are never uncounted
+    twice.
+    """
+    purged = 0
+    with db.engine.connect() as connection:
+        while True:
+            with connection.begin() as transaction:
+                batch = connection.execute(
+                    select(
+                        shows.c.id, shows.c.venue_id, shows.c.artist_id,
+                        shows.c.start_time,
+                    ).where(
+                        shows.c.venue_id == venue_id
+                    ).limit(batch_size).with_for_update(skip_locked=True)
+                ).fetchall()
+                if not batch:
+                    connection.execute(venues.delete().where(
+                        venues.c.id == venue_id,
+                        venues.c.deleted_at.isnot(None),
+                    ))
+                    return purged
+                deleted = connection.execute(shows.delete().where(
+                    shows.c.id.in_([row[0] for row in batch])
+                )).rowcount
+                if deleted != len(batch):
+                    transaction.rollback()
+                    continue
+                count_shows(connection, [row[1:] for row in batch], sign=-1)
+            purged += len(batch)
+
+
+def purge_deleted(batch_size):
+    """Purge every deleted venue; returns ``(venues, shows)`` removed."""
+    with db.engine.connect() as connection:
+        venue_ids = connection.execute(
+            select(venues.c.id).where(venues.c.deleted_at.isnot(None))
+        ).scalars().all()
+    purged = 0
+    for venue_id in venue_ids:
+        purged += purge_venue(venue_id, batch_size)
+    return len(venue_ids), purged
+
+
+def init_purge(app):
+    """Sweep up deleted venues every ``PURGE_INTERVAL`` seconds.
+
+    Catches purges whose task was lost or gave up; runs on a daemon thread
+    and 0 disables it (use ``flask purge`` instead).
+    """
+    interval = app.config.get('PURGE_INTERVAL', 30)
+    batch_size = app.config.get('PURGE_BATCH_SIZE', 500)
+    if not interval:
+        return
+    stopping = threading.Event()
+
+    def run():
+        while not stopping.wait(interval):
+            with app.app_context():
+                try:
+                    venue_count, show_count = purge_deleted(batch_size)
+                    if venue_count:
+                        app.logger.info('purged venues', extra={
+                            'venues': venue_count, 'shows': show_count,
+                        })
+                except Exception:
+                    app.logger.exception('venue purge failed')
+
+    threading.Thread(target=run, name='purge', daemon=True).start()
+    atexit.register(stopping.set)
+
+
+@click.command('purge')
+@click.option('--batch-size', default=500, show_default=True,
+              help='Shows deleted per transaction.')
+@with_appcontext
+def purge_command(batch_size):
+    """Remove deleted venues and their shows."""
+    venue_count, show_count = purge_deleted(batch_size)
+    click.echo('Purged {} venues and {} shows'.format(
+        venue_count, show_count))
@@ -0,0 +1,366 @@
+from datetime import datetime
+from itertools import groupby
+
+import dateutil.parser
+from sqlalchemy import and_, or_, func, text
+
+from extensions import db
+from models import Venue, Artist, Show
+# ----------------------------------------------------------------------------#
+# Queries.
+# ----------------------------------------------------------------------------#
+
+SHOWS_PER_PAGE = 30
+
+# Fields exposed by the JSON API, by name, with the column backing each;
+# names match the keys of venue_detail and artist_detail.
+VENUE_FIELDS = {
+    'id': Venue.id,
+    'name': Venue.name,
+    'genres': Venue.genres,
+    'address': Venue.address,
+    'city': Venue.city,
+    'state': Venue.state,
+    'phone': Venue.phone,
+    'website': Venue.website,
+    'facebook_link': Venue.facebook_link,
+    'seeking_talent': Venue.seeking_talent,
+    'seeking_description': Venue.seeking_description,
+    'image_link': Venue.image_link,
+    'upcoming_shows_count': Venue.upcoming_shows_count,
+    'past_shows_count': Venue.past_shows_count,
+}
+
+ARTIST_FIELDS = {
+    'id': Artist.id,
+    'name': Artist.name,
+    'genres': Artist.genres,
+    'city': Artist.city,
+    'state': Artist.state,
+    'phone': Artist.phone,
+    'website': Artist.website,
+    'facebook_link': Artist.facebook_link,
+    'seeking_venue': Artist.seeking_venu,
+    'seeking_description': Artist.seeking_description,
+    'image_link': Artist.image_link,
+    'upcoming_shows_count': Artist.upcoming_shows_count,
+    'past_shows_count': Artist.past_shows_count,
+}
+
+
+def genre_filter(model, genre):
+    """Filter clause matching ``model`` rows listing ``genre``.
+
+    Uses array containment (served by the GIN index) on PostgreSQL and a
+    json_each lookup on SQLite.
+    """
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return model.genres.contains([genre])
+    return text(
+        'EXISTS (SELECT 1 FROM json_each("{}".genres) '
+        'WHERE json_each.value = :genre)'.format(model.__tablename__)
+    ).bindparams(genre=genre)
+
+
+def venue_areas(genre=None):
+    """Return venues grouped by (city, state) with upcoming show counts.
+
+    Reads the materialized counters (see counters.py) rather than Show.
+    ``genre`` restricts the listing to venues of that genre.
+    """
+    query = db.session.query(
+        Venue.city,
+        Venue.state,
+        Venue.id,
+        Venue.name,
+        Venue.upcoming_shows_count,
+    )
+    if genre is not None:
+        query = query.filter(genre_filter(Venue, genre))
+
+    rows = query.order_by(
+        Venue.state, Venue.city, Venue.name,
+    ).all()
+
+    areas = []
+    for (city, state), venues in groupby(rows, key=lambda row: row[:2]):
+        areas.append({
+            'city': city,
+            'state': state,
+            'venues': [{
+                'id': venue_id,
+                'name': name,
+                'num_upcoming_shows': num_upcoming_shows,
+            } for _, _, venue_id, name, num_upcoming_shows in venues]
+        })
+
+    return areas
+
+
+def artist_listing(genre=None):
+    """Return ``[{'id', 'name'}]`` for all artists, optionally by genre."""
+    query = db.session.query(Artist.id, Artist.name)
+    if genre is not None:
+        query = query.filter(genre_filter(Artist, genre))
+
+    return [
+        {'id': id, 'name': name}
+        for id, name in query.order_by(Artist.name)
+    ]
+
+
+def decode_id(value):
+    """The id in a cursor; raises ValueError unless it fits a BIGINT."""
+    id = int(value)
+    if not 0 <= id < 2 ** 63:
+        raise ValueError('invalid cursor id {!r}'.format(value))
+    return id
+
+
+def keyset_listing(model, fields, after=None, limit=SHOWS_PER_PAGE,
+                   genre=None):
+    """Return one page of ``model`` rows, ordered by id, as dicts.
+
+    Only the columns in ``fields`` (a name -> column mapping, see
+    VENUE_FIELDS) are selected. ``after`` is the cursor returned with the
+    previous page. Returns ``(rows, next_cursor)`` where ``next_cursor``
+    is None on the last page; raises ValueError on a malformed cursor.
+    """
+    names = list(fields)
+    query = db.session.query(model.id, *fields.values())
+    if genre is not None:
+        query = query.filter(genre_filter(model, genre))
+    if after is not None:
+        query = query.filter(model.id > decode_id(after))
+
+    rows = query.order_by(model.id).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = str(rows[-1][0])
+
+    return [dict(zip(names, row[1:])) for row in rows], next_cursor
+
+
+def split_shows(rows, current_time):
+    """Partition (start_time, show dict) rows into past and upcoming."""
+    past_shows, upcoming_shows = [], []
+    today = current_time.date()
+    for start_time, show in rows:
+        if start_time is None:
+            continue
+        now = current_time if isinstance(start_time, datetime) else today
+        if start_time > now:
+            upcoming_shows.append(show)
+        else:
+            past_shows.append(show)
+    return past_shows, upcoming_shows
+
+
+def detail_keys(kind, id):
+    """Cache keys of the detail pages that show ``kind`` ``id``.
+
+    That is its own page and the pages of the artists (for a venue) or
+    venues (for an artist) it shares shows with, which embed its name and
+    image.
+    """
+    if kind == 'venue':
+        own, other, other_kind = Show.venue_id, Show.artist_id, 'artist'
+    else:
+        own, other, other_kind = Show.artist_id, Show.venue_id, 'venue'
+    related = db.session.query(other).filter(own == id).distinct()
+    return [(kind, id)] + [(other_kind, other_id) for other_id, in related]
+
+
+def venue_detail(venue_id, current_time=None):
+    """Load a venue and its shows, with artist names, in one query.
+
+    Returns the dict rendered by ``pages/show_venue.html`` or None when the
+    venue does not exist.
+    """
+    if current_time is None:
+        current_time = datetime.now()
+
+    rows = db.session.query(
+        Venue, Show.start_time, Artist.id, Artist.name, Artist.image_link,
+    ).outerjoin(
+        Show, Show.venue_id == Venue.id,
+    ).outerjoin(
+        Artist, Artist.id == Show.artist_id,
+    ).filter(
+        Venue.id == venue_id,
+    ).order_by(
+        Show.start_time,
+    ).all()
+
+    if not rows:
+        return None
+
+    venue = rows[0][0]
+    past_shows, upcoming_shows = split_shows((
+        (start_time, {
+            'artist_id': artist_id,
+            'artist_name': artist_name,
+            'artist_image_link': artist_image_link,
+            'start_time': start_time,
+        }) for _, start_time, artist_id, artist_name, artist_image_link
+        in rows
+    ), current_time)
+
+    return {
+        'id': venue.id,
+        'name': venue.name,
+        'genres': venue.genres,
+        'address': venue.address,
+        'city': venue.city,
+        'state': venue.state,
+        'phone': venue.phone,
+        'website': venue.website,
+        'facebook_link': venue.facebook_link,
+        'seeking_talent': venue.seeking_talent,
+        'seeking_description': venue.seeking_description,
+        'image_link': venue.image_link,
+        'past_shows': past_shows,
+        'upcoming_shows': upcoming_shows,
+        'past_shows_count': len(past_shows),
+        'upcoming_shows_count': len(upcoming_shows),
+    }
+
+
+def artist_detail(artist_id, current_time=None):
+    """Load an artist and its shows, with venue names, in one query.
+
+    Returns the dict rendered by ``pages/show_artist.html`` or None when
+    the artist does not exist.
+    """
+    if current_time is None:
+        current_time = datetime.now()
+
+    rows = db.session.query(
+        Artist, Show.start_time, Venue.id, Venue.name, Venue.image_link,
+    ).outerjoin(
+        Show, Show.artist_id == Artist.id,
+    ).outerjoin(
+        Venue, Venue.id == Show.venue_id,
+    ).filter(
+        Artist.id == artist_id,
+    ).order_by(
+        Show.start_time,
+    ).all()
+
+    if not rows:
+        return None
+
+    artist = rows[0][0]
+    past_shows, upcoming_shows = split_shows((
+        (start_time, {
+            'venue_id': venue_id,
+            'venue_name': venue_name,
+            'venue_image_link': venue_image_link,
+            'start_time': start_time,
+        }) for _, start_time, venue_id, venue_name, venue_image_link
+        in rows
+        # Shows at deleted venues outer-join to no venue.
+        if venue_id is not None
+    ), current_time)
+
+    return {
+        'id': artist.id,
+        'name': artist.name,
+        'genres': artist.genres,
+        'city': artist.city,
+        'state': artist.state,
+        'phone': artist.phone,
+        'website': artist.website,
+        'facebook_link': artist.facebook_link,
+        'seeking_venue': artist.seeking_venu,
+        'seeking_description': artist.seeking_description,
+        'image_link': artist.image_link,
+        'past_shows': past_shows,
+        'upcoming_shows': upcoming_shows,
+        'past_shows_count': len(past_shows),
+        'upcoming_shows_count': len(upcoming_shows),
+    }
+
+
+def as_start_time(value):
+    """Coerce a parsed datetime to the python type of Show.start_time."""
+    if Show.start_time.type.python_type is datetime:
+        return value
+    return value.date()
+
+
+def encode_show_cursor(start_time, show_id):
+    return '{}_{}'.format(start_time.isoformat(), show_id)
+
+
+def decode_show_cursor(cursor):
+    """Inverse of encode_show_cursor; raises ValueError on bad input."""
+    start_time, _, show_id = cursor.rpartition('_')
+    try:
+        start_time = as_start_time(dateutil.parser.parse(start_time))
+    except OverflowError:
+        raise ValueError('invalid cursor {!r}'.format(cursor))
+    return start_time, decode_id(show_id)
+
+
+def show_listing(after=None, start=None, end=None, limit=SHOWS_PER_PAGE):
+    """Return one page of shows, with venue and artist names, in one query.
+
+    Shows are ordered by (start_time, id) and paged by keyset: ``after`` is
+    the cursor of the last show on the previous page. ``start`` and ``end``
+    optionally bound start_time (inclusive). Returns ``(shows, next_cursor)``
+    where ``next_cursor`` is None on the last page.
+    """
+    query = db.session.query(
+        Show.id,
+        Show.start_time,
+        Show.end_time,
+        Venue.id,
+        Venue.name,
+        Artist.id,
+        Artist.name,
+        Artist.image_link,
+    ).join(
+        Venue, Venue.id == Show.venue_id,
+    ).join(
+        Artist, Artist.id == Show.artist_id,
+    )
+
+    if start is not None:
+        query = query.filter(Show.start_time >= as_start_time(start))
+    if end is not None:
+        query = query.filter(Show.start_time <= as_start_time(end))
+    if after is not None:
+        after_time, after_id = decode_show_cursor(after)
+        # The redundant lower bound lets the planner seek the start_time
+        # index instead of scanning it from the beginning.
+        query = query.filter(
+            Show.start_time >= after_time,
+            or_(
+                Show.start_time > after_time,
+                and_(Show.start_time == after_time, Show.id > after_id),
+            ),
+        )
+
+    rows = query.order_by(Show.start_time, Show.id).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_show_cursor(rows[-1][1], rows[-1][0])
+
+    shows = [{
+        'id': id,
+        'venue_id': venue_id,
+        'venue_name': venue_name,
+        'artist_id': artist_id,
+        'artist_name': artist_name,
+        'artist_image_link': artist_image_link,
+        'start_time': start_time,
+        'end_time': end_time,
+    } for id, start_time, end_time, venue_id, venue_name, artist_id,
+        artist_name, artist_image_link in rows]
+
+    return shows, next_cursor
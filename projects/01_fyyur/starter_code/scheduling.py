@@ -0,0 +1,253 @@
+from datetime import timedelta, timezone
+from functools import lru_cache
+
+import dateutil.parser
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table, and_, \
+    bindparam
+
+from extensions import db
+from models import Show
+# ----------------------------------------------------------------------------#
+# Scheduling.
+# ----------------------------------------------------------------------------#
+
+# Length given to shows submitted without an end time.
+DEFAULT_SHOW_DURATION = timedelta(hours=2)
+# Longest show accepted. Bounding durations means a show overlapping
+# [start, end) must start in (start - MAX_SHOW_DURATION, end), so every
+# check is a short range scan of the (venue_id|artist_id, start_time,
+# end_time) indexes whatever the number of shows.
+MAX_SHOW_DURATION = timedelta(hours=24)
+# Widest window free_slots answers for.
+MAX_AVAILABILITY_WINDOW = timedelta(days=92)
+
+
+class SchedulingError(ValueError):
+    pass
+
+
+class BookingConflict(SchedulingError):
+    """The show overlaps existing shows at its venue or by its artist."""
+
+    def __init__(self, conflicts):
+        self.conflicts = conflicts
+        super(BookingConflict, self).__init__(
+            'conflicts with show(s) {}'.format(
+                ', '.join(str(show['id']) for show in conflicts))
+        )
+
+
+def parse_time(value):
+    """Parse a date/time string as a naive datetime.
+
+    Show times are stored naive, and comparing them with aware datetimes
+    raises, so times given with an offset are converted to UTC.
+    """
+    parsed = dateutil.parser.parse(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def show_interval(start, end=None):
+    """Validate a show's times and return ``(start, end)``.
+
+    ``end`` defaults to ``start + DEFAULT_SHOW_DURATION``.
+    """
+    if start is None:
+        raise SchedulingError('start time is required')
+    if end is None:
+        end = start + DEFAULT_SHOW_DURATION
+    if end <= start:
+        raise SchedulingError('end time must be after start time')
+    if end - start > MAX_SHOW_DURATION:
+        raise SchedulingError('shows may last at most {} hours'.format(
+            int(MAX_SHOW_DURATION.total_seconds() // 3600)))
+    return start, end
+
+
+def booking_window(start, end, earliest=None):
+    """Filter clause for shows overlapping [start, end).
+
+    ``earliest`` (default ``start - MAX_SHOW_DURATION``) bounds the index
+    scan. Shows stored without a length (start_time == end_time, from
+    before shows had an end time) never conflict, matching the PostgreSQL
+    exclusion constraints.
+    """
+    if earliest is None:
+        earliest = start - MAX_SHOW_DURATION
+    return and_(
+        Show.start_time > earliest,
+        Show.start_time < end,
+        Show.end_time > start,
+        Show.end_time > Show.start_time,
+    )
+
+
+@lru_cache(maxsize=None)
+def conflicts_statement():
+    """The conflict lookup, built once: one range scan per index.
+
+    Building the expression costs several times more than running it, so
+    calls only bind parameters.
+    """
+    window = booking_window(
+        bindparam('start', type_=Show.start_time.type),
+        bindparam('end', type_=Show.end_time.type),
+        bindparam('earliest', type_=Show.start_time.type),
+    )
+
+    def overlapping(column, value):
+        return db.session.query(
+            Show.id, Show.venue_id, Show.artist_id,
+            Show.start_time, Show.end_time,
+        ).filter(
+            column == bindparam(value),
+            window,
+            Show.id != bindparam('exclude_id'),
+        )
+
+    return overlapping(Show.venue_id, 'venue_id').union_all(
+        overlapping(Show.artist_id, 'artist_id')
+    ).statement
+
+
+def find_conflicts(venue_id, artist_id, start, end, exclude_id=None):
+    """Return the shows double-booking ``venue_id`` or ``artist_id``.
+
+    ``exclude_id`` skips the show being rescheduled.
+    """
+    rows = db.session.execute(conflicts_statement(), {
+        'venue_id': venue_id,
+        'artist_id': artist_id,
+        'start': start,
+        'end': end,
+        'earliest': start - MAX_SHOW_DURATION,
+        # Ids start at 1, so 0 excludes nothing.
+        'exclude_id': exclude_id or 0,
+    })
+
+    conflicts = {}
+    for id, show_venue_id, show_artist_id, show_start, show_end in rows:
+        conflicts[id] = {
+            'id': id,
+            'venue_id': show_venue_id,
+            'artist_id': show_artist_id,
+            'start_time': show_start,
+            'end_time': show_end,
+        }
+    return sorted(conflicts.values(), key=lambda show: show['start_time'])
+
+
+# Bookings checked by find_batch_conflicts, loaded into a temporary
+# table so a batch costs one executemany and one cached join whatever its
+# size.
+batch_bookings = Table(
+    'batch_bookings', MetaData(),
+    Column('number', Integer, primary_key=True),
+    Column('venue_id', Integer, nullable=False),
+    Column('artist_id', Integer, nullable=False),
+    Column('start_time', DateTime, nullable=False),
+    Column('end_time', DateTime, nullable=False),
+    Column('earliest', DateTime, nullable=False),
+    prefixes=['TEMPORARY'],
+)
+
+
+@lru_cache(maxsize=None)
+def batch_conflicts_statement():
+    """The join of batch_bookings against the shows, built once."""
+    candidates = batch_bookings.c
+
+    def overlapping(show_column, candidate_column):
+        return db.session.query(candidates.number, Show.id).join(
+            Show, and_(
+                show_column == candidate_column,
+                booking_window(
+                    candidates.start_time, candidates.end_time,
+                    candidates.earliest,
+                ),
+            ),
+        )
+
+    return overlapping(Show.venue_id, candidates.venue_id).union_all(
+        overlapping(Show.artist_id, candidates.artist_id)
+    ).statement
+
+
+def find_batch_conflicts(bookings):
+    """Check many bookings against the stored shows at once.
+
+    ``bookings`` holds ``(key, venue_id, artist_id, start, end)`` tuples
+    with validated times. Returns ``{key: [conflicting show ids]}`` for
+    the ones that double-book their venue or artist, found with the same
+    index range scans as find_conflicts but in a single query.
+    """
+    if not bookings:
+        return {}
+    connection = db.session.connection()
+    batch_bookings.create(connection, checkfirst=True)
+    connection.execute(batch_bookings.insert(), [
+        {
+            'number': number,
+            'venue_id': venue_id,
+            'artist_id': artist_id,
+            'start_time': start,
+            'end_time': end,
+            'earliest': start - MAX_SHOW_DURATION,
+        }
+        for number, (_, venue_id, artist_id, start, end)
+        in enumerate(bookings)
+    ])
+    try:
+        rows = connection.execute(batch_conflicts_statement()).fetchall()
+    finally:
+        connection.execute(batch_bookings.delete())
+
+    conflicts = {}
+    for number, show_id in rows:
+        ids = conflicts.setdefault(bookings[number][0], [])
+        if show_id not in ids:
+            ids.append(show_id)
+    return conflicts
+
+
+def check_booking(venue_id, artist_id, start, end=None, exclude_id=None):
+    """Validate a booking; return ``(start, end)`` or raise.
+
+    Raises SchedulingError for invalid times and BookingConflict when the
+    venue or artist is already booked. On PostgreSQL the exclusion
+    constraints also reject overlaps committed concurrently.
+    """
+    start, end = show_interval(start, end)
+    conflicts = find_conflicts(venue_id, artist_id, start, end, exclude_id)
+    if conflicts:
+        raise BookingConflict(conflicts)
+    return start, end
+
+
+def free_slots(venue_id, start, end, min_length=timedelta(0)):
+    """Return the free ``(start, end)`` gaps at a venue within [start, end).
+
+    Sweeps the venue's shows in the window in start order, so the cost is
+    one index range scan plus one step per show.
+    """
+    if end <= start:
+        raise SchedulingError('end must be after start')
+    if end - start > MAX_AVAILABILITY_WINDOW:
+        raise SchedulingError('window may span at most {} days'.format(
+            MAX_AVAILABILITY_WINDOW.days))
+
+    booked = db.session.query(Show.start_time, Show.end_time).filter(
+        Show.venue_id == venue_id, booking_window(start, end)
+    ).order_by(Show.start_time)
+
+    slots = []
+    free_from = start
+    for show_start, show_end in booked:
+        if show_start > free_from and show_start - free_from >= min_length:
+            slots.append((free_from, show_start))
+        free_from = max(free_from, show_end)
+    if free_from < end and end - free_from >= min_length:
+        slots.append((free_from, end))
+    return slots
@@ -0,0 +1,82 @@
+from sqlalchemy import func, literal_column, table, column
+
+from extensions import db
+from models import fts_table
+# ----------------------------------------------------------------------------#
+# Search.
+# ----------------------------------------------------------------------------#
+
+RESULTS_PER_PAGE = 20
+
+
+def escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def fts_query(term, prefix=False):
+    """Build an FTS5 MATCH expression: every word must match as a prefix.
+
+    With ``prefix`` the first word must also start the name, which is what
+    type-ahead wants.
+    """
+    words = ['"{}"*'.format(word.replace('"', '""')) for word in term.split()]
+    if prefix:
+        words[0] = '^' + words[0]
+    return ' '.join(words)
+
+
+def search_by_name(model, term, page=1, per_page=RESULTS_PER_PAGE,
+                   prefix=False):
+    """Search ``model`` rows by name in the database.
+
+    Returns ``{'count', 'page', 'has_next', 'data': [{'id', 'name'}]}``
+    with at most ``per_page`` rows in ``data``. Matching and ranking run
+    in SQL: trigram similarity over an ILIKE filter on PostgreSQL, FTS5
+    rank on SQLite and name order everywhere else.
+    """
+    term = (term or '').strip()
+    page = max(page, 1)
+    if not term:
+        return {'count': 0, 'page': page, 'has_next': False, 'data': []}
+
+    dialect = db.session.get_bind().dialect.name
+    query = db.session.query(
+        model.id, model.name, func.count().over(),
+    )
+
+    if dialect == 'sqlite':
+        fts = table(fts_table(model), column('rowid'))
+        query = query.join(
+            fts, fts.c.rowid == model.id,
+        ).filter(
+            literal_column(fts.name).op('MATCH')(fts_query(term, prefix)),
+        ).order_by(
+            literal_column('{}.rank'.format(fts.name)), model.name,
+        )
+    else:
+        pattern = escape_like(term) + '%'
+        if not prefix:
+            pattern = '%' + pattern
+        query = query.filter(model.name.ilike(pattern, escape='\\'))
+        if dialect == 'postgresql':
+            query = query.order_by(
+                func.similarity(model.name, term).desc(), model.name,
+            )
+        else:
+            query = query.order_by(model.name)
+
+    rows = query.limit(per_page).offset((page - 1) * per_page).all()
+
+    if rows:
+        count = rows[0][2]
+    elif page > 1:
+        count = query.order_by(None).count()
+    else:
+        count = 0
+
+    return {
+        'count': count,
+        'page': page,
+        'has_next': count > page * per_page,
+        'data': [{'id': id, 'name': name} for id, name, _ in rows],
+    }
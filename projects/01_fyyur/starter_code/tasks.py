@@ -0,0 +1,360 @@
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+# ----------------------------------------------------------------------------#
+# Background tasks.
+# ----------------------------------------------------------------------------#
+
+# Side effects of a write (cache warming, link checks, purges) run as
+# tasks off the request thread. Tasks are plain functions registered with
+# @task and queued by name with JSON-serializable arguments, so the same
+# call works whether they run on an in-process worker pool or in a
+# separate `flask worker` process fed through a SQLite broker file.
+
+TASKS = {}
+
+
+def task(function):
+    """Register ``function`` so it can be queued by name."""
+    TASKS[function.__name__] = function
+    return function
+
+
+def percentiles(samples):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return {
+        'p50': round(ordered[len(ordered) // 2] * 1000, 2),
+        'p95': round(ordered[int(len(ordered) * 0.95)] * 1000, 2),
+    }
+
+
+class TaskQueue(object):
+    """Base task queue keeping counters and latency samples.
+
+    Backends implement ``submit(job)`` and ``depth()``; callers use
+    ``enqueue``. A job that raises is retried up to ``max_retries`` times,
+    ``backoff * 2 ** n`` seconds apart, then logged and dropped.
+    """
+
+    def __init__(self, app, max_retries=3, backoff=1.0):
+        self.app = app
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.lock = threading.Lock()
+        self.enqueued = 0
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+        self.wait_times = deque(maxlen=1000)
+        self.run_times = deque(maxlen=1000)
+
+    def enqueue(self, function, *args):
+        """Queue ``function(*args)``; returns False if it could not be.
+
+        Never raises, so a request that already committed its write does
+        not fail because a side effect could not be queued.
+        """
+        name = getattr(function, '__name__', function)
+        try:
+            if name not in TASKS:
+                raise KeyError('unknown task {}'.format(name))
+            now = time.time()
+            self.submit({
+                'name': name, 'args': list(args), 'attempt': 0, 'ready': now,
+            })
+        except Exception:
+            self.app.logger.exception('could not queue task', extra={
+                'task': name,
+            })
+            return False
+        with self.lock:
+            self.enqueued += 1
+        return True
+
+    def run(self, job):
+        """Run one job and return ``(ok, retry_delay)``.
+
+        ``(True, None)`` when it succeeded, ``(False, delay)`` when it
+        should run again after ``delay`` seconds and ``(False, None)``
+        when it has used up its retries.
+        """
+        started = time.time()
+        try:
+            with self.app.app_context():
+                TASKS[job['name']](*job['args'])
+        except Exception:
+            if job['attempt'] < self.max_retries:
+                delay = self.backoff * 2 ** job['attempt']
+                self.app.logger.warning('task failed, retrying', extra={
+                    'task': job['name'], 'attempt': job['attempt'] + 1,
+                    'retry_in': delay,
+                }, exc_info=True)
+                with self.lock:
+                    self.retried += 1
+                return False, delay
+            self.app.logger.exception('task failed', extra={
+                'task': job['name'], 'attempt': job['attempt'] + 1,
+            })
+            with self.lock:
+                self.failed += 1
+            return False, None
+        else:
+            with self.lock:
+                self.completed += 1
+            return True, None
+        finally:
+            with self.lock:
+                self.wait_times.append(started - job['ready'])
+                self.run_times.append(time.time() - started)
+
+    def stats(self):
+        depth = self.depth()
+        with self.lock:
+            return {
+                'backend': type(self).__name__,
+                'depth': depth,
+                'enqueued': self.enqueued,
+                'completed': self.completed,
+                'retried': self.retried,
+                'failed': self.failed,
+                'wait_ms': percentiles(self.wait_times),
+                'run_ms': percentiles(self.run_times),
+            }
+
+
+class ThreadQueue(TaskQueue):
+    """In-process queue drained by a pool of daemon worker threads.
+
+    Threads start on the first task. Queued tasks live in memory only and
+    are lost if the process exits.
+    """
+
+    def __init__(self, app, workers=4, **kwargs):
+        super(ThreadQueue, self).__init__(app, **kwargs)
+        self.workers = workers
+        self.jobs = queue.Queue()
+        self.started = False
+
+    def start(self):
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+        for number in range(self.workers):
+            threading.Thread(
+                target=self.work, name='task-{}'.format(number), daemon=True
+            ).start()
+
+    def submit(self, job):
+        self.start()
+        self.jobs.put(job)
+
+    def work(self):
+        while True:
+            job = self.jobs.get()
+            try:
+                _, delay = self.run(job)
+                if delay is not None:
+                    self.retry_later(job, delay)
+            finally:
+                self.jobs.task_done()
+
+    def retry_later(self, job, delay):
+        job = dict(job, attempt=job['attempt'] + 1, ready=time.time() + delay)
+        timer = threading.Timer(delay, self.jobs.put, (job,))
+        timer.daemon = True
+        timer.start()
+
+    def depth(self):
+        return self.jobs.qsize()
+
+
+class SQLiteQueue(TaskQueue):
+    """Durable queue in a local SQLite file, drained by ``flask worker``.
+
+    Workers claim a task by leasing it for ``lease`` seconds; a task whose
+    worker died is picked up again once its lease expires. Tasks that
+    exhaust their retries stay in the file, marked failed.
+    """
+
+    def __init__(self, app, path, lease=300, poll=0.5, **kwargs):
+        super(SQLiteQueue, self).__init__(app, **kwargs)
+        self.path = path
+        self.lease = lease
+        self.poll = poll
+        connection = self.connect()
+        try:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS tasks ('
+                'id INTEGER PRIMARY KEY, name TEXT NOT NULL, '
+                'args TEXT NOT NULL, attempt INTEGER NOT NULL DEFAULT 0, '
+                'ready REAL NOT NULL, locked_until REAL, '
+                'failed INTEGER NOT NULL DEFAULT 0)'
+            )
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS ix_tasks_ready '
+                'ON tasks (failed, ready)'
+            )
+        finally:
+            connection.close()
+
+    def connect(self):
+        connection = sqlite3.connect(
+            self.path, timeout=30, isolation_level=None
+        )
+        connection.execute('PRAGMA journal_mode=WAL')
+        return connection
+
+    def submit(self, job):
+        connection = self.connect()
+        try:
+            connection.execute(
+                'INSERT INTO tasks (name, args, attempt, ready) '
+                'VALUES (?, ?, ?, ?)',
+                (job['name'], json.dumps(job['args']), job['attempt'],
+                 job['ready']),
+            )
+        finally:
+            connection.close()
+
+    def claim(self, connection):
+        now = time.time()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT id, name, args, attempt, ready FROM tasks '
+                'WHERE failed = 0 AND ready <= ? '
+                'AND (locked_until IS NULL OR locked_until < ?) '
+                'ORDER BY ready LIMIT 1',
+                (now, now),
+            ).fetchone()
+            if row is not None:
+                connection.execute(
+                    'UPDATE tasks SET locked_until = ? WHERE id = ?',
+                    (now + self.lease, row[0]),
+                )
+        finally:
+            connection.execute('COMMIT')
+        if row is None:
+            return None
+        id, name, args, attempt, ready = row
+        return {'id': id, 'name': name, 'args': json.loads(args),
+                'attempt': attempt, 'ready': ready}
+
+    def finish(self, connection, job, ok, delay):
+        if ok:
+            connection.execute('DELETE FROM tasks WHERE id = ?', (job['id'],))
+        elif delay is None:
+            connection.execute(
+                'UPDATE tasks SET failed = 1, attempt = attempt + 1, '
+                'locked_until = NULL WHERE id = ?', (job['id'],))
+        else:
+            connection.execute(
+                'UPDATE tasks SET attempt = attempt + 1, ready = ?, '
+                'locked_until = NULL WHERE id = ?',
+                (time.time() + delay, job['id']),
+            )
+
+    def work(self, stopping):
+        connection = self.connect()
+        try:
+            while not stopping.is_set():
+                job = self.claim(connection)
+                if job is None:
+                    stopping.wait(self.poll)
+                    continue
+                if job['name'] in TASKS:
+                    ok, delay = self.run(job)
+                else:
+                    self.app.logger.error('unknown task', extra={
+                        'task': job['name'],
+                    })
+                    ok, delay = False, None
+                self.finish(connection, job, ok, delay)
+        finally:
+            connection.close()
+
+    def depth(self):
+        connection = self.connect()
+        try:
+            return connection.execute(
+                'SELECT count(*) FROM tasks WHERE failed = 0'
+            ).fetchone()[0]
+        finally:
+            connection.close()
+
+    def stats(self):
+        stats = super(SQLiteQueue, self).stats()
+        connection = self.connect()
+        try:
+            oldest, dead = connection.execute(
+                'SELECT min(CASE WHEN failed = 0 THEN ready END), '
+                'sum(failed) FROM tasks'
+            ).fetchone()
+        finally:
+            connection.close()
+        stats.update(
+            oldest_wait_ms=round(max(0, time.time() - oldest) * 1000, 2)
+            if oldest is not None else None,
+            dead=dead or 0,
+        )
+        return stats
+
+
+def make_queue(app):
+    """Build the task queue selected by ``TASK_BACKEND`` in the app config."""
+    config = app.config
+    options = {
+        'max_retries': config.get('TASK_MAX_RETRIES', 3),
+        'backoff': config.get('TASK_RETRY_BACKOFF', 1.0),
+    }
+    if config.get('TASK_BACKEND', 'thread') == 'sqlite':
+        task_queue = SQLiteQueue(
+            app,
+            config.get('TASK_BROKER_PATH', os.path.join(
+                app.root_path, 'tasks.db')),
+            **options
+        )
+    else:
+        task_queue = ThreadQueue(
+            app, workers=config.get('TASK_WORKERS', 4), **options
+        )
+    app.extensions['tasks'] = task_queue
+    return task_queue
+
+
+@click.command('worker')
+@click.option('--workers', default=4, show_default=True,
+              help='Worker threads.')
+@with_appcontext
+def worker_command(workers):
+    """Run tasks from the SQLite broker (TASK_BACKEND=sqlite)."""
+    task_queue = current_app.extensions['tasks']
+    if not isinstance(task_queue, SQLiteQueue):
+        raise click.UsageError('the worker needs TASK_BACKEND=sqlite')
+    stopping = threading.Event()
+    atexit.register(stopping.set)
+    threads = [
+        threading.Thread(target=task_queue.work, args=(stopping,),
+                         name='task-{}'.format(number), daemon=True)
+        for number in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+    click.echo('Running {} workers on {}'.format(workers, task_queue.path))
+    try:
+        while any(thread.is_alive() for thread in threads):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stopping.set()
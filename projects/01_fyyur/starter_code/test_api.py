@@ -0,0 +1,74 @@
+import json
+import unittest
+
+from testing import FyyurTestCase, hours_from_now
+
+
+class ApiTestCase(FyyurTestCase):
+    """/api/v1 serves sparse fieldsets, cursor pages and JSON Lines"""
+
+    def test_sparse_fields(self):
+        venue = self.add_venue()
+
+        res = self.client.get('/api/v1/venues?fields=id,name')
+
+        self.assertEqual(res.get_json()['data'], [
+            {'id': venue.id, 'name': 'The Musical Hop'},
+        ])
+
+    def test_400_unknown_field(self):
+        res = self.client.get('/api/v1/venues?fields=id,secret')
+
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(res.get_json()['error'], 400)
+
+    def test_cursor_pages(self):
+        for number in range(5):
+            self.add_artist('Artist {}'.format(number))
+
+        names = []
+        url = '/api/v1/artists?fields=name&limit=2'
+        while True:
+            body = self.client.get(url).get_json()
+            names.extend(artist['name'] for artist in body['data'])
+            if body['next_cursor'] is None:
+                break
+            url = '/api/v1/artists?fields=name&limit=2&after={}'.format(
+                body['next_cursor'])
+
+        self.assertEqual(
+            sorted(names), ['Artist {}'.format(n) for n in range(5)])
+
+    def test_jsonl_stream(self):
+        venue = self.add_venue()
+        artist = self.add_artist()
+        for number in range(3):
+            self.add_show(venue, artist, hours_from_now(24 * (number + 1)))
+
+        res = self.client.get('/api/v1/shows?format=jsonl&fields=id')
+
+        self.assertEqual(res.mimetype, 'application/x-ndjson')
+        lines = res.get_data(True).splitlines()
+        self.assertEqual(len([json.loads(line) for line in lines]), 3)
+
+    def test_400_bad_show_time(self):
+        res = self.client.get('/api/v1/shows?from=tomorrowish')
+
+        self.assertEqual(res.status_code, 400)
+        self.assertIn('from', res.get_json()['message'])
+
+    def test_shows_from_a_time_with_an_offset(self):
+        venue = self.add_venue()
+        artist = self.add_artist()
+        self.add_show(venue, artist, hours_from_now(48))
+
+        res = self.client.get(
+            '/api/v1/shows?from=2000-01-01T00:00:00%2B02:00')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(res.get_json()['data']), 1)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
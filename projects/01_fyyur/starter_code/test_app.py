@@ -0,0 +1,59 @@
+import unittest
+
+from app import create_app, engine_options
+from extensions import db
+from models import Venue
+from testing import FyyurTestCase
+
+
+class EngineOptionsTestCase(unittest.TestCase):
+    """Engine options follow the database URI create_app ends up with"""
+
+    def test_sqlite_app_builds_and_queries(self):
+        app = create_app(SQLALCHEMY_DATABASE_URI='sqlite://')
+
+        self.assertEqual(app.config['SQLALCHEMY_ENGINE_OPTIONS'], {})
+        with app.app_context():
+            db.create_all()
+            self.assertEqual(Venue.query.count(), 0)
+
+    def test_postgres_gets_pool_and_statement_timeout(self):
+        options = engine_options({
+            'SQLALCHEMY_DATABASE_URI': 'postgresql://localhost/fyyur',
+            'DB_POOL_SIZE': 3,
+            'DB_STATEMENT_TIMEOUT': 1000,
+        })
+
+        self.assertEqual(options['pool_size'], 3)
+        self.assertEqual(
+            options['connect_args'],
+            {'options': '-c statement_timeout=1000'},
+        )
+
+    def test_explicit_options_win(self):
+        options = engine_options({
+            'SQLALCHEMY_DATABASE_URI': 'mysql://localhost/fyyur',
+            'DB_STATEMENT_TIMEOUT': 1000,
+            'SQLALCHEMY_ENGINE_OPTIONS': {'pool_size': 1},
+        })
+
+        self.assertEqual(options['pool_size'], 1)
+        self.assertNotIn('connect_args', options)
+
+
+class PagesTestCase(FyyurTestCase):
+
+    def test_home_page(self):
+        res = self.client.get('/')
+
+        self.assertEqual(res.status_code, 200)
+
+    def test_404_unknown_venue(self):
+        res = self.client.get('/venues/1000')
+
+        self.assertEqual(res.status_code, 404)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
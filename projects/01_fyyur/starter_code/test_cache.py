@@ -0,0 +1,94 @@
+import time
+import unittest
+
+from cache import LRUCache
+from extensions import db
+from models import Venue
+from testing import FyyurTestCase, hours_from_now
+
+
+class LRUCacheTestCase(unittest.TestCase):
+
+    def test_get_or_load_counts_hits_and_misses(self):
+        cache = LRUCache(maxsize=10, ttl=60)
+        loads = []
+
+        def load():
+            loads.append(1)
+            return 'page'
+
+        cache.get_or_load(('venue', 1), load)
+        cache.get_or_load(('venue', 1), load)
+
+        self.assertEqual(len(loads), 1)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_least_recently_used_is_evicted(self):
+        cache = LRUCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+
+    def test_entries_expire(self):
+        cache = LRUCache(ttl=0.01)
+        cache.set('a', 1)
+        time.sleep(0.02)
+
+        self.assertIsNone(cache.get('a'))
+
+    def test_data_changed_bumps_version(self):
+        cache = LRUCache()
+        cache.set('a', 1)
+        version, _ = cache.data_version()
+        cache.data_changed('a')
+
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.data_version()[0], version + 1)
+
+
+class DetailInvalidationTestCase(FyyurTestCase):
+    """Edits invalidate every cached detail page showing the edited row"""
+
+    def edit_form(self, name, **values):
+        values.update(name=name, city='Oakland', state='CA', phone='1',
+                      genres=['Jazz'], facebook_link='')
+        return values
+
+    def test_venue_edit_updates_its_page(self):
+        venue = self.add_venue()
+        self.client.get('/venues/%d' % venue.id)
+
+        res = self.client.post(
+            '/venues/%d/edit' % venue.id,
+            data=self.edit_form('The Dueling Pianos', address='1 Main St'),
+        )
+        page = self.client.get('/venues/%d' % venue.id).get_data(True)
+
+        self.assertEqual(res.status_code, 302)
+        self.assertIn('The Dueling Pianos', page)
+        self.assertEqual(db.session.get(Venue, venue.id).address, '1 Main St')
+
+    def test_artist_rename_updates_venue_pages(self):
+        venue = self.add_venue()
+        artist = self.add_artist()
+        self.add_show(venue, artist, hours_from_now(24))
+        self.client.get('/venues/%d' % venue.id)
+
+        self.client.post(
+            '/artists/%d/edit' % artist.id,
+            data=self.edit_form('The Wild Sax Band'),
+        )
+        page = self.client.get('/venues/%d' % venue.id).get_data(True)
+
+        self.assertIn('The Wild Sax Band', page)
+        self.assertNotIn('Guns N Petals', page)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+from datetime import datetime, timedelta
+
+from counters import check_counts, rebuild_counts, rollover
+from extensions import db
+from models import Venue
+from testing import FyyurTestCase
+
+START = datetime(2030, 6, 1, 20)
+
+
+class CountersTestCase(FyyurTestCase):
+    """Show counters follow writes and roll over as shows start"""
+
+    def setUp(self):
+        super(CountersTestCase, self).setUp()
+        self.venue = self.add_venue()
+        self.artist = self.add_artist()
+        self.other = self.add_artist('Matt Quevedo')
+
+    def counts(self, row):
+        db.session.refresh(row)
+        return row.upcoming_shows_count, row.past_shows_count
+
+    def roll_over(self, now):
+        with db.engine.begin() as connection:
+            return rollover(connection, now=now)
+
+    def check(self, repair=False):
+        with db.engine.begin() as connection:
+            return check_counts(connection, repair=repair)
+
+    def test_writes_adjust_the_counts(self):
+        show = self.add_show(self.venue, self.artist, START)
+        self.add_show(self.venue, self.other, START + timedelta(days=1))
+        self.assertEqual(self.counts(self.venue), (2, 0))
+        self.assertEqual(self.counts(self.artist), (1, 0))
+
+        show.artist_id = self.other.id
+        db.session.commit()
+        self.assertEqual(self.counts(self.artist), (0, 0))
+        self.assertEqual(self.counts(self.other), (2, 0))
+
+        db.session.delete(show)
+        db.session.commit()
+        self.assertEqual(self.counts(self.venue), (1, 0))
+        self.assertEqual(self.check(), [])
+
+    def test_rollover_moves_started_shows_once(self):
+        self.add_show(self.venue, self.artist, START)
+        self.add_show(self.venue, self.other, START + timedelta(days=1))
+
+        self.assertEqual(self.roll_over(START + timedelta(hours=1)), 1)
+        self.assertEqual(self.roll_over(START + timedelta(hours=1)), 0)
+
+        self.assertEqual(self.counts(self.venue), (1, 1))
+        self.assertEqual(self.counts(self.artist), (0, 1))
+        self.assertEqual(self.counts(self.other), (1, 0))
+        self.assertEqual(self.check(), [])
+
+    def test_shows_added_after_the_checkpoint_are_counted_against_it(self):
+        self.roll_over(START)
+        self.add_show(self.venue, self.artist, START - timedelta(days=1))
+
+        self.assertEqual(self.counts(self.venue), (0, 1))
+
+    def test_check_reports_and_repairs_drift(self):
+        self.add_show(self.venue, self.artist, START)
+        db.session.query(Venue).update({'upcoming_shows_count': 5})
+        db.session.commit()
+
+        self.assertEqual(
+            self.check(),
+            [('Venue', self.venue.id, (5, 0), (1, 0))])
+        self.check(repair=True)
+
+        self.assertEqual(self.counts(self.venue), (1, 0))
+        self.assertEqual(self.check(), [])
+
+    def test_rebuild_recounts_as_of_now(self):
+        self.add_show(self.venue, self.artist, START)
+        db.session.query(Venue).update({'upcoming_shows_count': 0})
+        db.session.commit()
+
+        with db.engine.begin() as connection:
+            rebuild_counts(connection, now=START + timedelta(hours=1))
+
+        self.assertEqual(self.counts(self.venue), (0, 1))
+        self.assertEqual(self.check(), [])
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
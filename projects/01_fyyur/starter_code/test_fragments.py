@@ -0,0 +1,62 @@
+import unittest
+
+from testing import FyyurTestCase, hours_from_now
+
+
+class ListFragmentTestCase(FyyurTestCase):
+    """List pages are cached per data version and revalidated by ETag"""
+
+    def cache_size(self):
+        return self.app.extensions['detail_cache'].stats()['size']
+
+    def test_etag_revalidates_until_data_changes(self):
+        self.add_venue()
+        etag = self.client.get('/venues').headers['ETag']
+
+        res = self.client.get('/venues', headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 304)
+
+        self.client.post('/venues/create', data={
+            'name': 'Park Square Live', 'city': 'Oakland', 'state': 'CA',
+            'address': '1 Main St', 'genres': ['Jazz'], 'phone': '',
+            'facebook_link': '',
+        })
+        res = self.client.get('/venues', headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('Park Square Live', res.get_data(True))
+
+    def test_genre_filter(self):
+        self.add_venue('Jazz Club', genres=['Jazz'])
+        self.add_venue('Folk Club', genres=['Folk'])
+
+        page = self.client.get('/venues?genre=Folk').get_data(True)
+
+        self.assertIn('Folk Club', page)
+        self.assertNotIn('Jazz Club', page)
+
+    def test_400_unknown_genre(self):
+        res = self.client.get('/artists?genre=Polka')
+
+        self.assertEqual(res.status_code, 400)
+
+    def test_unread_parameters_share_an_entry(self):
+        self.client.get('/venues')
+        size = self.cache_size()
+        for number in range(5):
+            self.client.get('/venues?x=%d' % number)
+
+        self.assertEqual(self.cache_size(), size)
+
+    def test_show_pages_past_the_first_are_not_cached(self):
+        self.add_show(self.add_venue(), self.add_artist(), hours_from_now(1))
+        size = self.cache_size()
+        for day in range(1, 6):
+            res = self.client.get('/shows?from=2030-01-%02d' % day)
+            self.assertEqual(res.status_code, 200)
+
+        self.assertEqual(self.cache_size(), size)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from extensions import db
+from testing import FyyurTestCase
+
+
+class QueryStatsTestCase(FyyurTestCase):
+    """SQL statements are counted and timed per request"""
+
+    settings = {'QUERY_STATS_HEADERS': True}
+
+    def query_count(self, path):
+        res = self.client.get(path)
+        self.assertEqual(res.status_code, 200)
+        return int(res.headers['X-Query-Count'])
+
+    def test_counts_queries(self):
+        venue = self.add_venue()
+
+        self.assertGreater(self.query_count('/venues/%d' % venue.id), 0)
+        # served from the detail cache
+        self.assertEqual(self.query_count('/venues/%d' % venue.id), 0)
+
+    def test_failed_statement_leaves_no_timing_behind(self):
+        with self.assertRaises(OperationalError):
+            db.session.execute(text('SELECT * FROM no_such_table'))
+        db.session.rollback()
+        connection = db.session.connection()
+
+        self.assertNotIn('query_started', connection.info)
+        self.assertGreater(self.query_count('/artists'), 0)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
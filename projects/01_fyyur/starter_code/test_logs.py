@@ -0,0 +1,53 @@
+import json
+import logging
+import queue
+import unittest
+
+from logs import DroppingQueueHandler, JsonFormatter
+
+
+class QueuedLoggingTestCase(unittest.TestCase):
+    """Records go through DroppingQueueHandler as the listener sees them"""
+
+    def setUp(self):
+        self.records = queue.Queue(maxsize=10)
+        self.handler = DroppingQueueHandler(self.records)
+        self.logger = logging.getLogger('test_logs')
+        self.logger.propagate = False
+        self.logger.addHandler(self.handler)
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+
+    def formatted(self):
+        return json.loads(JsonFormatter().format(self.records.get_nowait()))
+
+    def test_exception_is_a_separate_field(self):
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            self.logger.exception('failed %s', 'badly')
+        data = self.formatted()
+
+        self.assertEqual(data['message'], 'failed badly')
+        self.assertIn('ZeroDivisionError', data['exception'])
+        self.assertIn('Traceback', data['exception'])
+
+    def test_extra_fields(self):
+        self.logger.warning('request', extra={'status': 500})
+        data = self.formatted()
+
+        self.assertEqual(data['status'], 500)
+        self.assertNotIn('exception', data)
+
+    def test_full_queue_drops_records(self):
+        for _ in range(12):
+            self.logger.warning('flood')
+
+        self.assertEqual(self.records.qsize(), 10)
+        self.assertEqual(self.handler.dropped, 2)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import unittest
+from datetime import datetime, timedelta
+
+from models import Venue, Artist
+from queries import ARTIST_FIELDS, SHOWS_PER_PAGE, keyset_listing, \
+    show_listing
+from testing import FyyurTestCase
+
+START = datetime(2030, 6, 1, 20)
+
+
+class ShowListingTestCase(FyyurTestCase):
+    """Shows are paged by a (start_time, id) keyset cursor"""
+
+    def setUp(self):
+        super(ShowListingTestCase, self).setUp()
+        self.venue = self.add_venue()
+        self.artists = [self.add_artist('Artist {}'.format(number))
+                        for number in range(5)]
+
+    def add_shows(self, starts):
+        return [self.add_show(self.venue, artist, start)
+                for artist, start in zip(self.artists, starts)]
+
+    def all_pages(self, limit, **filters):
+        ids = []
+        after = None
+        while True:
+            shows, after = show_listing(after=after, limit=limit, **filters)
+            ids.extend(show['id'] for show in shows)
+            if after is None:
+                return ids
+
+    def test_pages_cover_every_show_once_in_order(self):
+        shows = self.add_shows([
+            START + timedelta(days=offset) for offset in (3, 1, 4, 1, 5)
+        ])
+        expected = [show.id for show in sorted(
+            shows, key=lambda show: (show.start_time, show.id))]
+
+        self.assertEqual(self.all_pages(limit=2), expected)
+
+    def test_ties_on_start_time_are_split_by_id(self):
+        shows = self.add_shows([START] * 5)
+
+        self.assertEqual(
+            self.all_pages(limit=2), sorted(show.id for show in shows))
+
+    def test_start_and_end_bound_the_pages(self):
+        shows = self.add_shows([
+            START + timedelta(days=offset) for offset in range(5)
+        ])
+
+        ids = self.all_pages(
+            limit=1,
+            start=START + timedelta(days=1),
+            end=START + timedelta(days=3),
+        )
+
+        self.assertEqual(ids, [show.id for show in shows[1:4]])
+
+    def test_last_page_has_no_cursor(self):
+        self.add_shows([START])
+
+        shows, after = show_listing(limit=1)
+
+        self.assertEqual(len(shows), 1)
+        self.assertIsNone(after)
+
+    def test_malformed_cursors(self):
+        for cursor in ('garbage', 'x_1', '2030-06-01T20:00:00_x',
+                       '99999999999999999999_1',
+                       '2030-06-01T20:00:00_99999999999999999999'):
+            with self.assertRaises(ValueError):
+                show_listing(after=cursor)
+
+    def test_400_malformed_cursor(self):
+        res = self.client.get('/shows?after=99999999999999999999_1')
+
+        self.assertEqual(res.status_code, 400)
+
+    def test_next_page_link_keeps_the_filters(self):
+        for offset in range(SHOWS_PER_PAGE + 2):
+            self.add_show(self.venue, self.artists[0],
+                          START + timedelta(days=offset))
+
+        page = self.client.get('/shows?from=2030-06-02').get_data(True)
+
+        self.assertIn('from=2030-06-02', page)
+        self.assertIn('after=', page)
+
+
+class KeysetListingTestCase(FyyurTestCase):
+
+    def test_pages_by_id(self):
+        artists = [self.add_artist('Artist {}'.format(number))
+                   for number in range(5)]
+        fields = {'name': ARTIST_FIELDS['name']}
+
+        first, after = keyset_listing(Artist, fields, limit=3)
+        rest, last = keyset_listing(Artist, fields, after=after, limit=3)
+
+        self.assertEqual(
+            [artist['name'] for artist in first + rest],
+            [artist.name for artist in artists])
+        self.assertIsNone(last)
+
+    def test_malformed_cursors(self):
+        for cursor in ('x', '-1', '99999999999999999999'):
+            with self.assertRaises(ValueError):
+                keyset_listing(Artist, {'name': Artist.name}, after=cursor)
+
+    def test_400_malformed_cursor(self):
+        res = self.client.get('/api/v1/artists?after=99999999999999999999')
+
+        self.assertEqual(res.status_code, 400)
+
+    def test_genre_filter(self):
+        self.add_venue('Jazz Club', genres=['Jazz'])
+        self.add_venue('Folk Club', genres=['Folk'])
+
+        rows, _ = keyset_listing(
+            Venue, {'name': Venue.name}, genre='Folk')
+
+        self.assertEqual(rows, [{'name': 'Folk Club'}])
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
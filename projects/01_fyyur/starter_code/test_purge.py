@@ -0,0 +1,86 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from extensions import db
+from models import Venue, Artist, Show
+from purge import purge_deleted, purge_venue
+from search import search_by_name
+from testing import FyyurTestCase
+
+START = datetime(2030, 6, 1, 20)
+
+
+class SoftDeleteTestCase(FyyurTestCase):
+    """Deleted venues are hidden at once and purged in batches"""
+
+    def setUp(self):
+        super(SoftDeleteTestCase, self).setUp()
+        self.venue = self.add_venue()
+        self.artist = self.add_artist()
+        for day in range(5):
+            self.add_show(self.venue, self.artist,
+                          START + timedelta(days=day))
+        self.venue_id = self.venue.id
+
+    def delete_venue(self):
+        # Keeps the purge task queued so the soft-deleted state is seen.
+        with mock.patch.object(self.app.extensions['tasks'], 'enqueue') \
+                as enqueue:
+            res = self.client.delete('/venues/{}'.format(self.venue_id))
+        db.session.expire_all()
+        return res, enqueue
+
+    def test_deleted_venue_is_hidden(self):
+        res, enqueue = self.delete_venue()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(Venue.query.count(), 0)
+        self.assertEqual(search_by_name(Venue, 'musical')['count'], 0)
+        self.assertEqual(
+            self.client.get('/venues/{}'.format(self.venue_id)).status_code,
+            404)
+        self.assertEqual(
+            db.session.query(Venue).execution_options(include_deleted=True)
+            .count(), 1)
+        enqueue.assert_called_once_with(purge_venue, self.venue_id, 500)
+
+    def test_404_deleting_twice(self):
+        self.delete_venue()
+        res, enqueue = self.delete_venue()
+
+        self.assertEqual(res.status_code, 404)
+        enqueue.assert_not_called()
+
+    def test_purge_in_batches(self):
+        self.delete_venue()
+
+        purged = purge_venue(self.venue_id, 2)
+
+        self.assertEqual(purged, 5)
+        self.assertEqual(Show.query.count(), 0)
+        self.assertIsNone(
+            db.session.query(Venue).execution_options(include_deleted=True)
+            .filter_by(id=self.venue_id).first())
+        artist = db.session.get(Artist, self.artist.id)
+        self.assertEqual(
+            (artist.upcoming_shows_count, artist.past_shows_count), (0, 0))
+
+    def test_purge_deleted_skips_live_venues(self):
+        other = self.add_venue('Park Square Live')
+        self.add_show(other, self.artist, START - timedelta(days=1))
+        self.delete_venue()
+
+        self.assertEqual(purge_deleted(2), (1, 5))
+        self.assertEqual(Show.query.count(), 1)
+
+    def test_queued_purge_runs(self):
+        self.client.delete('/venues/{}'.format(self.venue_id))
+
+        self.assertEqual(Show.query.count(), 0)
+        self.assertEqual(self.app.extensions['tasks'].completed, 1)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,193 @@
+import io
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from sqlalchemy.exc import IntegrityError
+
+import importer
+from extensions import db
+from importer import import_file
+from models import Show
+from scheduling import BookingConflict, SchedulingError, check_booking, \
+    find_batch_conflicts, free_slots, parse_time
+from testing import FyyurTestCase
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+NOON = datetime(2030, 6, 1, 12)
+
+
+def hours(number):
+    return timedelta(hours=number)
+
+
+class BookingTestCase(FyyurTestCase):
+    """Shows may not double-book their venue or artist"""
+
+    def setUp(self):
+        super(BookingTestCase, self).setUp()
+        self.venue = self.add_venue()
+        self.artist = self.add_artist()
+        self.show = self.add_show(self.venue, self.artist, NOON)
+
+    def test_overlap_at_the_venue(self):
+        other = self.add_artist('Matt Quevedo')
+
+        with self.assertRaises(BookingConflict) as raised:
+            check_booking(self.venue.id, other.id, NOON + hours(1))
+
+        self.assertEqual(
+            [show['id'] for show in raised.exception.conflicts],
+            [self.show.id])
+
+    def test_overlap_by_the_artist(self):
+        other = self.add_venue('Park Square Live')
+
+        with self.assertRaises(BookingConflict):
+            check_booking(other.id, self.artist.id, NOON - hours(1))
+
+    def test_back_to_back_shows_do_not_conflict(self):
+        start, end = check_booking(
+            self.venue.id, self.artist.id, NOON + hours(2))
+
+        self.assertEqual((start, end), (NOON + hours(2), NOON + hours(4)))
+
+    def test_rescheduling_ignores_the_show_itself(self):
+        check_booking(self.venue.id, self.artist.id, NOON + hours(1),
+                      exclude_id=self.show.id)
+
+    def test_end_before_start(self):
+        with self.assertRaises(SchedulingError):
+            check_booking(self.venue.id, self.artist.id, NOON, NOON)
+
+    def test_batch_conflicts(self):
+        other = self.add_artist('Matt Quevedo')
+
+        conflicts = find_batch_conflicts([
+            ('clash', self.venue.id, other.id, NOON + hours(1),
+             NOON + hours(3)),
+            ('free', self.venue.id, other.id, NOON + hours(2),
+             NOON + hours(4)),
+        ])
+
+        self.assertEqual(conflicts, {'clash': [self.show.id]})
+
+    def test_free_slots(self):
+        slots = free_slots(self.venue.id, NOON - hours(2), NOON + hours(4))
+
+        self.assertEqual(slots, [
+            (NOON - hours(2), NOON),
+            (NOON + hours(2), NOON + hours(4)),
+        ])
+
+    def test_times_with_an_offset_are_utc(self):
+        self.assertEqual(parse_time('2030-06-01T14:00:00+02:00'), NOON)
+
+
+class ShowViewsTestCase(FyyurTestCase):
+
+    def setUp(self):
+        super(ShowViewsTestCase, self).setUp()
+        self.venue = self.add_venue()
+        self.artist = self.add_artist()
+        self.add_show(self.venue, self.artist, NOON)
+
+    def test_conflicting_show_is_not_listed(self):
+        res = self.client.post('/shows/create', data={
+            'venue_id': self.venue.id,
+            'artist_id': self.artist.id,
+            'start_time': '2030-06-01 13:00',
+            'end_time': '',
+        })
+
+        self.assertIn('already booked', res.get_data(True))
+        self.assertEqual(Show.query.count(), 1)
+
+    def test_400_bad_show_page_time(self):
+        res = self.client.get('/shows?from=not-a-date')
+
+        self.assertEqual(res.status_code, 400)
+
+    def test_400_bad_availability_time(self):
+        res = self.client.get(
+            '/venues/{}/availability?from=2030-06-01&to=soon'.format(
+                self.venue.id))
+
+        self.assertEqual(res.status_code, 400)
+
+    def test_availability(self):
+        res = self.client.get(
+            '/venues/{}/availability?from=2030-06-01T10:00:00'
+            '&to=2030-06-01T16:00:00'.format(self.venue.id))
+
+        self.assertEqual(res.get_json()['free'], [
+            {'start': '2030-06-01T10:00:00', 'end': '2030-06-01T12:00:00'},
+            {'start': '2030-06-01T14:00:00', 'end': '2030-06-01T16:00:00'},
+        ])
+
+
+class ShowImportTestCase(FyyurTestCase):
+
+    def setUp(self):
+        super(ShowImportTestCase, self).setUp()
+        self.venue = self.add_venue()
+        self.artist = self.add_artist()
+        self.other = self.add_artist('Matt Quevedo')
+
+    def shows_csv(self, *shows):
+        rows = ['venue_id,artist_id,start_time,end_time']
+        for artist, start in shows:
+            rows.append('{},{},{},{}'.format(
+                self.venue.id, artist.id, start.strftime(TIME_FORMAT),
+                (start + hours(2)).strftime(TIME_FORMAT)))
+        return io.StringIO('\n'.join(rows) + '\n')
+
+    def test_rows_conflicting_with_stored_shows(self):
+        self.add_show(self.venue, self.artist, NOON)
+
+        inserted, errors = import_file('shows', self.shows_csv(
+            (self.other, NOON + hours(1)),
+            (self.other, NOON + hours(2)),
+        ), 'csv', 100)
+
+        self.assertEqual(inserted, 1)
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0][0], 1)
+        self.assertIn('conflicts with show', errors[0][1])
+
+    def test_rows_overlapping_earlier_rows(self):
+        inserted, errors = import_file('shows', self.shows_csv(
+            (self.artist, NOON),
+            (self.other, NOON + hours(1)),
+        ), 'csv', 100)
+
+        self.assertEqual(inserted, 1)
+        self.assertEqual(errors[0][0], 2)
+        self.assertIn('overlaps an earlier show', errors[0][1])
+
+    def test_show_booked_while_importing(self):
+        # Stands in for a booking committed between the check and the
+        # insert, which the PostgreSQL exclusion constraints refuse.
+        insert_chunk = importer.insert_chunk
+
+        def booked_meanwhile(table, rows):
+            if not Show.query.count():
+                self.add_show(self.venue, self.artist, NOON)
+                raise IntegrityError('INSERT', None, Exception('23P01'))
+            insert_chunk(table, rows)
+
+        with mock.patch('importer.insert_chunk', booked_meanwhile):
+            inserted, errors = import_file('shows', self.shows_csv(
+                (self.other, NOON + hours(1)),
+                (self.other, NOON + hours(4)),
+            ), 'csv', 100)
+
+        self.assertEqual(inserted, 1)
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0][0], 1)
+        self.assertEqual(Show.query.count(), 2)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+
+from extensions import db
+from models import Venue, Artist
+from search import search_by_name
+from testing import FyyurTestCase
+
+
+class SearchTestCase(FyyurTestCase):
+    """Name search runs on the FTS5 tables on SQLite"""
+
+    def test_every_word_matches_as_a_prefix(self):
+        self.add_venue('The Musical Hop')
+        self.add_venue('Park Square Live Music & Coffee')
+        self.add_venue('The Dueling Pianos Bar')
+
+        result = search_by_name(Venue, 'mus hop')
+
+        self.assertEqual(result['count'], 1)
+        self.assertEqual(
+            [venue['name'] for venue in result['data']], ['The Musical Hop'])
+
+    def test_prefix_matches_the_start_of_the_name(self):
+        self.add_artist('Guns N Petals')
+        self.add_artist('The Wild Sax Band')
+
+        names = [artist['name'] for artist in
+                 search_by_name(Artist, 'the', prefix=True)['data']]
+
+        self.assertEqual(names, ['The Wild Sax Band'])
+
+    def test_fts_syntax_in_terms_does_not_raise(self):
+        self.add_venue('The Musical Hop')
+
+        for term in ('"', 'hop OR', 'NEAR(', '*', 'name:hop'):
+            result = search_by_name(Venue, term)
+            self.assertLessEqual(result['count'], 1)
+
+    def test_pages(self):
+        for number in range(5):
+            self.add_artist('Band {}'.format(number))
+
+        first = search_by_name(Artist, 'band', per_page=2)
+        last = search_by_name(Artist, 'band', page=3, per_page=2)
+
+        self.assertEqual(first['count'], 5)
+        self.assertTrue(first['has_next'])
+        self.assertEqual(len(last['data']), 1)
+        self.assertFalse(last['has_next'])
+
+    def test_renamed_rows_are_reindexed(self):
+        artist = self.add_artist('Guns N Petals')
+        artist.name = 'Matt Quevedo'
+        db.session.commit()
+
+        self.assertEqual(search_by_name(Artist, 'guns')['count'], 0)
+        self.assertEqual(search_by_name(Artist, 'quevedo')['count'], 1)
+
+    def test_search_page(self):
+        self.add_venue('The Musical Hop')
+
+        res = self.client.post(
+            '/venues/search', data={'search_term': 'musical'})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('The Musical Hop', res.get_data(True))
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,185 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
+
+import jobs
+from jobs import LinkRefused, check_links, link_status, public_address
+from tasks import SQLiteQueue, ThreadQueue, task
+from testing import FyyurTestCase
+
+calls = []
+
+
+@task
+def flaky(name, failures):
+    calls.append(name)
+    if calls.count(name) <= failures:
+        raise RuntimeError('try again')
+
+
+class TaskQueueTestCase(FyyurTestCase):
+    """Tasks are retried with exponential backoff, then dropped"""
+
+    def setUp(self):
+        super(TaskQueueTestCase, self).setUp()
+        del calls[:]
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super(TaskQueueTestCase, self).tearDown()
+
+    def job(self, *args, attempt=0):
+        return {'name': 'flaky', 'args': list(args), 'attempt': attempt,
+                'ready': time.time()}
+
+    def test_retry_delays_double(self):
+        queue = ThreadQueue(self.app, max_retries=3, backoff=0.5)
+
+        with self.assertLogs(self.app.logger, 'WARNING') as logs:
+            delays = [queue.run(self.job('a', 10, attempt=attempt))[1]
+                      for attempt in range(4)]
+
+        self.assertEqual(delays, [0.5, 1.0, 2.0, None])
+        self.assertEqual(
+            [record.levelname for record in logs.records],
+            ['WARNING'] * 3 + ['ERROR'])
+        self.assertEqual(queue.stats()['retried'], 3)
+        self.assertEqual(queue.stats()['failed'], 1)
+
+    def test_success(self):
+        queue = ThreadQueue(self.app)
+
+        self.assertEqual(queue.run(self.job('a', 0)), (True, None))
+        self.assertEqual(queue.stats()['completed'], 1)
+
+    def test_unknown_task_is_not_queued(self):
+        queue = ThreadQueue(self.app)
+
+        with self.assertLogs(self.app.logger, 'ERROR'):
+            self.assertFalse(queue.enqueue('no_such_task'))
+        self.assertEqual(queue.stats()['enqueued'], 0)
+
+    def test_thread_queue_retries_until_success(self):
+        queue = ThreadQueue(self.app, workers=1, max_retries=3, backoff=0.01)
+
+        with self.assertLogs(self.app.logger, 'WARNING'):
+            self.assertTrue(queue.enqueue(flaky, 'a', 2))
+            deadline = time.time() + 5
+            while queue.stats()['completed'] < 1 and time.time() < deadline:
+                time.sleep(0.01)
+
+        self.assertEqual(calls, ['a', 'a', 'a'])
+        self.assertEqual(queue.stats()['retried'], 2)
+
+    def test_sqlite_queue_reschedules_and_marks_failures(self):
+        queue = SQLiteQueue(
+            self.app, os.path.join(self.directory, 'tasks.db'),
+            max_retries=1, backoff=0,
+        )
+        queue.enqueue(flaky, 'a', 5)
+        connection = queue.connect()
+        try:
+            with self.assertLogs(self.app.logger, 'WARNING'):
+                for _ in range(2):
+                    job = queue.claim(connection)
+                    self.assertIsNotNone(job)
+                    queue.finish(connection, job, *queue.run(job))
+            self.assertIsNone(queue.claim(connection))
+        finally:
+            connection.close()
+
+        stats = queue.stats()
+        self.assertEqual((stats['depth'], stats['dead']), (0, 1))
+        self.assertEqual(calls, ['a', 'a'])
+
+    def test_sqlite_queue_leases_claimed_tasks(self):
+        queue = SQLiteQueue(
+            self.app, os.path.join(self.directory, 'tasks.db'), lease=60,
+        )
+        queue.enqueue(flaky, 'a', 0)
+        first, second = queue.connect(), queue.connect()
+        try:
+            self.assertIsNotNone(queue.claim(first))
+            self.assertIsNone(queue.claim(second))
+        finally:
+            first.close()
+            second.close()
+
+
+class RedirectHandler(BaseHTTPRequestHandler):
+
+    def do_HEAD(self):
+        self.send_response(302)
+        self.send_header('Location', 'http://169.254.169.254/latest/')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class LinkCheckTestCase(FyyurTestCase):
+    """The link checker only ever contacts public addresses"""
+
+    settings = {'LINK_CHECK_ENABLED': True}
+
+    def test_refuses_non_public_addresses(self):
+        for host in ('127.0.0.1', 'localhost', '10.0.0.8', '192.168.1.1',
+                     '169.254.169.254', '::1', 'fd00::1', '0.0.0.0'):
+            with self.assertRaises(LinkRefused, msg=host):
+                public_address(host, 80)
+
+    def test_accepts_public_addresses(self):
+        self.assertEqual(public_address('93.184.216.34', 80), '93.184.216.34')
+
+    def test_ignores_other_schemes(self):
+        self.assertIsNone(link_status('ftp://example.com/', 1))
+        self.assertIsNone(link_status('javascript:alert(1)', 1))
+
+    def test_redirects_are_vetted(self):
+        server = HTTPServer(('127.0.0.1', 0), RedirectHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        vetted = public_address
+
+        def allow_test_server(host, port):
+            # The first hop stands in for a public site.
+            if host == 'public.test':
+                return '127.0.0.1'
+            return vetted(host, port)
+
+        try:
+            with mock.patch('jobs.public_address', allow_test_server):
+                with self.assertRaises(LinkRefused):
+                    link_status('http://public.test:{}/'.format(
+                        server.server_port), 1)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_check_links_logs_refused_links(self):
+        venue = self.add_venue(facebook_link='http://127.0.0.1/admin')
+
+        with self.assertLogs(self.app.logger, 'WARNING') as logs:
+            check_links('venue', venue.id)
+
+        self.assertEqual(
+            logs.records[0].links, {'facebook_link': None})
+
+    def test_check_links_needs_enabling(self):
+        venue = self.add_venue(facebook_link='http://127.0.0.1/admin')
+        self.app.config['LINK_CHECK_ENABLED'] = False
+
+        with mock.patch.object(jobs, 'link_status') as status:
+            check_links('venue', venue.id)
+
+        status.assert_not_called()
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy.pool import StaticPool
+
+from app import create_app
+from extensions import db
+from models import Venue, Artist, Show
+from tasks import TaskQueue
+# ----------------------------------------------------------------------------#
+# Test support.
+# ----------------------------------------------------------------------------#
+
+# One in-memory SQLite database, shared by the test thread and any
+# background threads; periodic jobs are left to the tests to run.
+TEST_SETTINGS = {
+    'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+    'SQLALCHEMY_ENGINE_OPTIONS': {
+        'poolclass': StaticPool,
+        'connect_args': {'check_same_thread': False},
+    },
+    'TESTING': True,
+    'SECRET_KEY': 'test',
+    'COUNTS_ROLLOVER_INTERVAL': 0,
+    'PURGE_INTERVAL': 0,
+    'LINK_CHECK_ENABLED': False,
+}
+
+
+class InlineQueue(TaskQueue):
+    """Runs each task, retries included, as soon as it is queued, so
+    tests see its effects and no thread outlives the test's database."""
+
+    def submit(self, job):
+        while True:
+            _, delay = self.run(job)
+            if delay is None:
+                return
+            job = dict(job, attempt=job['attempt'] + 1)
+
+    def depth(self):
+        return 0
+
+
+class FyyurTestCase(unittest.TestCase):
+    """Builds an app on a fresh in-memory database for every test.
+
+    Subclasses can override or add settings with ``settings``.
+    """
+
+    settings = {}
+
+    def setUp(self):
+        self.app = create_app(**dict(TEST_SETTINGS, **self.settings))
+        self.app.extensions['tasks'] = InlineQueue(
+            self.app, max_retries=self.app.config['TASK_MAX_RETRIES'],
+        )
+        self.client = self.app.test_client()
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def add_venue(self, name='The Musical Hop', **values):
+        values.setdefault('city', 'San Francisco')
+        values.setdefault('state', 'CA')
+        values.setdefault('genres', ['Jazz'])
+        venue = Venue(name=name, **values)
+        db.session.add(venue)
+        db.session.commit()
+        return venue
+
+    def add_artist(self, name='Guns N Petals', **values):
+        values.setdefault('city', 'San Francisco')
+        values.setdefault('state', 'CA')
+        values.setdefault('genres', ['Rock n Roll'])
+        artist = Artist(name=name, **values)
+        db.session.add(artist)
+        db.session.commit()
+        return artist
+
+    def add_show(self, venue, artist, start, hours=2):
+        show = Show(
+            venue_id=venue.id, artist_id=artist.id, start_time=start,
+            end_time=start + timedelta(hours=hours),
+        )
+        db.session.add(show)
+        db.session.commit()
+        return show
+
+
+def hours_from_now(hours):
+    return datetime.now().replace(microsecond=0) + timedelta(hours=hours)
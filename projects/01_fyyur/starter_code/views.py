@@ -0,0 +1,563 @@
+from datetime import timedelta
+
+from flask import Blueprint, render_template, request, Response, flash, \
+    redirect, url_for, abort, jsonify, current_app
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db, detail_cache, task_queue
+from forms import ShowForm, VenueForm, ArtistForm
+from fragments import render_cached, render_uncached
+from logs import logging_stats
+from models import Venue, Artist, Show
+from queries import venue_areas, venue_detail, artist_listing,\
+                    artist_detail, show_listing, detail_keys
+from search import search_by_name
+from scheduling import check_booking, free_slots, parse_time,\
+                       BookingConflict, SchedulingError
+from purge import soft_delete_venue
+from jobs import warm_detail, check_links
+# ----------------------------------------------------------------------------#
+# Controllers.
+# ----------------------------------------------------------------------------#
+
+pages = Blueprint('pages', __name__)
+
+# Genres the listings can be filtered by: those the forms offer.
+GENRES = {
+    value for value, _ in VenueForm.genres.kwargs['choices']
+} | {
+    value for value, _ in ArtistForm.genres.kwargs['choices']
+}
+
+
+def requested_genre():
+    """The ``genre`` filter of a listing; 400 for an unknown genre.
+
+    Each genre gets its own cached fragment, so only known ones are
+    accepted.
+    """
+    genre = request.args.get('genre')
+    if genre is not None and genre not in GENRES:
+        abort(400)
+    return genre
+
+
+@pages.route('/')
+def index():
+    return render_template('pages/home.html')
+
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@pages.route('/venues')
+def venues():
+    genre = requested_genre()
+    return render_cached(
+        detail_cache,
+        'pages/venues.html',
+        'fragments/venues.html',
+        lambda: {'areas': venue_areas(genre=genre)},
+        params=('genre',),
+    )
+
+
+@pages.route('/venues/search', methods=['GET', 'POST'])
+def search_venues():
+    search_term = request.values.get('search_term', '')
+    response = search_by_name(
+        Venue,
+        search_term,
+        page=request.values.get('page', 1, type=int),
+        prefix='prefix' in request.values,
+    )
+    return render_template(
+        'pages/search_venues.html',
+        results=response,
+        search_term=search_term,
+    )
+
+
+@pages.route('/venues/<int:venue_id>')
+def show_venue(venue_id):
+    data = detail_cache.get_or_load(
+        ('venue', venue_id), lambda: venue_detail(venue_id)
+    )
+    if data is None:
+        abort(404)
+
+    return render_template('pages/show_venue.html', venue=data)
+
+
+@pages.route('/venues/<int:venue_id>/availability')
+def venue_availability(venue_id):
+    if db.session.query(Venue.id).filter_by(id=venue_id).first() is None:
+        abort(404)
+    try:
+        start = query_time('from')
+        end = query_time('to')
+        min_length = timedelta(
+            minutes=request.args.get('min_minutes', 0, type=int)
+        )
+        if start is None or end is None:
+            abort(400)
+        slots = free_slots(venue_id, start, end, min_length)
+    except SchedulingError:
+        abort(400)
+
+    return jsonify({
+        'venue_id': venue_id,
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'free': [
+            {'start': slot_start.isoformat(), 'end': slot_end.isoformat()}
+            for slot_start, slot_end in slots
+        ],
+    })
+
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+
+@pages.route('/venues/create', methods=['GET'])
+def create_venue_form():
+    form = VenueForm()
+    return render_template('forms/new_venue.html', form=form)
+
+
+@pages.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+    venue_data = {}
+    venue_data['name'] = request.form.get('name')
+    venue_data['city'] = request.form.get('city')
+    venue_data['state'] = request.form.get('state')
+    venue_data['address'] = request.form.get('address')
+    venue_data['genres'] = request.form.getlist('genres')
+    venue_data['phone'] = request.form.get('phone')
+    venue_data['facebook_link'] = request.form.get('facebook_link')
+    try:
+        venue = Venue(
+            name=venue_data['name'],
+            city=venue_data['city'],
+            state=venue_data['state'],
+            address=venue_data['address'],
+            genres=venue_data['genres'],
+            phone=venue_data['phone'],
+            facebook_link=venue_data['facebook_link']
+        )
+        db.session.add(venue)
+        db.session.commit()
+        detail_cache.data_changed(('venue', venue.id))
+        queue_side_effects('venue', venue.id)
+        flash('Venue ' + request.form['name'] + ' was successfully listed!')
+    except Exception as ex:
+        db.session.rollback()
+        flash('Venue ' + request.form['name'] + ' was unsuccessfully listed!')
+        print(ex)
+
+    return render_template('pages/home.html')
+
+
+@pages.route('/venues/<int:venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+    # Hides the venue at once; its shows and the row itself are removed
+    # in the background (see purge.py).
+    if not soft_delete_venue(venue_id):
+        abort(404)
+    # BONUS CHALLENGE: Implement a button to
+    #                  delete a Venue on a Venue Page, have it so that
+    #                  clicking that button delete it from the db then
+    #                  redirect the user to the homepage
+    return Response(response=None, status=200)
+
+
+#  Artists
+#  ----------------------------------------------------------------
+@pages.route('/artists')
+def artists():
+    genre = requested_genre()
+    return render_cached(
+        detail_cache,
+        'pages/artists.html',
+        'fragments/artists.html',
+        lambda: {'artists': artist_listing(genre=genre)},
+        params=('genre',),
+    )
+
+
+@pages.route('/artists/search', methods=['GET', 'POST'])
+def search_artists():
+    search_term = request.values.get('search_term', '')
+    response = search_by_name(
+        Artist,
+        search_term,
+        page=request.values.get('page', 1, type=int),
+        prefix='prefix' in request.values,
+    )
+    return render_template(
+        'pages/search_artists.html',
+        results=response,
+        search_term=search_term,
+    )
+
+
+@pages.route('/artists/<int:artist_id>')
+def show_artist(artist_id):
+    data = detail_cache.get_or_load(
+        ('artist', artist_id), lambda: artist_detail(artist_id)
+    )
+    if data is None:
+        abort(404)
+
+    return render_template('pages/show_artist.html', artist=data)
+
+
+#  Update
+#  ----------------------------------------------------------------
+@pages.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+    form = ArtistForm()
+
+    artist = Artist.query.get(artist_id)
+
+    artist_data = {
+        'id': artist.id,
+        'name': artist.name,
+        'genres': artist.genres,
+        'city': artist.city,
+        'state': artist.state,
+        'phone': artist.phone,
+        'website': artist.website,
+        'facebook_link': artist.facebook_link,
+        'seeking_venue': artist.seeking_venu,
+        'seeking_description': artist.seeking_description,
+        'image_link': artist.image_link
+    }
+
+    return render_template(
+        'forms/edit_artist.html',
+        form=form,
+        artist=artist_data
+    )
+
+
+@pages.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+    data = {}
+    data['name'] = request.form.get('name')
+    data['city'] = request.form.get('city')
+    data['state'] = request.form.get('state')
+    data['phone'] = request.form.get('phone')
+    data['genres'] = request.form.getlist('genres')
+    data['facebook_link'] = request.form.get('facebook_link')
+
+    artist = Artist.query.get(artist_id)
+
+    try:
+        artist.name = data['name']
+        artist.city = data['city']
+        artist.state = data['state']
+        artist.phone = data['phone']
+        artist.genres = data['genres']
+        artist.facebook_link = data['facebook_link']
+        db.session.commit()
+        detail_cache.data_changed(*detail_keys('artist', artist_id))
+        queue_side_effects('artist', artist_id)
+        flash('Artist ' + request.form['name'] + ' was successfully updated!')
+    except Exception as ex:
+        db.session.rollback()
+        flash('Artist ' +
+              request.form['name']
+              + ' was unsuccessfully updated!')
+        print(ex)
+
+    return redirect(url_for('.show_artist', artist_id=artist_id))
+
+
+@pages.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+    form = VenueForm()
+    venue = Venue.query.get(venue_id)
+
+    venue_data = {
+        'id': venue.id,
+        'name': venue.name,
+        'genres': venue.genres,
+        'city': venue.city,
+        'state': venue.state,
+        'address': venue.address,
+        'phone': venue.phone,
+        'website': venue.website,
+        'facebook_link': venue.facebook_link,
+        'seeking_talent': venue.seeking_talent,
+        'seeking_description': venue.seeking_description,
+        'image_link': venue.image_link
+    }
+
+    return render_template(
+        'forms/edit_venue.html',
+        form=form,
+        venue=venue_data
+    )
+
+
+@pages.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+    data = {}
+    data['name'] = request.form.get('name')
+    data['city'] = request.form.get('city')
+    data['state'] = request.form.get('state')
+    data['address'] = request.form.get('address')
+    data['phone'] = request.form.get('phone')
+    data['genres'] = request.form.getlist('genres')
+    data['facebook_link'] = request.form.get('facebook_link')
+
+    venue = Venue.query.get(venue_id)
+
+    try:
+        venue.name = data['name']
+        venue.city = data['city']
+        venue.state = data['state']
+        venue.address = data['address']
+        venue.phone = data['phone']
+        venue.genres = data['genres']
+        venue.facebook_link = data['facebook_link']
+        db.session.commit()
+        detail_cache.data_changed(*detail_keys('venue', venue_id))
+        queue_side_effects('venue', venue_id)
+        flash('Venue ' + request.form['name'] + ' was successfully updated!')
+    except Exception as ex:
+        db.session.rollback()
+        flash('Venue ' + request.form['name'] + ' was unsuccessfully updated!')
+        print(ex)
+
+    return redirect(url_for('.show_venue', venue_id=venue_id))
+
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+
+@pages.route('/artists/create', methods=['GET'])
+def create_artist_form():
+    form = ArtistForm()
+    return render_template('forms/new_artist.html', form=form)
+
+
+@pages.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+    artist_data = {}
+    artist_data['name'] = request.form.get('name')
+    artist_data['city'] = request.form.get('city')
+    artist_data['state'] = request.form.get('state')
+    artist_data['genres'] = request.form.getlist('genres')
+    artist_data['phone'] = request.form.get('phone')
+    artist_data['facebook_link'] = request.form.get('facebook_link')
+    try:
+        artist = Artist(
+            name=artist_data['name'],
+            city=artist_data['city'],
+            state=artist_data['state'],
+            genres=artist_data['genres'],
+            phone=artist_data['phone'],
+            facebook_link=artist_data['facebook_link']
+        )
+        db.session.add(artist)
+        db.session.commit()
+        detail_cache.data_changed(('artist', artist.id))
+        queue_side_effects('artist', artist.id)
+        flash('Artist ' + request.form['name'] + ' was successfully listed!')
+    except Exception as ex:
+        db.session.rollback()
+        flash('Artist ' + request.form['name'] + ' was unsuccessfully listed!')
+        print(ex)
+
+    return render_template('pages/home.html')
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+
+SHOW_PAGE_PARAMS = ('after', 'from', 'to')
+
+
+@pages.route('/shows')
+def shows():
+    # Only the first, unfiltered page is cached: cursors and date ranges
+    # take unbounded values, which would push detail pages out of the
+    # cache.
+    if any(name in request.args for name in SHOW_PAGE_PARAMS):
+        return render_uncached(
+            'pages/shows.html', 'fragments/shows.html', show_page,
+        )
+    return render_cached(
+        detail_cache,
+        'pages/shows.html',
+        'fragments/shows.html',
+        show_page,
+    )
+
+
+def show_page():
+    start = query_time('from')
+    end = query_time('to')
+    try:
+        data, next_cursor = show_listing(
+            after=request.args.get('after'),
+            start=start,
+            end=end,
+        )
+    except ValueError:
+        abort(400)
+
+    next_url = None
+    if next_cursor is not None:
+        args = {
+            name: request.args[name]
+            for name in SHOW_PAGE_PARAMS if name in request.args
+        }
+        args['after'] = next_cursor
+        next_url = url_for('.shows', **args)
+
+    return {'shows': data, 'next_url': next_url}
+
+
+@pages.route('/shows/create')
+def create_shows():
+    # renders form. do not touch.
+    form = ShowForm()
+    return render_template('forms/new_show.html', form=form)
+
+
+@pages.route('/shows/create', methods=['POST'])
+def create_show_submission():
+    show_data = {}
+    show_data['artist_id'] = request.form.get('artist_id')
+    show_data['venue_id'] = request.form.get('venue_id')
+    show_data['start_time'] = request.form.get('start_time')
+    show_data['end_time'] = request.form.get('end_time')
+
+    try:
+        if Venue.query.get(show_data['venue_id']) is None:
+            raise SchedulingError('no such venue')
+        start_time, end_time = check_booking(
+            int(show_data['venue_id']),
+            int(show_data['artist_id']),
+            parse_form_time(show_data['start_time']),
+            parse_form_time(show_data['end_time']),
+        )
+        show = Show(
+            artist_id=show_data['artist_id'],
+            venue_id=show_data['venue_id'],
+            start_time=start_time,
+            end_time=end_time,
+        )
+        db.session.add(show)
+        db.session.commit()
+        detail_cache.data_changed(
+            ('venue', int(show.venue_id)),
+            ('artist', int(show.artist_id)),
+        )
+        task_queue.enqueue(warm_detail, 'venue', int(show.venue_id))
+        task_queue.enqueue(warm_detail, 'artist', int(show.artist_id))
+        flash('Show successfully listed!')
+    except BookingConflict as ex:
+        db.session.rollback()
+        flash('Show unsuccessfully listed: the venue or artist is already '
+              'booked at that time ({}).'.format(ex))
+    except SchedulingError as ex:
+        db.session.rollback()
+        flash('Show unsuccessfully listed: {}.'.format(ex))
+    except IntegrityError as ex:
+        db.session.rollback()
+        # 23P01: a concurrent booking tripped the exclusion constraint.
+        if getattr(ex.orig, 'pgcode', None) == '23P01':
+            flash('Show unsuccessfully listed: the venue or artist is '
+                  'already booked at that time.')
+        else:
+            flash('Show unsuccessfully listed!')
+        current_app.logger.exception('could not list show')
+    except Exception as ex:
+        db.session.rollback()
+        flash('Show unsuccessfully listed!')
+        print(ex)
+
+    return render_template('pages/home.html')
+
+
+def parse_form_time(value):
+    if not value:
+        return None
+    try:
+        return parse_time(value)
+    except (ValueError, OverflowError):
+        raise SchedulingError('invalid time {!r}'.format(value))
+
+
+def query_time(name):
+    # request.args.get(type=...) treats a value it can't convert as
+    # missing, so bad times are parsed here and refused.
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return parse_time(value)
+    except (ValueError, OverflowError):
+        abort(400)
+
+
+def queue_side_effects(kind, id):
+    # After a venue or artist write: refill its cached page and, if
+    # enabled, check its links off the request thread.
+    task_queue.enqueue(warm_detail, kind, id)
+    if current_app.config.get('LINK_CHECK_ENABLED'):
+        task_queue.enqueue(check_links, kind, id)
+
+
+@pages.route('/healthz/db')
+def database_health():
+    pool = db.engine.pool
+    data = {'pool': type(pool).__name__}
+    for key, stat in (('size', 'size'), ('checked_out', 'checkedout'),
+                      ('idle', 'checkedin'), ('overflow', 'overflow')):
+        if hasattr(pool, stat):
+            data[key] = getattr(pool, stat)()
+
+    try:
+        db.session.execute(text('SELECT 1'))
+        data['status'] = 'ok'
+        status = 200
+    except Exception as ex:
+        current_app.logger.error('database health check failed: %s', ex)
+        data['status'] = 'unavailable'
+        status = 503
+
+    return jsonify(data), status
+
+
+@pages.route('/healthz/logging')
+def logging_health():
+    return jsonify(logging_stats(current_app))
+
+
+@pages.route('/healthz/cache')
+def cache_stats():
+    return jsonify(detail_cache.stats())
+
+
+@pages.route('/healthz/tasks')
+def task_stats():
+    return jsonify(task_queue.stats())
+
+
+@pages.app_errorhandler(404)
+def not_found_error(error):
+    return render_template('errors/404.html'), 404
+
+
+@pages.app_errorhandler(500)
+def server_error(error):
+    return render_template('errors/500.html'), 500
@@ -1,27 +1,69 @@
-from flask import Flask, request, abort, jsonify
+from flask import Flask, Response, request, abort, jsonify
 from flask_cors import CORS
-import random
+from sqlalchemy import func
 
-from models import setup_db, Question, Category
+from models import setup_db, db, Question
+from .catalog import CategoryCatalog, CATALOG_TTL
+from .quiz import QuestionPool, POOL_TTL, ALL_CATEGORIES
+from .sessions import make_session_store, shuffled, MAX_SESSION_QUESTIONS
+from .search import QuestionSearch, SEARCH_MODES, SUBSTRING, FULLTEXT, \
+    create_index
 
 QUESTIONS_PER_PAGE = 10
 
 
-def paginate_questions(request, selection):
-    page = request.args.get('page', 1, type=int)
-    start = (page - 1) * QUESTIONS_PER_PAGE
-    end = start + QUESTIONS_PER_PAGE
+def paginate_questions(request, query):
+    """
+        returns (questions on the requested page, total matching questions)
+        for a Question query, ordered by id. ?page= pages with
+        LIMIT/OFFSET; ?after_id= returns the page after that id instead,
+        which stays fast on deep pages. only the page is loaded and
+        formatted, and the total is a single COUNT.
+    """
+    total = query.with_entities(func.count(Question.id))\
+        .order_by(None).scalar()
 
-    questions = [question.format() for question in selection]
-    current_questions = questions[start:end]
+    query = query.order_by(Question.id)
+    after_id = request.args.get('after_id', type=int)
+    if after_id is not None:
+        query = query.filter(Question.id > after_id)
+    else:
+        page = max(request.args.get('page', 1, type=int), 1)
+        query = query.offset((page - 1) * QUESTIONS_PER_PAGE)
 
-    return current_questions
+    questions = [
+        question.format() for question in query.limit(QUESTIONS_PER_PAGE)
+        ]
+
+    return questions, total
 
 
 def create_app(test_config=None):
     # create and configure the app
     app = Flask(__name__)
+    if test_config is not None:
+        app.config.update(test_config)
     setup_db(app)
+    catalog = CategoryCatalog(
+        ttl=app.config.get('CATEGORY_CACHE_TTL', CATALOG_TTL)
+        )
+    quiz_pool = QuestionPool(
+        ttl=app.config.get('QUIZ_POOL_TTL', POOL_TTL)
+        )
+    quiz_sessions = make_session_store(app.config)
+    max_session_questions = app.config.get(
+        'QUIZ_SESSION_QUESTIONS', MAX_SESSION_QUESTIONS
+        )
+    question_search = QuestionSearch()
+    search_mode = app.config.get('SEARCH_MODE', SUBSTRING)
+
+    @app.cli.command('create-search-index')
+    def create_search_index():
+        """
+            builds the full-text search index
+        """
+        if not create_index(db.engine):
+            print('full-text search is not supported on this database')
 
     """
         CORS config
@@ -48,19 +90,13 @@ def create_app(test_config=None):
 
     @app.route('/categories', methods=['GET'])
     def get_all_categories():
-        categories = Category.query.all()
-        formatted_categories = [category.format() for category in categories]
-        return jsonify({
-            'success': True,
-            'categories': formatted_categories
-        })
+        return Response(catalog.json_body(), mimetype='application/json')
 
     @app.route('/questions', methods=['GET'])
     def get_paginated_questions():
-        questions = Question.query.order_by(Question.id).all()
-        categories = Category.query.all()
-        current_questions = paginate_questions(request, questions)
-        formatted_categories = [category.format() for category in categories]
+        current_questions, total_questions = paginate_questions(
+            request, Question.query
+            )
 
         if len(current_questions) == 0:
             abort(404)
@@ -68,8 +104,8 @@ def create_app(test_config=None):
         return jsonify({
             'success': True,
             'questions': current_questions,
-            'total_questions': len(questions),
-            'categories': formatted_categories,
+            'total_questions': total_questions,
+            'categories': catalog.formatted(),
             'current_category': None,
         })
 
@@ -82,14 +118,15 @@ def create_app(test_config=None):
                 abort(404)
             else:
                 question.delete()
-                questions = Question.query.order_by(Question.id).all()
-                current_questions = paginate_questions(request, questions)
+                current_questions, total_questions = paginate_questions(
+                    request, Question.query
+                    )
 
                 return jsonify({
                     'success': True,
                     'deleted': question_id,
                     'question': current_questions,
-                    'total_questions': len(questions)
+                    'total_questions': total_questions
                 })
         except Exception as ex:
             print(1, ex)
@@ -114,14 +151,15 @@ def create_app(test_config=None):
 
             question.insert()
 
-            questions = Question.query.order_by(Question.id).all()
-            current_questions = paginate_questions(request, questions)
+            current_questions, total_questions = paginate_questions(
+                request, Question.query
+                )
 
             return jsonify({
                 'success': True,
                 'created': question.id,
                 'questions': current_questions,
-                'total_questions': len(Question.query.all())
+                'total_questions': total_questions
             })
 
         except Exception as ex:
@@ -133,18 +171,33 @@ def create_app(test_config=None):
         body = request.get_json(force=True)
 
         search = body.get('searchTerm', None)
+        mode = body.get('mode', request.args.get('mode', search_mode))
+        if mode not in SEARCH_MODES:
+            abort(400)
+        if mode == FULLTEXT and not question_search.available():
+            abort(400)
 
         try:
             if search is not None:
-                questions = Question.query.order_by(Question.id)\
-                    .filter(Question.question.ilike('%{}%'.format(search)))
-                current_questions = paginate_questions(request, questions)
-
-                if len(questions.all()) != 0:
+                if mode == FULLTEXT:
+                    page = max(request.args.get('page', 1, type=int), 1)
+                    current_questions, total_questions = \
+                        question_search.search(
+                            search, page, QUESTIONS_PER_PAGE
+                            )
+                else:
+                    questions = Question.query.filter(
+                        Question.question.ilike('%{}%'.format(search))
+                        )
+                    current_questions, total_questions = paginate_questions(
+                        request, questions
+                        )
+
+                if total_questions != 0:
                     return jsonify({
                         'success': True,
                         'questions': current_questions,
-                        'total_questions': len(questions.all())
+                        'total_questions': total_questions
                     })
             abort(404)
         except Exception as ex:
@@ -154,22 +207,22 @@ def create_app(test_config=None):
     @app.route('/categories/<int:category_id>/questions', methods=['GET'])
     def get_categorized_questions(category_id):
         try:
+            category = catalog.get(category_id)
+            if category is None:
+                abort(404)
             questions = Question.query\
-                .filter(Question.category == category_id).all()
-            formatted_questions = paginate_questions(request, questions)
-            categories = Category.query.all()
-            formatted_categories = [
-                category.format() for category in categories
-                ]
-            category = Category.query.get(category_id)
+                .filter(Question.category == str(category_id))
+            formatted_questions, total_questions = paginate_questions(
+                request, questions
+                )
 
             if len(formatted_questions) != 0:
                 return jsonify({
                     'success': True,
                     'questions': formatted_questions,
-                    'categories': formatted_categories,
-                    'current_category': Category.format(category),
-                    'total_questions': len(formatted_questions)
+                    'categories': catalog.formatted(),
+                    'current_category': category,
+                    'total_questions': total_questions
                 })
         except Exception as ex:
             print(3, ex)
@@ -179,45 +232,78 @@ def create_app(test_config=None):
     def post_quiz():
         body = request.get_json(force=True)
 
-        previous_questions = body.get('previous_questions', None)
+        previous_questions = body.get('previous_questions', None) or []
         category = body.get('quiz_category', None)
 
         try:
-            if category is not None:
-                category_found = Category.query\
-                    .filter(Category.id == category['id']).one_or_none()
-            if category_found is not None:
-                if previous_questions is not None:
-                    questions = Question.query\
-                        .filter(Question.category == category['id'])\
-                        .filter(Question.id.notin_(previous_questions)).all()
-                else:
-                    questions = Question.query\
-                        .filter(Question.category == category['id']).all()
+            category_id = int(category['id'])
+            if category_id != ALL_CATEGORIES \
+                    and catalog.get(category_id) is None:
+                abort(404)
 
-                formatted_questions = [
-                    question.format() for question in questions
-                    ]
+            question = quiz_pool.pick(category_id, previous_questions)
 
-                if len(formatted_questions) != 0:
-                    return jsonify({
-                            'success': True,
-                            'question': formatted_questions[random.randint(
-                                0,
-                                len(formatted_questions) - 1
-                                )
-                            ]
-                    })
-                else:
-                    return jsonify({
-                        'success': True,
-                        'question': None
-                    })
-            abort(404)
+            return jsonify({
+                'success': True,
+                'question': question.format() if question else None
+            })
         except Exception as ex:
             print(4, ex)
             abort(404)
 
+    @app.route('/quizzes/sessions', methods=['POST'])
+    def create_quiz_session():
+        body = request.get_json(force=True)
+
+        category = body.get('quiz_category', None)
+        limit = body.get('questions', max_session_questions)
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            abort(422)
+        # a quiz needs at least one question
+        if limit < 1:
+            abort(422)
+        limit = min(limit, max_session_questions)
+
+        try:
+            category_id = int(category['id'])
+            if category_id != ALL_CATEGORIES \
+                    and catalog.get(category_id) is None:
+                abort(404)
+
+            order = shuffled(quiz_pool.ids(category_id), limit)
+            session_id = quiz_sessions.create(order)
+
+            return jsonify({
+                'success': True,
+                'session_id': session_id,
+                'total_questions': len(order)
+            }), 201
+        except Exception as ex:
+            print(5, ex)
+            abort(404)
+
+    @app.route('/quizzes/sessions/<session_id>/next', methods=['GET'])
+    def next_quiz_question(session_id):
+        try:
+            while True:
+                question_id, remaining = quiz_sessions.next_id(session_id)
+                if question_id is None:
+                    question = None
+                    break
+                question = Question.query.get(question_id)
+                if question is not None:
+                    break
+        except KeyError:
+            abort(404)
+
+        return jsonify({
+            'success': True,
+            'question': question.format() if question else None,
+            'remaining': remaining
+        })
+
     """
         error hadlers section
     """
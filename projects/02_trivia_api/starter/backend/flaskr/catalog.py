@@ -0,0 +1,54 @@
+import json
+
+from models import Category
+from .snapshot import Snapshot, reload_on_commit
+
+CATALOG_TTL = 300
+
+
+class CategoryCatalog(Snapshot):
+    """
+        process-local copy of the categories table, kept as an id -> type
+        map together with the formatted list and the /categories response
+        body. it is reloaded after CATALOG_TTL seconds, after a commit that
+        touched a category (in this process) or after invalidate().
+    """
+
+    generation = 0
+
+    def __init__(self, ttl=CATALOG_TTL):
+        super(CategoryCatalog, self).__init__(ttl)
+
+    def load(self):
+        types = {
+            category.id: category.type
+            for category in Category.query.order_by(Category.id)
+            }
+        formatted = [
+            {'id': id, 'type': type} for id, type in types.items()
+            ]
+        body = json.dumps({
+            'success': True,
+            'categories': formatted
+        }).encode('utf-8')
+        return {'types': types, 'formatted': formatted, 'body': body}
+
+    def get(self, category_id):
+        """formatted category, or None if there is no such category"""
+        try:
+            category_id = int(category_id)
+        except (TypeError, ValueError):
+            return None
+        category_type = self.current()['types'].get(category_id)
+        if category_type is None:
+            return None
+        return {'id': category_id, 'type': category_type}
+
+    def formatted(self):
+        return self.current()['formatted']
+
+    def json_body(self):
+        return self.current()['body']
+
+
+reload_on_commit(CategoryCatalog, Category)
@@ -0,0 +1,88 @@
+from array import array
+from bisect import bisect_left
+import random
+
+from models import db, Question
+from .snapshot import Snapshot, reload_on_commit
+
+POOL_TTL = 300
+
+# quiz_category id meaning "all categories", as sent by the frontend
+ALL_CATEGORIES = 0
+
+
+def pick_excluding(ids, exclude):
+    """
+        uniformly random id from the sorted array ids that is not in
+        exclude, or None. costs O(len(exclude) * log(len(ids))): the
+        positions of the excluded ids are skipped over rather than
+        filtered out of ids.
+    """
+    skipped = set()
+    for id in exclude:
+        try:
+            id = int(id)
+        except (TypeError, ValueError):
+            continue
+        position = bisect_left(ids, id)
+        if position < len(ids) and ids[position] == id:
+            skipped.add(position)
+
+    remaining = len(ids) - len(skipped)
+    if remaining <= 0:
+        return None
+    index = random.randrange(remaining)
+    for position in sorted(skipped):
+        if position > index:
+            break
+        index += 1
+    return ids[index]
+
+
+class QuestionPool(Snapshot):
+    """
+        question ids per category (and of every question), as sorted
+        array('i')s, so a quiz question can be picked without reading the
+        candidates. reloaded like the category catalog: after POOL_TTL
+        seconds or a commit that touched a question.
+    """
+
+    generation = 0
+
+    def __init__(self, ttl=POOL_TTL):
+        super(QuestionPool, self).__init__(ttl)
+
+    def load(self):
+        every = array('i')
+        by_category = {}
+        rows = db.session.query(Question.id, Question.category)\
+            .order_by(Question.id)
+        for id, category in rows:
+            every.append(id)
+            by_category.setdefault(str(category), array('i')).append(id)
+        return {'all': every, 'categories': by_category}
+
+    def ids(self, category_id):
+        snapshot = self.current()
+        if category_id == ALL_CATEGORIES:
+            return snapshot['all']
+        return snapshot['categories'].get(str(category_id), array('i'))
+
+    def pick(self, category_id, previous_questions=()):
+        """
+            random question of the category (ALL_CATEGORIES for any) not
+            in previous_questions, or None once there are none left
+        """
+        for _ in range(3):
+            id = pick_excluding(self.ids(category_id), previous_questions)
+            if id is None:
+                return None
+            question = Question.query.get(id)
+            if question is not None:
+                return question
+            # deleted by another process since the pool was loaded
+            self.invalidate()
+        return None
+
+
+reload_on_commit(QuestionPool, Question)
@@ -0,0 +1,200 @@
+from html import escape
+import threading
+
+from sqlalchemy import func, literal_column, text
+from sqlalchemy.sql import column, table
+
+from models import db, Question
+
+SUBSTRING = 'substring'
+FULLTEXT = 'fulltext'
+SEARCH_MODES = (SUBSTRING, FULLTEXT)
+
+# question and answer text as indexed by PostgreSQL. queries use this exact
+# expression so the planner can match it to the GIN index.
+POSTGRES_DOCUMENT = "coalesce(question, '') || ' ' || coalesce(answer, '')"
+POSTGRES_VECTOR = "to_tsvector('english', {})".format(POSTGRES_DOCUMENT)
+POSTGRES_INDEX = (
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_questions_search '
+    'ON questions USING gin (({}))'.format(POSTGRES_VECTOR)
+    )
+
+# the database marks matches with these control characters; the snippet
+# is html-escaped and only then are they replaced with <mark> tags, so
+# question text can't inject markup
+MARK_START = '\x02'
+MARK_END = '\x03'
+POSTGRES_HEADLINE = 'StartSel="{}", StopSel="{}", MinWords=5, MaxWords=20'\
+    .format(MARK_START, MARK_END)
+
+FTS_TABLE = 'questions_fts'
+SQLITE_SETUP = (
+    "CREATE VIRTUAL TABLE {0} USING fts5(question, answer, "
+    "content='questions', content_rowid='id', "
+    "tokenize='porter unicode61')",
+    "CREATE TRIGGER {0}_insert AFTER INSERT ON questions BEGIN "
+    "INSERT INTO {0} (rowid, question, answer) "
+    "VALUES (new.id, new.question, new.answer); END",
+    "CREATE TRIGGER {0}_delete AFTER DELETE ON questions BEGIN "
+    "INSERT INTO {0} ({0}, rowid, question, answer) "
+    "VALUES ('delete', old.id, old.question, old.answer); END",
+    "CREATE TRIGGER {0}_update AFTER UPDATE ON questions BEGIN "
+    "INSERT INTO {0} ({0}, rowid, question, answer) "
+    "VALUES ('delete', old.id, old.question, old.answer); "
+    "INSERT INTO {0} (rowid, question, answer) "
+    "VALUES (new.id, new.question, new.answer); END",
+    "INSERT INTO {0} ({0}) VALUES ('rebuild')",
+    )
+
+
+class PostgresSearch(object):
+    """
+        full-text search with a GIN index over to_tsvector of the question
+        and answer, ranked by ts_rank and highlighted with ts_headline
+    """
+
+    def setup(self, connection):
+        # the GIN index is built by `flask create-search-index`, not here:
+        # building it in a request would block writes to questions
+        pass
+
+    def create_index(self, engine):
+        # CONCURRENTLY can't run inside a transaction
+        connection = engine.connect().execution_options(
+            isolation_level='AUTOCOMMIT'
+            )
+        try:
+            connection.execute(text(POSTGRES_INDEX))
+        finally:
+            connection.close()
+
+    def matching(self, term):
+        """(query of the matching questions, rank, snippet)"""
+        vector = literal_column(POSTGRES_VECTOR)
+        query = func.plainto_tsquery(literal_column("'english'"), term)
+        rank = func.ts_rank(vector, query)
+        snippet = func.ts_headline(
+            literal_column("'english'"), literal_column(POSTGRES_DOCUMENT),
+            query, POSTGRES_HEADLINE
+            )
+        return Question.query.filter(vector.op('@@')(query)), rank, snippet
+
+
+class SQLiteSearch(object):
+    """
+        full-text search with an FTS5 table kept in sync with questions by
+        triggers, ranked by bm25 and highlighted with snippet()
+    """
+
+    def setup(self, connection):
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = :name"),
+            {'name': FTS_TABLE}
+            ).scalar()
+        if not exists:
+            for statement in SQLITE_SETUP:
+                connection.execute(text(statement.format(FTS_TABLE)))
+
+    def create_index(self, engine):
+        with engine.begin() as connection:
+            self.setup(connection)
+
+    def matching(self, term):
+        # every word as a quoted phrase, so user input is never parsed as
+        # FTS5 query syntax; the words are ANDed
+        phrases = ' '.join(
+            '"{}"'.format(word.replace('"', '""')) for word in term.split()
+            )
+        fts = literal_column(FTS_TABLE)
+        # bm25 is lower for better matches
+        rank = -func.bm25(fts)
+        snippet = func.snippet(fts, -1, MARK_START, MARK_END, '...', 20)
+        query = Question.query\
+            .join(table(FTS_TABLE, column('rowid')),
+                  literal_column(FTS_TABLE + '.rowid') == Question.id)\
+            .filter(fts.op('MATCH')(phrases))
+        return query, rank, snippet
+
+
+BACKENDS = {
+    'postgresql': PostgresSearch,
+    'sqlite': SQLiteSearch,
+}
+
+
+def highlight(snippet):
+    """html-escaped snippet with the marked matches in <mark> tags"""
+    if snippet is None:
+        return None
+    return escape(snippet)\
+        .replace(MARK_START, '<mark>')\
+        .replace(MARK_END, '</mark>')
+
+
+def create_index(engine):
+    """
+        builds the full-text index for the database of engine: the GIN
+        index on PostgreSQL (without blocking writes), the FTS5 table on
+        SQLite. returns False if the database isn't supported.
+    """
+    backend_class = BACKENDS.get(engine.dialect.name)
+    if backend_class is None:
+        return False
+    backend_class().create_index(engine)
+    return True
+
+
+class QuestionSearch(object):
+    """
+        full-text search over question and answer text. on SQLite the FTS5
+        table is created on first use, for the database the app is bound
+        to then; on PostgreSQL search works without its index, but slowly,
+        until `flask create-search-index` has built it.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.backends = {}
+
+    def backend(self):
+        """search backend for the current database, or None if unsupported"""
+        engine = db.engine
+        if engine.url in self.backends:
+            return self.backends[engine.url]
+        with self.lock:
+            if engine.url not in self.backends:
+                backend_class = BACKENDS.get(engine.dialect.name)
+                backend = None
+                if backend_class is not None:
+                    backend = backend_class()
+                    with engine.begin() as connection:
+                        backend.setup(connection)
+                self.backends[engine.url] = backend
+            return self.backends[engine.url]
+
+    def available(self):
+        return self.backend() is not None
+
+    def search(self, term, page, per_page):
+        """
+            (formatted questions on the page, best match first, total
+            matching questions). each question also has its rank and a
+            snippet of the matching text with the words in <mark>s.
+        """
+        if not term.split():
+            return [], 0
+        query, rank, snippet = self.backend().matching(term)
+        total = query.with_entities(func.count(Question.id))\
+            .order_by(None).scalar()
+        rows = query.with_entities(Question, rank, snippet)\
+            .order_by(rank.desc(), Question.id)\
+            .offset((page - 1) * per_page)\
+            .limit(per_page)
+
+        questions = []
+        for question, question_rank, question_snippet in rows:
+            formatted = question.format()
+            formatted['rank'] = question_rank
+            formatted['snippet'] = highlight(question_snippet)
+            questions.append(formatted)
+        return questions, total
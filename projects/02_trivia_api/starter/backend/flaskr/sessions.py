@@ -0,0 +1,187 @@
+from array import array
+from collections import OrderedDict
+import random
+import secrets
+import sqlite3
+import threading
+import time
+
+SESSION_TTL = 3600
+MAX_SESSIONS = 10000
+# questions per session, so a session costs at most 4 * this many bytes
+MAX_SESSION_QUESTIONS = 100
+# question ids held by all in-memory sessions together (4 bytes each)
+MAX_SESSION_IDS = 1000000
+
+
+def shuffled(ids, limit=None):
+    if limit is not None:
+        return array('i', random.sample(ids, min(limit, len(ids))))
+    order = array('i', ids)
+    random.shuffle(order)
+    return order
+
+
+class MemorySessionStore(object):
+    """
+        quiz sessions held in this process: session id -> [question order,
+        position, expiry]. a session expires ttl seconds after it was last
+        used, and the least recently used ones are evicted past
+        max_sessions sessions or max_ids question ids in all.
+    """
+
+    def __init__(self, ttl=SESSION_TTL, max_sessions=MAX_SESSIONS,
+                 max_ids=MAX_SESSION_IDS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_ids = max_ids
+        self.lock = threading.Lock()
+        self.sessions = OrderedDict()
+        self.ids = 0
+
+    def create(self, order):
+        session_id = secrets.token_urlsafe(16)
+        now = time.monotonic()
+        with self.lock:
+            # least recently used first, and the ttl slides with use, so
+            # the expired sessions are all at the front
+            for expired_id, session in list(self.sessions.items()):
+                if session[2] >= now:
+                    break
+                self.drop(expired_id)
+            self.sessions[session_id] = [order, 0, now + self.ttl]
+            self.ids += len(order)
+            while len(self.sessions) > self.max_sessions \
+                    or self.ids > self.max_ids:
+                self.drop(next(iter(self.sessions)))
+        return session_id
+
+    def drop(self, session_id):
+        self.ids -= len(self.sessions.pop(session_id)[0])
+
+    def next_id(self, session_id):
+        """
+            (next question id or None, questions left after it); raises
+            KeyError for an unknown or expired session
+        """
+        now = time.monotonic()
+        with self.lock:
+            session = self.sessions[session_id]
+            order, position, expires = session
+            if expires < now:
+                self.drop(session_id)
+                raise KeyError(session_id)
+            session[2] = now + self.ttl
+            self.sessions.move_to_end(session_id)
+            if position >= len(order):
+                return None, 0
+            session[1] = position + 1
+            return order[position], len(order) - position - 1
+
+
+class SQLiteSessionStore(object):
+    """
+        quiz sessions in a local SQLite file, shared by the worker
+        processes of one host and kept across restarts. the question order
+        is stored as the bytes of an array('i'); next_id() reads only the
+        4 bytes at the session's position.
+    """
+
+    def __init__(self, path, ttl=SESSION_TTL, max_sessions=MAX_SESSIONS):
+        self.path = path
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        connection = self.connect()
+        try:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS quiz_sessions ('
+                'id TEXT PRIMARY KEY, ids BLOB NOT NULL, '
+                'position INTEGER NOT NULL DEFAULT 0, expires REAL NOT NULL)'
+                )
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS ix_quiz_sessions_expires '
+                'ON quiz_sessions (expires)'
+                )
+        finally:
+            connection.close()
+
+    def connect(self):
+        connection = sqlite3.connect(
+            self.path, timeout=30, isolation_level=None
+            )
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def create(self, order):
+        session_id = secrets.token_urlsafe(16)
+        now = time.time()
+        connection = self.connect()
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.execute(
+                'DELETE FROM quiz_sessions WHERE expires < ?', (now,)
+                )
+            connection.execute(
+                'INSERT INTO quiz_sessions (id, ids, expires) '
+                'VALUES (?, ?, ?)',
+                (session_id, order.tobytes(), now + self.ttl)
+                )
+            connection.execute(
+                'DELETE FROM quiz_sessions WHERE id IN ('
+                'SELECT id FROM quiz_sessions ORDER BY expires DESC '
+                'LIMIT -1 OFFSET ?)', (self.max_sessions,)
+                )
+            connection.execute('COMMIT')
+        finally:
+            connection.close()
+        return session_id
+
+    def next_id(self, session_id):
+        now = time.time()
+        connection = self.connect()
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                row = connection.execute(
+                    'SELECT position, length(ids) / 4, expires, '
+                    'substr(ids, position * 4 + 1, 4) '
+                    'FROM quiz_sessions WHERE id = ?', (session_id,)
+                    ).fetchone()
+                if row is None or row[2] < now:
+                    connection.execute(
+                        'DELETE FROM quiz_sessions WHERE id = ?',
+                        (session_id,)
+                        )
+                    raise KeyError(session_id)
+                position, total, _, chunk = row
+                connection.execute(
+                    'UPDATE quiz_sessions SET position = ?, expires = ? '
+                    'WHERE id = ?',
+                    (min(position + 1, total), now + self.ttl, session_id)
+                    )
+            finally:
+                connection.execute('COMMIT')
+        finally:
+            connection.close()
+        if position >= total:
+            return None, 0
+        return array('i', chunk)[0], total - position - 1
+
+
+def make_session_store(config):
+    """
+        SQLiteSessionStore when QUIZ_SESSION_DB names a file, otherwise
+        MemorySessionStore
+    """
+    options = {
+        'ttl': config.get('QUIZ_SESSION_TTL', SESSION_TTL),
+        'max_sessions': config.get('QUIZ_SESSION_MAX', MAX_SESSIONS),
+    }
+    path = config.get('QUIZ_SESSION_DB')
+    if path:
+        return SQLiteSessionStore(path, **options)
+    return MemorySessionStore(
+        max_ids=config.get('QUIZ_SESSION_MAX_IDS', MAX_SESSION_IDS),
+        **options
+        )
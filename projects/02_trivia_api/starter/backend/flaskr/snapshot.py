@@ -0,0 +1,69 @@
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class Snapshot(object):
+    """
+        process-local data loaded from the database by load(), kept until
+        ttl seconds have passed, invalidate() is called, or the class's
+        generation changes (see reload_on_commit)
+    """
+
+    generation = 0
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.snapshot = None
+
+    def load(self):
+        raise NotImplementedError
+
+    def current(self):
+        snapshot = self.snapshot
+        if self.fresh(snapshot):
+            return snapshot
+        with self.lock:
+            if not self.fresh(self.snapshot):
+                generation = type(self).generation
+                snapshot = self.load()
+                snapshot['generation'] = generation
+                snapshot['expires'] = time.monotonic() + self.ttl
+                self.snapshot = snapshot
+            return self.snapshot
+
+    def fresh(self, snapshot):
+        return snapshot is not None \
+            and snapshot['generation'] == type(self).generation \
+            and snapshot['expires'] > time.monotonic()
+
+    def invalidate(self):
+        self.snapshot = None
+
+
+def reload_on_commit(snapshot_class, model):
+    """
+        bumps snapshot_class.generation, so every instance reloads, once a
+        transaction that inserted, changed or deleted a model instance
+        commits
+    """
+    key = 'changed_{}'.format(model.__tablename__)
+
+    @event.listens_for(Session, 'after_flush')
+    def note_changes(session, flush_context):
+        for instance in session.new | session.dirty | session.deleted:
+            if isinstance(instance, model):
+                session.info[key] = True
+                return
+
+    @event.listens_for(Session, 'after_commit')
+    def bump_generation(session):
+        if session.info.pop(key, False):
+            snapshot_class.generation += 1
+
+    @event.listens_for(Session, 'after_rollback')
+    def forget_changes(session):
+        session.info.pop(key, None)
@@ -3,7 +3,7 @@ import json
 from flask_sqlalchemy import SQLAlchemy
 
 from flaskr import create_app
-from models import setup_db
+from models import setup_db, db, Category, Question
 
 
 class TriviaTestCase(unittest.TestCase):
@@ -71,6 +71,35 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['success'], True)
         self.assertTrue(len(data['categories']))
 
+    def test_categories_reloaded_after_change(self):
+        self.client().get('/categories')
+        with self.app.app_context():
+            category = Category('Music')
+            db.session.add(category)
+            db.session.commit()
+            category_id = category.id
+
+        res = self.client().get('/categories')
+        data = json.loads(res.data)
+
+        with self.app.app_context():
+            db.session.delete(Category.query.get(category_id))
+            db.session.commit()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(
+            {'id': category_id, 'type': 'Music'},
+            data['categories']
+            )
+
+    def test_404_questions_of_unknown_category(self):
+        res = self.client().get('/categories/1000/questions')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(data['success'], False)
+        self.assertEqual(data['message'], 'not found!')
+
     def test_retrive_questions(self):
         res = self.client().get('/questions')
         data = json.loads(res.data)
@@ -91,6 +120,43 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['success'], False)
         self.assertEqual(data['message'], 'not found!')
 
+    def test_keyset_page_matches_offset_page(self):
+        first_page = json.loads(self.client().get('/questions').data)
+        last_id = first_page['questions'][-1]['id']
+        res = self.client().get('/questions?after_id={}'.format(last_id))
+        data = json.loads(res.data)
+        second_page = json.loads(self.client().get('/questions?page=2').data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertEqual(data['questions'], second_page['questions'])
+        self.assertEqual(
+            data['total_questions'],
+            first_page['total_questions']
+            )
+
+    def test_404_keyset_past_last_question(self):
+        res = self.client().get('/questions?after_id=100000')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(data['success'], False)
+        self.assertEqual(data['message'], 'not found!')
+
+    def test_total_questions_counts_every_page(self):
+        res = self.client().get('/questions')
+        data = json.loads(res.data)
+        last_page = (data['total_questions'] - 1) // 10 + 1
+        last = json.loads(
+            self.client().get('/questions?page={}'.format(last_page)).data
+            )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            (last_page - 1) * 10 + len(last['questions']),
+            data['total_questions']
+            )
+
     def test_delete_existing_question(self):
         res = self.client().delete('/questions/2')
         data = json.loads(res.data)
@@ -122,6 +188,69 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 200)
         self.assertEqual(data['success'], True)
 
+    def test_questions_fulltext_search(self):
+        res = self.client().post('/questions/search?mode=fulltext', json={
+            'searchTerm': 'caged birds'
+        })
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertEqual(data['questions'][0]['id'], 5)
+        self.assertIn('<mark>', data['questions'][0]['snippet'])
+        self.assertEqual(data['total_questions'], len(data['questions']))
+
+    def test_fulltext_search_matches_answers(self):
+        res = self.client().post('/questions/search', json={
+            'searchTerm': 'angelou',
+            'mode': 'fulltext'
+        })
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['questions'][0]['answer'], 'Maya Angelou')
+
+    def test_fulltext_snippet_is_escaped(self):
+        question = Question(
+            '<b>Which</b> boxer <script>x()</script>?', 'Ali', '6', 1
+            )
+        with self.app.app_context():
+            question.insert()
+            question_id = question.id
+
+        res = self.client().post('/questions/search?mode=fulltext', json={
+            'searchTerm': 'boxer'
+        })
+        data = json.loads(res.data)
+        with self.app.app_context():
+            Question.query.get(question_id).delete()
+
+        snippet = [
+            q['snippet'] for q in data['questions'] if q['id'] == question_id
+            ][0]
+        self.assertIn('<mark>boxer</mark>', snippet)
+        self.assertNotIn('<b>', snippet)
+        self.assertNotIn('<script>', snippet)
+
+    def test_404_fulltext_search_no_match(self):
+        res = self.client().post('/questions/search?mode=fulltext', json={
+            'searchTerm': 'plapla"('
+        })
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(data['success'], False)
+
+    def test_400_unknown_search_mode(self):
+        res = self.client().post('/questions/search?mode=regex', json={
+            'searchTerm': 'title'
+        })
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(data['success'], False)
+        self.assertEqual(data['message'], 'bad request!')
+
     def test_get_categorized_questions(self):
         res = self.client().get('/category/1/questions')
         data = json.loads(res.data)
@@ -146,6 +275,114 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['success'], True)
         self.assertTrue(data['question'])
 
+    def test_play_quiz_all_categories(self):
+        res = self.client().post('/quizzes', json={
+            'previous_questions': [],
+            'quiz_category': {'id': 0, 'type': 'click'}
+        })
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertTrue(data['question'])
+
+    def test_play_quiz_skips_previous_questions(self):
+        listing = json.loads(
+            self.client().get('/categories/5/questions').data
+            )
+        ids = [question['id'] for question in listing['questions']]
+        res = self.client().post('/quizzes', json={
+            'previous_questions': ids[1:],
+            'quiz_category': self.new_quiz['quiz_category']
+        })
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['question']['id'], ids[0])
+
+    def test_play_quiz_out_of_questions(self):
+        listing = json.loads(
+            self.client().get('/categories/5/questions').data
+            )
+        ids = [question['id'] for question in listing['questions']]
+        res = self.client().post('/quizzes', json={
+            'previous_questions': ids,
+            'quiz_category': self.new_quiz['quiz_category']
+        })
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertEqual(data['question'], None)
+
+    def test_quiz_session_asks_each_question_once(self):
+        res = self.client().post('/quizzes/sessions', json={
+            'quiz_category': self.new_quiz['quiz_category']
+        })
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(data['success'], True)
+
+        asked = []
+        while True:
+            next_res = self.client().get(
+                '/quizzes/sessions/{}/next'.format(data['session_id'])
+                )
+            question = json.loads(next_res.data)['question']
+            self.assertEqual(next_res.status_code, 200)
+            if question is None:
+                break
+            self.assertEqual(question['category'], '5')
+            asked.append(question['id'])
+
+        self.assertEqual(len(asked), data['total_questions'])
+        self.assertEqual(len(set(asked)), len(asked))
+
+    def test_quiz_session_question_limit(self):
+        res = self.client().post('/quizzes/sessions', json={
+            'quiz_category': {'id': 0, 'type': 'click'},
+            'questions': 2
+        })
+        data = json.loads(res.data)
+        next_res = self.client().get(
+            '/quizzes/sessions/{}/next'.format(data['session_id'])
+            )
+        next_data = json.loads(next_res.data)
+
+        self.assertEqual(data['total_questions'], 2)
+        self.assertTrue(next_data['question'])
+        self.assertEqual(next_data['remaining'], 1)
+
+    def test_422_quiz_session_bad_question_limit(self):
+        res = self.client().post('/quizzes/sessions', json={
+            'quiz_category': {'id': 0, 'type': 'click'},
+            'questions': 'abc'
+        })
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 422)
+        self.assertEqual(data['success'], False)
+
+    def test_422_quiz_session_without_questions(self):
+        for limit in (0, -3):
+            res = self.client().post('/quizzes/sessions', json={
+                'quiz_category': {'id': 0, 'type': 'click'},
+                'questions': limit
+            })
+            data = json.loads(res.data)
+
+            self.assertEqual(res.status_code, 422)
+            self.assertEqual(data['success'], False)
+
+    def test_404_unknown_quiz_session(self):
+        res = self.client().get('/quizzes/sessions/nope/next')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(data['success'], False)
+        self.assertEqual(data['message'], 'not found!')
+
     def test_play_quiz_unprocessable(self):
         res = self.client().post('/quizzes', json=self.null_category)
         data = json.loads(res.data)